@@ -1,39 +1,142 @@
 import os
-import io
-from flask import Flask, render_template, request, jsonify
+import json
+import logging
+import threading
+from flask import Flask, Response, render_template, request, jsonify, stream_with_context
 from werkzeug.utils import secure_filename
+from werkzeug.wsgi import get_input_stream
 
-from nlp import extract_text_from_file, classify_email, classify_multiple_emails
-from responders import suggest_reply
+from nlp import (
+    extract_text_from_file, ingest_text, classify_email, classify_multiple_emails, warm_up_model, model_status,
+    tier_stats, DuplicateTracker, iter_classified_batches, count_emails, classify_cheaply, stream_text_from_file,
+    PagedText,
+)
+from responders import generate_reply, reply_stats
+from dedup import DEDUP_ENABLED, DEDUP_STREAM_MAX_ITEMS
+from cache import content_cache, make_key
+from telemetry import render_metrics
+import jobs
+import uploads
+import documents
+import pdf_extract
+import serialization
+from serialization import dumps
 
-# Swagger + CORS
-from flasgger import Swagger
+# CORS (o Swagger é importado por _init_swagger)
 from flask_cors import CORS
 
-ALLOWED_EXTENSIONS = {"txt", "pdf"}
+ALLOWED_EXTENSIONS = {"txt", "pdf", "eml", "mbox"}
 
 
 def allowed_file(filename: str) -> bool:
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+# Logs estruturados (JSON) de nlp/responders vão para o stderr
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"), format="%(asctime)s %(levelname)s %(name)s %(message)s")
+
 app = Flask(__name__)
 app.config["MAX_CONTENT_LENGTH"] = 10 * 1024 * 1024  # 10 MB
+app.json = serialization.JSONProvider(app)
 
-# CORS e Swagger
-CORS(app)
-swagger = Swagger(
-    app,
-    template={
-        "swagger": "2.0",
-        "info": {
-            "title": "AutoU — Classificador de E-mails",
-            "description": "API para classificar e sugerir respostas (Produtivo/Improdutivo).",
-            "version": "1.0.0",
-        },
-        "basePath": "/",
+# Página padrão de /api/classify quando só o cursor é informado
+API_PAGE_SIZE = int(os.getenv("API_PAGE_SIZE", "100"))
+
+# /api/classify/batch lê o corpo em streaming, então tem limites próprios
+BATCH_MAX_CONTENT_LENGTH = int(os.getenv("BATCH_MAX_CONTENT_LENGTH", 1024 * 1024 * 1024))  # 1 GB
+BATCH_MAX_RECORD_BYTES = int(os.getenv("BATCH_MAX_RECORD_BYTES", 1024 * 1024))  # 1 MB por linha
+
+# FAST_START=1: o Swagger (flasgger, e a especificação gerada das docstrings)
+# e as bibliotecas de PDF só são carregados no primeiro uso, e uma instância
+# nova atende o primeiro request mais cedo. No modo padrão tudo é carregado
+# no start (com `gunicorn --preload`, uma vez antes do fork dos workers).
+FAST_START = os.getenv("FAST_START", "0") == "1"
+
+SWAGGER_TEMPLATE = {
+    "swagger": "2.0",
+    "info": {
+        "title": "AutoU — Classificador de E-mails",
+        "description": "API para classificar e sugerir respostas (Produtivo/Improdutivo).",
+        "version": "1.0.0",
     },
-)
+    "basePath": "/",
+}
+# Rotas registradas pelo flasgger (UI, especificação e arquivos estáticos)
+SWAGGER_PATHS = ("/apidocs", "/apispec_1.json", "/flasgger_static/", "/oauth2-redirect.html")
+
+
+def _init_swagger(target: Flask) -> None:
+    from flasgger import Swagger
+    Swagger(target, template=SWAGGER_TEMPLATE)
+
+
+def _build_docs_app() -> Flask:
+    """
+    App só para a documentação: mesmas rotas (a especificação sai das
+    docstrings das views) e o Swagger, que não pode ser registrado no app
+    principal depois que ele já atendeu requests
+    """
+    docs = Flask(__name__)
+    for rule in app.url_map.iter_rules():
+        if rule.endpoint != "static":
+            docs.add_url_rule(rule.rule, rule.endpoint, app.view_functions[rule.endpoint], methods=rule.methods)
+    CORS(docs)
+    _init_swagger(docs)
+    return docs
+
+
+class _LazySwagger:
+    """
+    Middleware WSGI: requests para as rotas do Swagger vão para o app de
+    documentação, criado no primeiro acesso; os demais seguem direto
+    """
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+        self.docs_app = None
+        self._lock = threading.Lock()
+
+    def __call__(self, environ, start_response):
+        if environ.get("PATH_INFO", "").startswith(SWAGGER_PATHS):
+            if self.docs_app is None:
+                with self._lock:
+                    if self.docs_app is None:
+                        self.docs_app = _build_docs_app()
+            return self.docs_app(environ, start_response)
+        return self.wsgi_app(environ, start_response)
+
+
+@app.after_request
+def _compress(response):
+    # gzip/br nas respostas grandes (JSON e HTML); streams seguem sem compressão
+    return serialization.compress_response(response, request.accept_encodings)
+
+
+CORS(app)
+if FAST_START:
+    app.wsgi_app = _LazySwagger(app.wsgi_app)
+else:
+    _init_swagger(app)
+    pdf_extract.preload()
+
+
+PARTIAL_REASONS = {
+    "max_pages": "o PDF excede o limite de páginas",
+    "time_budget": "a extração do PDF excedeu o tempo limite",
+}
+
+
+def _partial_warning(document) -> str | None:
+    if document is None or not document.partial:
+        return None
+    reason = PARTIAL_REASONS.get(document.partial, document.partial)
+    return f"Conteúdo processado parcialmente: {reason}."
+
+
+# Carrega o modelo no start (com `gunicorn --preload`, antes do fork dos workers);
+# não no processo do pool de PDF, que reimporta o script (`python app.py`) como __mp_main__
+if os.getenv("ZSC_PRELOAD", "0") == "1" and __name__ != "__mp_main__":
+    warm_up_model()
 
 
 @app.route("/", methods=["GET"])
@@ -41,67 +144,158 @@ def index():
     return render_template("index.html")
 
 
-@app.route("/process", methods=["POST"])
-def process():
+def _read_process_form(streaming: bool = False):
+    """
+    Entrada do formulário da interface: (conteúdo, documento, aviso, erro);
+    com `streaming`, um PDF com vários e-mails vem como PagedText
+    """
     raw_text = (request.form.get("email_text") or "").strip()
-    uploaded_text = ""
-    is_file_upload = False
+    document = None
 
     if "file" in request.files:
         file = request.files["file"]
         if file and file.filename:
             if not allowed_file(file.filename):
-                return render_template("index.html", error=f"Formato não suportado: {file.filename}")
+                return "", None, None, f"Formato não suportado: {file.filename}"
             filename = secure_filename(file.filename)
-            file_bytes = file.read()
-            uploaded_text = extract_text_from_file(filename, io.BytesIO(file_bytes))
-            is_file_upload = True
+            # file.stream já é seekable (memória ou arquivo temporário): sem cópia extra
+            extract = stream_text_from_file if streaming else extract_text_from_file
+            document = extract(filename, file.stream)
 
-    content = raw_text or uploaded_text
+    if raw_text and document is not None:
+        # Texto colado tem prioridade sobre o arquivo, mas ainda pode ter múltiplos e-mails
+        document = ingest_text(raw_text, normalize_single=False)
+    content = raw_text or (document.text if document is not None else "")
+    warning = _partial_warning(document)
     if not content:
-        return render_template(
-            "index.html",
-            error="Insira o texto do e-mail ou faça upload de um arquivo .txt/.pdf",
-        )
+        return "", document, warning, "Insira o texto do e-mail ou faça upload de um arquivo .txt/.pdf/.eml/.mbox"
+    return content, document, warning, None
 
-    # Verifica se é um arquivo com múltiplos e-mails
-    if is_file_upload and ("EMAIL 1" in content.upper() or "EMAIL 2" in content.upper() or content.count("De:") > 1 or content.count("From:") > 1):
-        # Processar múltiplos e-mails
-        email_results = classify_multiple_emails(content)
+
+@app.route("/process", methods=["POST"])
+def process():
+    content, document, warning, error = _read_process_form()
+    if error:
+        return render_template("index.html", error=error)
+
+    # Verifica se é um arquivo com múltiplos e-mails (detectado na extração)
+    if document is not None and document.is_multi:
+        # Processar múltiplos e-mails; o conteúdo completo de cada um (e o texto
+        # original) é buscado pela página só quando aberto
+        email_results = classify_multiple_emails(document.text, spans=document.spans)
         
         return render_template(
             "index.html",
-            input_text=content,
+            document_id=documents.get_store().put(document.text, document.spans),
             multiple_emails=email_results,
-            is_multiple=True
+            is_multiple=True,
+            warning=warning,
         )
     else:
-        # Processar e-mail único
-        clf_result = classify_email(content)
-        category = clf_result["category"]
-        confidence = clf_result["confidence"]
-        sub_intent = clf_result.get("sub_intent")
-        signals = clf_result.get("signals", [])
+        return _render_single(content, warning)
 
-        # Geração de resposta
-        reply = suggest_reply(content, category, sub_intent, backend=os.getenv("MODEL_BACKEND", "local"))
 
-        return render_template(
-            "index.html",
-            input_text=content,
-            category=category,
-            confidence=f"{confidence:.2%}",
-            sub_intent=sub_intent,
-            signals=signals,
-            reply=reply,
-            is_multiple=False
-        )
+def _render_single(content: str, warning: str | None):
+    # Processar e-mail único
+    clf_result = classify_email(content)
+    category = clf_result["category"]
+    confidence = clf_result["confidence"]
+    sub_intent = clf_result.get("sub_intent")
+    signals = clf_result.get("signals", [])
+
+    # Geração de resposta
+    reply = generate_reply(content, category, sub_intent, backend=os.getenv("MODEL_BACKEND", "local")).text
+
+    return render_template(
+        "index.html",
+        input_text=content,
+        category=category,
+        confidence=f"{confidence:.2%}",
+        sub_intent=sub_intent,
+        signals=signals,
+        reply=reply,
+        is_multiple=False,
+        warning=warning,
+    )
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {dumps(data)}\n\n"
+
+
+@app.route("/process/stream", methods=["POST"])
+def process_stream():
+    """
+    Versão em streaming de /process para arquivos com múltiplos e-mails:
+    cada e-mail é enviado como server-sent event assim que é classificado.
+    E-mail único e erros voltam como a página HTML de /process.
+    ---
+    consumes:
+      - multipart/form-data
+    produces:
+      - text/event-stream
+      - text/html
+    parameters:
+      - in: formData
+        name: email_text
+        type: string
+        required: false
+      - in: formData
+        name: file
+        type: file
+        required: false
+    responses:
+      200:
+        description: 'Eventos: start {"total", "warning", "document"}, email (um resultado de /api/classify, sem content_full: ver /api/documents), done {"total", "clusters", "document"?, "warning"?}, error {"error"}. Em PDFs o total e o documento do start são null: as páginas seguintes são extraídas durante o streaming e o documento (e o aviso de extração parcial) vem no done'
+    """
+    content, document, warning, error = _read_process_form(streaming=True)
+    if error:
+        return render_template("index.html", error=error)
+    if document is None or not document.is_multi:
+        return _render_single(content, warning)
+
+    fields = [name for name in serialization.RESULT_FIELDS if name != "content_full"]
+    paged = isinstance(document, PagedText)
+    document_id = None if paged else documents.get_store().put(document.text, document.spans)
+
+    def generate():
+        total = None if paged else count_emails(document.text, document.spans)
+        yield _sse("start", {"total": total, "warning": warning, "document": document_id})
+        tracker = DuplicateTracker() if DEDUP_ENABLED else None
+        sent = 0
+        try:
+            if paged:
+                batches = iter_classified_batches(document, document.iter_spans(), tracker=tracker)
+            else:
+                batches = iter_classified_batches(document.text, document.spans, tracker=tracker)
+            for batch in batches:
+                for email in serialization.project(batch, fields):
+                    yield _sse("email", email)
+                sent += len(batch)
+        except Exception as e:
+            yield _sse("error", {"error": f"Erro ao processar e-mails: {e}"})
+            return
+        done = {"total": sent, "clusters": tracker.stats() if tracker is not None else None}
+        if paged:
+            extracted = document.document()
+            done["document"] = documents.get_store().put(extracted.text, extracted.spans)
+            done["warning"] = _partial_warning(extracted)
+        yield _sse("done", done)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"X-Accel-Buffering": "no", "Cache-Control": "no-cache"},
+    )
 
 
 @app.route("/api/classify", methods=["POST"])
 def api_classify():
     """
-    Classifica o e-mail e sugere resposta.
+    Classifica o e-mail e sugere resposta. Com vários e-mails, `fields`
+    escolhe os campos de cada resultado e `limit`/`cursor` paginam `results`
+    (cada página classifica só os seus e-mails; o documento é reenviado).
+    Respostas grandes saem com gzip/br conforme o Accept-Encoding.
     ---
     consumes:
       - application/json
@@ -116,6 +310,28 @@ def api_classify():
             text:
               type: string
               example: "Bom dia! Poderiam informar o andamento do chamado #12345? Preciso da previsão."
+            fields:
+              type: string
+              example: "id,category,confidence"
+            limit:
+              type: integer
+            cursor:
+              type: string
+      - in: query
+        name: fields
+        type: string
+        required: false
+        description: 'Campos de cada resultado, separados por vírgula (ex.: id,category,confidence,reply); padrão: todos'
+      - in: query
+        name: limit
+        type: integer
+        required: false
+        description: E-mails por página (múltiplos e-mails)
+      - in: query
+        name: cursor
+        type: string
+        required: false
+        description: next_cursor da página anterior (mesmo documento)
       - in: formData
         name: text
         type: string
@@ -125,7 +341,7 @@ def api_classify():
         name: file
         type: file
         required: false
-        description: Arquivo .txt ou .pdf
+        description: Arquivo .txt, .pdf, .eml ou .mbox
     responses:
       200:
         description: Resultado da classificação
@@ -147,10 +363,26 @@ def api_classify():
                 type: string
             reply:
               type: string
+            reply_source:
+              type: string
+              enum: ["llm", "cache", "template"]
+            results:
+              type: array
+              description: Um item por e-mail (múltiplos e-mails), com os campos de `fields`
+              items:
+                type: object
+            total_emails:
+              type: integer
+            next_cursor:
+              type: string
+              nullable: true
+              description: Cursor da próxima página (só com limit/cursor); null na última
       400:
-        description: Requisição inválida
+        description: Requisição inválida (inclui campos desconhecidos e cursor inválido)
     """
     text = ""
+    document = None
+    payload = {}
 
     # JSON
     if request.is_json:
@@ -166,20 +398,59 @@ def api_classify():
         file = request.files["file"]
         if file and file.filename and allowed_file(file.filename):
             filename = secure_filename(file.filename)
-            text = extract_text_from_file(filename, io.BytesIO(file.read()))
+            document = extract_text_from_file(filename, file.stream)
+            text = document.text
 
     if not text:
-        return jsonify({"error": "Forneça 'text' no JSON ou um arquivo .txt/.pdf"}), 400
+        return jsonify({"error": "Forneça 'text' no JSON ou um arquivo .txt/.pdf/.eml/.mbox"}), 400
+
+    try:
+        fields = serialization.parse_fields(_request_option(payload, "fields"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    limit = _request_option(payload, "limit")
+    if limit in (None, ""):
+        limit = None
+    elif not str(limit).isdigit() or int(limit) < 1:
+        return jsonify({"error": "limit deve ser um inteiro maior que zero"}), 400
+    else:
+        limit = int(limit)
+    cursor = _request_option(payload, "cursor") or None
 
     # Verifica se contém múltiplos e-mails
-    if "EMAIL 1" in text.upper() or "EMAIL 2" in text.upper() or text.count("De:") > 1 or text.count("From:") > 1:
+    if document is None:
+        document = ingest_text(text, normalize_single=False)
+    if document.is_multi:
         # Processar múltiplos e-mails
-        email_results = classify_multiple_emails(text)
-        return jsonify({
+        clusters = {}
+        start = 0
+        paginated = limit is not None or cursor is not None
+        if paginated:
+            document_key = make_key(document.text)
+            if cursor is not None:
+                try:
+                    start = serialization.decode_cursor(cursor, document_key)
+                except ValueError as e:
+                    return jsonify({"error": str(e)}), 400
+            limit = limit or API_PAGE_SIZE
+        email_results = classify_multiple_emails(
+            document.text, spans=document.spans, clusters=clusters, start=start, limit=limit
+        )
+        response = {
             "multiple_emails": True,
-            "results": email_results,
-            "total_emails": len(email_results)
-        })
+            "results": serialization.project(email_results, fields),
+            "total_emails": len(email_results),
+        }
+        if paginated:
+            total = count_emails(document.text, document.spans)
+            end = start + len(email_results)
+            response["total_emails"] = total
+            response["next_cursor"] = serialization.encode_cursor(end, document_key) if end < total else None
+        if clusters:
+            response["clusters"] = clusters
+        if document.partial:
+            response["partial_extraction"] = document.partial
+        return jsonify(response)
     else:
         # Processar e-mail único
         clf_result = classify_email(text)
@@ -189,19 +460,432 @@ def api_classify():
         signals = clf_result.get("signals", [])
 
         # Resposta sugerida
-        reply = suggest_reply(text, category, sub_intent, backend=os.getenv("MODEL_BACKEND", "local"))
-
-        return jsonify(
-            {
-                "multiple_emails": False,
-                "category": category,
-                "confidence": confidence,
-                "sub_intent": sub_intent,
-                "signals": signals,
-                "reply": reply,
-            }
-        )
+        reply = generate_reply(text, category, sub_intent, backend=os.getenv("MODEL_BACKEND", "local"))
+
+        response = {
+            "multiple_emails": False,
+            "category": category,
+            "confidence": confidence,
+            "sub_intent": sub_intent,
+            "signals": signals,
+            "reply": reply.text,
+            "reply_source": reply.source,
+        }
+        if fields is not None:
+            response = {k: v for k, v in response.items() if k in fields or k not in serialization.RESULT_FIELDS}
+        if document.partial:
+            response["partial_extraction"] = document.partial
+        return jsonify(response)
+
+
+def _request_option(payload: dict, name: str):
+    # Query string primeiro; depois o corpo JSON e o formulário
+    value = request.args.get(name)
+    if value is None:
+        value = payload.get(name)
+    if value is None:
+        value = request.form.get(name)
+    return value
+
+
+@app.route("/api/documents/<doc_id>", methods=["GET"])
+def api_document(doc_id):
+    """
+    Texto original de um documento com múltiplos e-mails enviado pela interface.
+    ---
+    parameters:
+      - in: path
+        name: doc_id
+        type: string
+        required: true
+    produces:
+      - text/plain
+    responses:
+      200:
+        description: Texto extraído do documento
+      404:
+        description: Documento não encontrado ou expirado (DOCUMENTS_TTL)
+    """
+    text = documents.get_store().get(doc_id)
+    if text is None:
+        return jsonify({"error": "Documento não encontrado ou expirado"}), 404
+    return Response(text, mimetype="text/plain")
+
+
+@app.route("/api/documents/<doc_id>/emails/<int:position>", methods=["GET"])
+def api_document_email(doc_id, position):
+    """
+    Conteúdo completo de um e-mail do documento, pela posição nos resultados (a partir de 0).
+    ---
+    parameters:
+      - in: path
+        name: doc_id
+        type: string
+        required: true
+      - in: path
+        name: position
+        type: integer
+        required: true
+    responses:
+      200:
+        description: '{"id", "header", "content"}'
+      404:
+        description: Documento expirado ou posição inexistente
+    """
+    email = documents.get_store().email(doc_id, position)
+    if email is None:
+        return jsonify({"error": "E-mail não encontrado ou documento expirado"}), 404
+    return jsonify({"id": email["id"], "header": email["header"], "content": email["content"]})
+
+
+def _iter_ndjson_records(stream, max_record_bytes: int):
+    """
+    Lê o corpo linha a linha, sem carregar tudo em memória.
+    Gera (número da linha, registro) ou (número da linha, mensagem de erro).
+    """
+    line_no = 0
+    while True:
+        line = stream.readline(max_record_bytes + 1)
+        if not line:
+            break
+        line_no += 1
+        if len(line) > max_record_bytes and not line.endswith(b"\n"):
+            # Descarta o restante da linha grande demais
+            while line and not line.endswith(b"\n"):
+                line = stream.readline(max_record_bytes)
+            yield line_no, f"Registro maior que {max_record_bytes} bytes"
+            continue
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_no, f"JSON inválido: {e}"
+            continue
+        if not isinstance(record, dict):
+            yield line_no, "Cada linha deve ser um objeto JSON"
+            continue
+        yield line_no, record
+
+
+def _classify_record(line_no: int, record, tracker: DuplicateTracker | None = None) -> dict:
+    if isinstance(record, str):
+        return {"id": line_no, "error": record}
+
+    record_id = record.get("id", line_no)
+    text = record.get("text") or record.get("body") or ""
+    if not isinstance(text, str) or not text.strip():
+        return {"id": record_id, "error": "Registro sem 'text'"}
+    text = text.strip()
+
+    duplicate_of = None
+    position = representative = None
+    clf_result = None
+    if tracker is not None:
+        # Só registros que iriam ao modelo (ou ao LLM) passam pelo índice de quase-duplicatas
+        clf_result = classify_cheaply(text)
+        if tracker.wants(clf_result is not None):
+            position, representative = tracker.assign(text)
+        else:
+            tracker.skip()
+    if position != representative:
+        # Quase-duplicata de um registro anterior: reaproveita a classificação
+        duplicate_of, clf_result, reply = tracker.reuse(representative, text, count=clf_result is None)
+    else:
+        clf_result = clf_result or classify_email(text)
+        reply = generate_reply(text, clf_result["category"], clf_result.get("sub_intent"),
+                               backend=os.getenv("MODEL_BACKEND", "local"))
+        if tracker is not None:
+            tracker.remember(position, record_id, text, clf_result, reply)
+    result = {
+        "id": record_id,
+        "category": clf_result["category"],
+        "confidence": float(clf_result["confidence"]),
+        "sub_intent": clf_result.get("sub_intent"),
+        "signals": clf_result.get("signals", []),
+        "reply": reply.text,
+        "reply_source": reply.source,
+    }
+    if duplicate_of is not None:
+        result["duplicate_of"] = duplicate_of
+    return result
+
+
+@app.route("/api/classify/batch", methods=["POST"])
+def api_classify_batch():
+    """
+    Classifica vários e-mails enviados como NDJSON (um objeto JSON por linha).
+    Cada linha de resposta é enviada assim que o registro correspondente fica pronto.
+    ---
+    consumes:
+      - application/x-ndjson
+    produces:
+      - application/x-ndjson
+    parameters:
+      - in: body
+        name: records
+        required: true
+        description: 'Uma linha por e-mail: {"id": "opcional", "text": "..."}'
+        schema:
+          type: string
+          example: '{"id": 1, "text": "Qual o status do chamado #123?"}'
+    responses:
+      200:
+        description: >-
+          Uma linha por registro: {"id", "category", "confidence", "sub_intent", "signals", "reply",
+          "reply_source", "duplicate_of"?} ou {"id", "error"}; a última linha é
+          {"summary": {"emails", "clusters", "duplicates", "largest_cluster"}}
+    """
+    # Stream direto do WSGI: o limite global de 10 MB não se aplica a este endpoint
+    stream = get_input_stream(request.environ, max_content_length=BATCH_MAX_CONTENT_LENGTH)
+
+    def generate():
+        tracker = DuplicateTracker(DEDUP_STREAM_MAX_ITEMS) if DEDUP_ENABLED else None
+        for line_no, record in _iter_ndjson_records(stream, BATCH_MAX_RECORD_BYTES):
+            result = _classify_record(line_no, record, tracker)
+            yield dumps(result) + "\n"
+        if tracker is not None:
+            yield dumps({"summary": tracker.stats()}) + "\n"
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="application/x-ndjson",
+        headers={"X-Accel-Buffering": "no", "Cache-Control": "no-cache"},
+    )
+
+
+@app.route("/api/classify/upload", methods=["POST"])
+def api_classify_upload():
+    """
+    Classifica uma exportação .txt grande (centenas de MB) enviada como corpo
+    bruto do request. O arquivo é gravado em disco e mapeado em memória; os
+    e-mails são separados e decodificados aos poucos e cada lote é enviado
+    assim que fica pronto. Limite próprio: UPLOAD_MAX_CONTENT_LENGTH.
+    ---
+    consumes:
+      - text/plain
+      - application/octet-stream
+    produces:
+      - application/x-ndjson
+    parameters:
+      - in: body
+        name: export
+        required: true
+        description: 'Conteúdo do .txt (UTF-8 ou latin-1), com e-mails marcados por "EMAIL N" ou cabeçalhos De:/From:'
+        schema:
+          type: string
+    responses:
+      200:
+        description: 'Uma linha por e-mail (mesmo formato de multiple_emails em /api/classify); a última linha é {"summary": {"emails", "bytes", "clusters"?, ...}}'
+      413:
+        description: Corpo maior que UPLOAD_MAX_CONTENT_LENGTH
+    """
+    # Stream direto do WSGI: o limite global de 10 MB não se aplica a este endpoint
+    stream = get_input_stream(request.environ, max_content_length=uploads.UPLOAD_MAX_CONTENT_LENGTH)
+    mapped = uploads.MappedUpload(uploads.spool(stream))
+
+    def generate():
+        tracker = DuplicateTracker(DEDUP_STREAM_MAX_ITEMS) if DEDUP_ENABLED else None
+        emails = 0
+        for batch in mapped.iter_batches(tracker):
+            for email in batch:
+                yield dumps(email) + "\n"
+            emails += len(batch)
+        summary = {"emails": emails, "bytes": mapped.size, **(tracker.stats() if tracker is not None else {})}
+        yield dumps({"summary": summary}) + "\n"
+
+    response = Response(
+        stream_with_context(generate()),
+        mimetype="application/x-ndjson",
+        headers={"X-Accel-Buffering": "no", "Cache-Control": "no-cache"},
+    )
+    # Desfaz o mapeamento e apaga o arquivo temporário no fim da resposta (ou se o cliente desconectar)
+    response.call_on_close(mapped.close)
+    return response
+
+
+@app.route("/api/jobs", methods=["POST"])
+def api_jobs_submit():
+    """
+    Envia um texto ou arquivo para classificação em segundo plano.
+    ---
+    consumes:
+      - application/json
+      - multipart/form-data
+    parameters:
+      - in: body
+        name: payload
+        required: false
+        schema:
+          type: object
+          properties:
+            text:
+              type: string
+      - in: formData
+        name: text
+        type: string
+        required: false
+      - in: formData
+        name: file
+        type: file
+        required: false
+        description: Arquivo .txt, .pdf, .eml ou .mbox
+    responses:
+      202:
+        description: 'Job criado: {"id", "status", "status_url", "results_url"}'
+      400:
+        description: Requisição inválida
+    """
+    text = ""
+    if request.is_json:
+        payload = request.get_json(silent=True) or {}
+        text = (payload.get("text") or "").strip()
+    if not text:
+        text = (request.form.get("text") or "").strip()
+
+    if text:
+        job_id = jobs.submit(text=text)
+    elif "file" in request.files and request.files["file"].filename:
+        file = request.files["file"]
+        if not allowed_file(file.filename):
+            return jsonify({"error": f"Formato não suportado: {file.filename}"}), 400
+        job_id = jobs.submit(filename=secure_filename(file.filename), payload=file.read())
+    else:
+        return jsonify({"error": "Forneça 'text' no JSON ou um arquivo .txt/.pdf/.eml/.mbox"}), 400
+
+    return jsonify({
+        "id": job_id,
+        "status": "queued",
+        "status_url": f"/api/jobs/{job_id}",
+        "results_url": f"/api/jobs/{job_id}/results",
+    }), 202
+
+
+@app.route("/api/jobs/<job_id>", methods=["GET"])
+def api_jobs_status(job_id):
+    """
+    Estado e progresso de um job.
+    ---
+    parameters:
+      - in: path
+        name: job_id
+        type: string
+        required: true
+    responses:
+      200:
+        description: '{"id", "status" (queued/running/done/failed), "total", "done", "progress", "is_multi", "partial", "error", ...}'
+      404:
+        description: Job não encontrado
+    """
+    status = jobs.job_status(job_id)
+    if status is None:
+        return jsonify({"error": "Job não encontrado"}), 404
+    return jsonify(status)
+
+
+@app.route("/api/jobs/<job_id>/results", methods=["GET"])
+def api_jobs_results(job_id):
+    """
+    Resultados já gravados de um job (disponíveis durante o processamento).
+    ---
+    parameters:
+      - in: path
+        name: job_id
+        type: string
+        required: true
+      - in: query
+        name: offset
+        type: integer
+        default: 0
+      - in: query
+        name: limit
+        type: integer
+        default: 100
+    responses:
+      200:
+        description: '{"id", "status", "total", "done", "offset", "results", "next_offset"}; results segue o formato de /api/classify'
+      404:
+        description: Job não encontrado
+    """
+    status = jobs.job_status(job_id)
+    if status is None:
+        return jsonify({"error": "Job não encontrado"}), 404
+    offset = max(request.args.get("offset", 0, type=int), 0)
+    limit = min(max(request.args.get("limit", 100, type=int), 1), 1000)
+    results = jobs.job_results(job_id, offset, limit)
+    next_offset = offset + len(results)
+    return jsonify({
+        "id": job_id,
+        "status": status["status"],
+        "is_multi": status["is_multi"],
+        "total": status["total"],
+        "done": status["done"],
+        "offset": offset,
+        "results": results,
+        "next_offset": next_offset if next_offset < status["done"] else None,
+    })
+
+
+@app.route("/ready", methods=["GET"])
+def ready():
+    """
+    Prontidão do worker: indica se o modelo zero-shot está carregado.
+    ---
+    responses:
+      200:
+        description: Pronto (modelo carregado, ou não necessário no modo heurístico)
+      503:
+        description: Modelo ainda não carregado ou com falha (ver last_error/retry_in_seconds)
+    """
+    status = model_status()
+    status["ready"] = status["loaded"] or not status["required"]
+    return jsonify(status), (200 if status["ready"] else 503)
+
+
+@app.route("/api/cache/stats", methods=["GET"])
+def api_cache_stats():
+    """
+    Contadores do cache de classificações/respostas deste worker.
+    ---
+    responses:
+      200:
+        description: Acertos, falhas, remoções e tamanho do cache
+    """
+    return jsonify(content_cache.stats())
+
+
+@app.route("/api/classify/stats", methods=["GET"])
+def api_classify_stats():
+    """
+    Contadores da cascata de classificação e da origem das respostas deste worker.
+    ---
+    responses:
+      200:
+        description: >-
+          E-mails decididos por camada (cache, heurística, modelo, fallback), fração que chegou ao modelo,
+          respostas por origem (llm, cache, template, error) e lotes da fila de micro-batching deste processo
+    """
+    stats = tier_stats()
+    stats["replies"] = reply_stats()
+    return jsonify(stats)
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """
+    Métricas no formato Prometheus (todos os workers do gunicorn).
+    ---
+    produces:
+      - text/plain
+    responses:
+      200:
+        description: Histogramas por etapa (autou_stage_duration_seconds) e contadores de classificações, respostas e falhas do modelo
+    """
+    body, content_type = render_metrics()
+    return Response(body, content_type=content_type)
 
 
 if __name__ == "__main__":
+    jobs.get_manager()  # retoma jobs pendentes
     app.run(host="0.0.0.0", port=int(os.getenv("PORT", 5000)))
@@ -0,0 +1,345 @@
+"""
+Classificação offline em lote de exportações de e-mail.
+
+Lê arquivos .txt/.pdf/.jsonl/.eml/.mbox (ou diretórios com eles), separa os
+e-mails com nlp.split_emails, classifica e gera a resposta sugerida em um pool
+de processos (cada worker carrega o modelo uma única vez) e grava o resultado
+em JSONL ou CSV. De um .mbox o processo principal só lê o índice de offsets
+(mail_extract); cada worker decodifica a própria faixa de mensagens direto do
+arquivo. Com --resume, e-mails já presentes na saída são pulados.
+
+Uso:
+    python batch_classify.py exports/ outros.jsonl -o resultados.jsonl --workers 4
+    python batch_classify.py caixa.mbox -o resultados.jsonl --resume
+"""
+import os
+import io
+import sys
+import csv
+import json
+import time
+import argparse
+import multiprocessing as mp
+from typing import Dict, Iterator, List, Tuple
+
+import nlp
+import mail_extract
+from responders import suggest_replies
+
+
+INPUT_EXTENSIONS = ('.txt', '.pdf', '.jsonl') + mail_extract.MAIL_EXTENSIONS
+STAGE_UNITS = {
+    'extract': 'por arquivo',
+    'decode': 'por mensagem',
+    'classify': 'média por e-mail de cada lote, não latência por e-mail',
+    'reply': 'média por e-mail de cada lote, não latência por e-mail',
+}
+BATCH_STAGES = ('classify', 'reply')
+CSV_FIELDS = ['source', 'id', 'header', 'category', 'confidence', 'sub_intent', 'signals', 'category_hint', 'reply', 'reply_source']
+
+
+def iter_input_files(paths: List[str]) -> Iterator[str]:
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for name in sorted(files):
+                    if name.lower().endswith(INPUT_EXTENSIONS):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def iter_emails(path: str, timings: Dict[str, List[float]]) -> Iterator[Dict]:
+    """
+    Gera os e-mails de um arquivo: uma linha por e-mail em .jsonl, as seções
+    de split_emails em .txt/.pdf, ou só a posição de cada mensagem em .eml/.mbox.
+    Arquivo que não pôde ser lido (PDF inválido, por exemplo) não gera e-mails:
+    o erro vai para timings['errors']. Linhas de .jsonl inválidas ou sem texto
+    são puladas e vão para timings['invalid'].
+    """
+    timings['files'].append(path)
+    if path.lower().endswith(mail_extract.MAIL_EXTENSIONS):
+        t0 = time.perf_counter()
+        with mail_extract.MailFile(path) as mail:
+            refs = mail.index().refs
+        timings['extract'].append(time.perf_counter() - t0)
+        for ref in refs:
+            yield {'source': path, 'id': ref.id, 'ref': tuple(ref)}
+        return
+
+    if path.lower().endswith('.jsonl'):
+        with open(path, encoding='utf-8', errors='replace') as f:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    error = 'JSON inválido'
+                else:
+                    text = (record.get('text') or record.get('body')) if isinstance(record, dict) else None
+                    error = None if isinstance(text, str) else "sem 'text' (string)"
+                if error:
+                    timings.setdefault('invalid', []).append({'source': path, 'line': line_no, 'error': error})
+                    continue
+                yield {
+                    'source': path,
+                    'id': str(record.get('id', record.get('request_id', line_no))),
+                    'header': record.get('title', '') or '',
+                    'content': text.strip(),
+                    'category_hint': record.get('category') or record.get('label'),
+                }
+        return
+
+    t0 = time.perf_counter()
+    with open(path, 'rb') as f:
+        document = nlp.extract_text_from_file(path, io.BytesIO(f.read()))
+    timings['extract'].append(time.perf_counter() - t0)
+    if document.error:
+        timings.setdefault('errors', []).append({'source': path, 'error': document.error})
+        return
+    spans = document.spans if document.spans is not None else nlp.iter_email_spans(document.text)
+    for span in spans:
+        yield {'source': path, **span.to_dict(document.text)}
+
+
+def _init_worker():
+    # Carrega o modelo uma vez por processo
+    nlp._get_classifier_model()
+
+
+# Arquivo .eml/.mbox aberto no worker (um por vez: as faixas chegam em ordem)
+_MAIL_FILES: Dict[str, mail_extract.MailFile] = {}
+
+
+def _load_messages(emails: List[Dict]) -> Tuple[List[Dict], List[float]]:
+    # Mensagens chegam só com os offsets: o worker decodifica a sua faixa
+    # (e mede cada mensagem decodificada)
+    loaded, durations = [], []
+    for email_data in emails:
+        if 'content' not in email_data:
+            t0 = time.perf_counter()
+            path = email_data['source']
+            mail = _MAIL_FILES.get(path)
+            if mail is None:
+                for other in _MAIL_FILES.values():
+                    other.close()
+                _MAIL_FILES.clear()
+                mail = _MAIL_FILES[path] = mail_extract.MailFile(path)
+            email_data = {'source': path, **mail.message(mail_extract.MessageRef(*email_data['ref']))}
+            durations.append(time.perf_counter() - t0)
+            if len(email_data['content'].strip()) < 10:  # Pula conteúdo muito pequeno
+                continue
+        loaded.append(email_data)
+    return loaded, durations
+
+
+def _process_chunk(args: Tuple[List[Dict], str]) -> Tuple[List[Dict], Dict[str, List[float]]]:
+    emails, backend = args
+    stage = {'decode': [], 'classify': [], 'reply': []}
+    emails, stage['decode'] = _load_messages(emails)
+    if not emails:
+        return [], stage
+
+    # Classificação e respostas rodam no lote inteiro (as respostas em paralelo
+    # no backend openai): não há tempo por e-mail, só a média de cada lote
+    t0 = time.perf_counter()
+    classifications = nlp.classify_emails_batch([e['content'] for e in emails])
+    stage['classify'] = [(time.perf_counter() - t0) / len(emails)]
+
+    t0 = time.perf_counter()
+    replies = suggest_replies([(e['content'], c['category'], c.get('sub_intent')) for e, c in zip(emails, classifications)],
+                              backend=backend)
+    stage['reply'] = [(time.perf_counter() - t0) / len(emails)]
+
+    results = []
+    for email_data, clf, reply in zip(emails, classifications, replies):
+        results.append({
+            'source': email_data['source'],
+            'id': email_data['id'],
+            'header': email_data.get('header', ''),
+            'category': clf['category'],
+            'confidence': float(clf['confidence']),
+            'sub_intent': clf.get('sub_intent'),
+            'signals': clf.get('signals', []),
+            'category_hint': email_data.get('category_hint'),
+            'reply': reply.text,
+            'reply_source': reply.source,
+        })
+    return results, stage
+
+
+def _iter_chunks(emails: Iterator[Dict], size: int, backend: str) -> Iterator[Tuple[List[Dict], str]]:
+    chunk = []
+    for email_data in emails:
+        # .eml/.mbox: o tamanho só é conhecido no worker, depois de decodificar
+        if 'content' in email_data and len(email_data['content'].strip()) < 10:  # Pula conteúdo muito pequeno
+            continue
+        chunk.append(email_data)
+        if len(chunk) >= size:
+            yield chunk, backend
+            chunk = []
+    if chunk:
+        yield chunk, backend
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def read_done(path: str, fmt: str) -> set:
+    """
+    (arquivo, id) dos resultados gravados por uma execução anterior; uma
+    última linha incompleta (execução interrompida) é descartada do arquivo
+    """
+    if path == '-' or not os.path.exists(path):
+        return set()
+    with open(path, 'rb+') as f:
+        data = f.read()
+        complete = data.rfind(b'\n') + 1
+        if complete < len(data):
+            f.truncate(complete)
+    lines = data[:complete].decode('utf-8', errors='replace').splitlines()
+    if fmt == 'csv':
+        return {(row.get('source'), row.get('id')) for row in csv.DictReader(lines)}
+    done = set()
+    for line in lines:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(record, dict):
+            done.add((record.get('source'), record.get('id')))
+    return done
+
+
+class ResultWriter:
+    def __init__(self, path: str, fmt: str, append: bool = False):
+        self.fmt = fmt
+        append = append and path != '-' and os.path.exists(path) and os.path.getsize(path) > 0
+        self._f = sys.stdout if path == '-' else open(path, 'a' if append else 'w', encoding='utf-8', newline='')
+        self._csv = None
+        if fmt == 'csv':
+            self._csv = csv.DictWriter(self._f, fieldnames=CSV_FIELDS, extrasaction='ignore')
+            if not append:
+                self._csv.writeheader()
+
+    def write(self, result: Dict) -> None:
+        if self._csv is not None:
+            self._csv.writerow({**result, 'signals': ';'.join(result['signals'])})
+        else:
+            self._f.write(json.dumps(result, ensure_ascii=False) + '\n')
+
+    def close(self) -> None:
+        if self._f is not sys.stdout:
+            self._f.close()
+
+
+def run(paths: List[str], output: str, fmt: str, workers: int, chunk_size: int, backend: str,
+        resume: bool = False) -> Dict:
+    timings = {'files': [], 'extract': [], 'decode': [], 'classify': [], 'reply': []}
+    emails = (e for path in iter_input_files(paths) for e in iter_emails(path, timings))
+    done = read_done(output, fmt) if resume else set()
+    skipped = 0
+    if done:
+        def pending(emails):
+            nonlocal skipped
+            for email_data in emails:
+                if (email_data['source'], email_data['id']) in done:
+                    skipped += 1
+                    continue
+                yield email_data
+        emails = pending(emails)
+    chunks = _iter_chunks(emails, chunk_size, backend)
+
+    writer = ResultWriter(output, fmt, append=resume)
+    total = 0
+    started = time.perf_counter()
+    pool = None
+    try:
+        if workers <= 1:
+            _init_worker()
+            outputs = map(_process_chunk, chunks)
+        else:
+            pool = mp.Pool(workers, initializer=_init_worker)
+            outputs = pool.imap(_process_chunk, chunks)
+        for results, stage in outputs:
+            for result in results:
+                writer.write(result)
+            total += len(results)
+            timings['decode'].extend(stage['decode'])
+            timings['classify'].extend(stage['classify'])
+            timings['reply'].extend(stage['reply'])
+        if pool is not None:
+            pool.close()
+            pool.join()
+    finally:
+        if pool is not None:
+            pool.terminate()
+        writer.close()
+
+    elapsed = time.perf_counter() - started
+    summary = {
+        'emails': total,
+        'skipped': skipped,
+        'files': len(timings.pop('files')),
+        'errors': timings.pop('errors', []),
+        'invalid': timings.pop('invalid', []),
+        'workers': workers,
+        'seconds': round(elapsed, 3),
+        'emails_per_sec': round(total / elapsed, 2) if elapsed > 0 else 0.0,
+    }
+    # extract: por arquivo; decode: por mensagem .eml/.mbox; classify/reply:
+    # média por e-mail de cada lote (chaves *_chunk_*)
+    for name, values in timings.items():
+        if name in BATCH_STAGES:
+            name = f'{name}_chunk'
+        summary[f'{name}_p50_ms'] = round(percentile(values, 50) * 1000, 3)
+        summary[f'{name}_p95_ms'] = round(percentile(values, 95) * 1000, 3)
+    return summary
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description='Classificação offline de e-mails em lote')
+    parser.add_argument('paths', nargs='+', help='Arquivos .txt/.pdf/.jsonl/.eml/.mbox ou diretórios')
+    parser.add_argument('-o', '--output', default='-', help='Arquivo de saída (padrão: stdout)')
+    parser.add_argument('-f', '--format', choices=['jsonl', 'csv'], help='Formato de saída (padrão: pela extensão)')
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--chunk-size', type=int, default=nlp.ZSC_BATCH_SIZE, help='E-mails por tarefa enviada ao worker')
+    parser.add_argument('--backend', default=os.getenv('MODEL_BACKEND', 'local'), help='Backend de resposta (local/openai)')
+    parser.add_argument('--resume', action='store_true', help='Acrescenta à saída, pulando e-mails já classificados nela')
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ('csv' if args.output.lower().endswith('.csv') else 'jsonl')
+    summary = run(args.paths, args.output, fmt, max(1, args.workers), max(1, args.chunk_size), args.backend,
+                  args.resume)
+
+    print(
+        f"{summary['emails']} e-mails de {summary['files']} arquivo(s) em {summary['seconds']:.2f}s "
+        f"({summary['emails_per_sec']:.1f} e-mails/s, {summary['workers']} worker(s))",
+        file=sys.stderr,
+    )
+    if summary['skipped']:
+        print(f"  {summary['skipped']} e-mail(s) já classificados na saída foram pulados", file=sys.stderr)
+    for error in summary['errors']:
+        print(f"  arquivo ignorado: {error['source']}: {error['error']}", file=sys.stderr)
+    for record in summary['invalid']:
+        print(f"  registro ignorado: {record['source']}:{record['line']}: {record['error']}", file=sys.stderr)
+    for name, unit in STAGE_UNITS.items():
+        key = f'{name}_chunk' if name in BATCH_STAGES else name
+        print(
+            f"  {key:14s} p50 {summary[f'{key}_p50_ms']:9.3f} ms  p95 {summary[f'{key}_p95_ms']:9.3f} ms  ({unit})",
+            file=sys.stderr,
+        )
+    return 1 if summary['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,137 @@
+"""
+Compara os backends de inferência do zero-shot (torch float32, int8, onnx).
+
+Cada backend roda em um subprocesso próprio (RSS medido sem interferência),
+totalmente offline, sobre um checkpoint pequeno salvo localmente e o corpus
+fixo benchmarks/data/emails.jsonl. Relata tempo de carga, latência por e-mail
+(p50/p95), RSS e concordância de labels com o baseline float32.
+
+Preparar o checkpoint (uma vez, com internet):
+    python benchmarks/bench_backends.py --model models/distilbart-mnli --save-checkpoint valhalla/distilbart-mnli-12-1
+
+Rodar:
+    python benchmarks/bench_backends.py --model models/distilbart-mnli
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_CORPUS = os.path.join(ROOT, 'benchmarks', 'data', 'emails.jsonl')
+
+
+def load_corpus(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def run_worker(args):
+    # Executado no subprocesso: ambiente já configurado com ZSC_MODEL/ZSC_BACKEND
+    import nlp
+
+    corpus = load_corpus(args.corpus)
+    t0 = time.perf_counter()
+    zsc = nlp._get_zero_shot_pipeline()
+    load_seconds = time.perf_counter() - t0
+    if zsc is None:
+        print(json.dumps({'error': nlp.model_status()['last_error']}))
+        return 1
+
+    texts = [nlp.normalize_text(r['text'])[:nlp.ZSC_MAX_CHARS] for r in corpus]
+    zsc(texts[0], candidate_labels=nlp.ZSC_LABELS)  # aquecimento
+
+    latencies = []
+    labels = []
+    for _ in range(args.repeat):
+        labels = []
+        for text in texts:
+            t = time.perf_counter()
+            res = zsc(text, candidate_labels=nlp.ZSC_LABELS)
+            latencies.append(time.perf_counter() - t)
+            labels.append(nlp._zero_shot_category(res)[0])
+
+    print(json.dumps({
+        'load_seconds': load_seconds,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'rss_mb': (nlp._rss_bytes() or 0) / 2**20,
+        'weights_mb': (nlp.model_status()['memory_bytes'] or 0) / 2**20,
+        'labels': labels,
+        'accuracy': sum(label == r['category'] for label, r in zip(labels, corpus)) / len(corpus),
+    }))
+    return 0
+
+
+def save_checkpoint(hub_id, path):
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+    AutoTokenizer.from_pretrained(hub_id).save_pretrained(path)
+    AutoModelForSequenceClassification.from_pretrained(hub_id).save_pretrained(path)
+    print(f"checkpoint salvo em {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--model', required=True, help='Diretório do checkpoint local')
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS)
+    parser.add_argument('--backends', default='torch,int8,onnx')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--save-checkpoint', metavar='HUB_ID', help='Baixa HUB_ID e salva em --model')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        return run_worker(args)
+    if args.save_checkpoint:
+        save_checkpoint(args.save_checkpoint, args.model)
+        return 0
+
+    results = {}
+    for backend in args.backends.split(','):
+        env = dict(
+            os.environ,
+            ZSC_MODEL=os.path.abspath(args.model),
+            ZSC_BACKEND=backend,
+            ZSC_ONNX_PATH='',
+            HF_HUB_OFFLINE='1',
+            TRANSFORMERS_OFFLINE='1',
+            CLASSIFY_CACHE_SIZE='0',
+        )
+        env.pop('RENDER', None)
+        cmd = [sys.executable, os.path.abspath(__file__), '--worker', backend, '--model', args.model,
+               '--corpus', args.corpus, '--repeat', str(args.repeat)]
+        proc = subprocess.run(cmd, env=env, capture_output=True, text=True)
+        lines = proc.stdout.strip().splitlines()
+        try:
+            results[backend] = json.loads(lines[-1])
+        except (IndexError, ValueError):
+            results[backend] = {'error': (proc.stderr.strip().splitlines() or ['sem saída'])[-1]}
+
+    baseline = results.get('torch', {}).get('labels')
+    print(f"{'backend':8s} {'carga s':>8s} {'p50 ms':>8s} {'p95 ms':>8s} {'RSS MB':>8s} {'pesos MB':>9s} {'acurácia':>9s} {'concord.':>9s}")
+    for backend, r in results.items():
+        if 'error' in r:
+            print(f"{backend:8s} erro: {r['error']}")
+            continue
+        agreement = (
+            sum(a == b for a, b in zip(r['labels'], baseline)) / len(baseline) if baseline else float('nan')
+        )
+        print(f"{backend:8s} {r['load_seconds']:8.2f} {r['p50_ms']:8.1f} {r['p95_ms']:8.1f} {r['rss_mb']:8.0f} "
+              f"{r['weights_mb']:9.0f} {r['accuracy']:9.2%} {agreement:9.2%}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,97 @@
+"""
+Micro-benchmark do matcher de palavras-chave/sub-intenções.
+
+Compara detect_sub_intent/heuristic_classifier atuais com as versões antigas
+(um re.search por padrão e um `in` por palavra) e confere que os resultados
+são idênticos.
+
+Uso: python benchmarks/bench_keywords.py [--emails 2000] [--repeat 5]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import nlp  # noqa: E402
+
+
+def legacy_detect_sub_intent(text):
+    hits = []
+    chosen = None
+    for intent, patterns in nlp.SUB_INTENT_PATTERNS.items():
+        for p in patterns:
+            if re.search(p, text, flags=re.IGNORECASE):
+                hits.append((intent, p))
+    if hits:
+        for o in ['status_update', 'attachment', 'greetings']:
+            if any(h[0] == o for h in hits):
+                chosen = o
+                break
+    return chosen, [f"{i}:{p}" for i, p in hits]
+
+
+def legacy_heuristic_classifier(pre):
+    score = 0
+    for p in nlp.HEURISTIC_PROD:
+        if p in pre:
+            score += 1
+    for q in nlp.HEURISTIC_IMPR:
+        if q in pre:
+            score -= 1
+    if score >= 1:
+        return 'Produtivo', 0.75
+    elif score <= -1:
+        return 'Improdutivo', 0.75
+    return 'Improdutivo', 0.55
+
+
+WORDS = (
+    "Prezados bom dia gostaria saber sobre pagamento cliente sistema equipe reunião ontem hoje "
+    "amanhã favor verificar andamento chamado obrigado status previsão caso anexo arquivo segue "
+    "documento feliz natal parabéns Boas Festas thanks congratulations erro falha boleto fatura "
+    "acesso conta protocolo suporte dúvida problema atualização prazo"
+).split()
+
+
+def make_corpus(n, seed=42):
+    rnd = random.Random(seed)
+    corpus = []
+    for _ in range(n):
+        length = rnd.choice([20, 60, 150, 400])
+        raw = nlp.normalize_text(' '.join(rnd.choice(WORDS) for _ in range(length)))
+        corpus.append((raw, nlp.preprocess(raw)))
+    return corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--emails', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.emails)
+
+    for raw, pre in corpus:
+        assert nlp.detect_sub_intent(raw) == legacy_detect_sub_intent(raw), raw
+        assert nlp.heuristic_classifier(pre) == legacy_heuristic_classifier(pre), pre
+    print(f"resultados idênticos em {len(corpus)} e-mails")
+
+    cases = [
+        ('detect_sub_intent', legacy_detect_sub_intent, nlp.detect_sub_intent, 0),
+        ('heuristic_classifier', legacy_heuristic_classifier, nlp.heuristic_classifier, 1),
+    ]
+    for name, old, new, col in cases:
+        texts = [c[col] for c in corpus]
+        t_old = min(timeit.repeat(lambda: [old(t) for t in texts], number=1, repeat=args.repeat))
+        t_new = min(timeit.repeat(lambda: [new(t) for t in texts], number=1, repeat=args.repeat))
+        per_old = t_old / len(texts) * 1e6
+        per_new = t_new / len(texts) * 1e6
+        print(f"{name:22s} antigo {per_old:8.1f} µs/e-mail  novo {per_new:8.1f} µs/e-mail  ({t_old / t_new:.2f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+Compara a geração de respostas pelo backend openai em série e em paralelo.
+
+Sobe benchmarks/fake_openai.py em uma thread (latência e erros simulados) e
+aponta o cliente compartilhado de responders para ele. Relata tempo total,
+respostas por origem (llm/template) e o pico de chamadas simultâneas.
+
+Uso:
+    python benchmarks/bench_replies.py --emails 100 --latency 0.2 --error-rate 0.05
+"""
+import argparse
+import os
+import sys
+import time
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(ROOT))
+sys.path.insert(0, ROOT)
+
+from fake_openai import start_background  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--emails', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.2)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--slow-rate', type=float, default=0.0)
+    parser.add_argument('--timeout', type=float, default=2.0, help='OPENAI_TIMEOUT usado no teste')
+    args = parser.parse_args()
+
+    server = start_background(latency=args.latency, error_rate=args.error_rate, slow_rate=args.slow_rate,
+                              slow_latency=args.timeout * 2)
+    os.environ.update({
+        'OPENAI_BASE_URL': f"http://127.0.0.1:{server.server_address[1]}/v1",
+        'OPENAI_API_KEY': 'fake',
+        'OPENAI_TIMEOUT': str(args.timeout),
+        'CLASSIFY_CACHE_SIZE': '0',  # cada e-mail vira uma chamada
+    })
+    import responders
+
+    items = [(f"Qual o status do chamado #{i:05d}?", 'Produtivo', 'status_update') for i in range(args.emails)]
+
+    print(f"{'modo':10s} {'tempo s':>8s} {'llm':>5s} {'template':>9s} {'pico':>5s} {'conexões':>9s}")
+    for mode in ('serial', 'paralelo'):
+        server.stats.update(requests=0, errors=0, max_inflight=0, connections=set())
+        t0 = time.perf_counter()
+        if mode == 'serial':
+            replies = [responders.generate_reply(t, c, s, backend='openai') for t, c, s in items]
+        else:
+            replies = responders.suggest_replies(items, backend='openai')
+        elapsed = time.perf_counter() - t0
+        sources = Counter(r.source for r in replies)
+        print(f"{mode:10s} {elapsed:8.2f} {sources['llm']:5d} {sources['template']:9d} "
+              f"{server.stats['max_inflight']:5d} {len(server.stats['connections']):9d}")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
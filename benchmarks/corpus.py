@@ -0,0 +1,182 @@
+"""
+Gerador de corpus sintético PT/EN para os benchmarks (determinístico pela semente).
+
+Gera e-mails rotulados (Produtivo/Improdutivo), arquivos TXT com vários e-mails
+nos formatos "EMAIL N - ..." e "De:/From:" e PDFs de texto com N páginas, sem
+dependências externas (o PDF é escrito à mão, fonte Helvetica/WinAnsi).
+
+Uso:
+    python benchmarks/corpus.py --out benchmarks/data/synthetic --emails 200 --pdf-pages 1,10,50
+"""
+import argparse
+import json
+import os
+import random
+from typing import Dict, List
+
+NAMES = ['Maria Souza', 'João Pereira', 'Ana Lima', 'Carlos Alberto', 'Fernanda Rocha', 'Paulo Mendes',
+         'Emily Carter', 'James Wilson', 'Laura Smith', 'Ricardo Alves']
+DOMAINS = ['empresa.com.br', 'cliente.com', 'fintech.io', 'loja.com', 'example.org']
+
+PT_PRODUCTIVE = [
+    'Poderiam informar o andamento do chamado #{ticket}? Preciso de uma previsão para hoje.',
+    'Estou com problema ao acessar minha conta desde ontem, aparece um erro na tela de login.',
+    'Segue anexo o documento solicitado para análise do protocolo {ticket}.',
+    'A fatura deste mês veio com valor errado. Podem verificar com urgência?',
+    'Qual o status da minha solicitação {ticket}? O sistema continua travando no pagamento.',
+    'Preciso de suporte: o aplicativo não carrega o extrato e o prazo vence amanhã.',
+]
+PT_UNPRODUCTIVE = [
+    'Feliz Natal e boas festas a toda a equipe!',
+    'Parabéns pelo excelente trabalho neste ano, obrigado pela parceria.',
+    'Muito obrigado pela atenção de sempre. Tenham um ótimo fim de semana!',
+    'Bom dia a todos, desejo uma excelente semana.',
+]
+EN_PRODUCTIVE = [
+    'Could you please update me on the status of ticket #{ticket}? It is still failing.',
+    'I cannot access my account, the login page shows an error since yesterday.',
+    'Please find attached the invoice for case {ticket}, the amount seems wrong.',
+]
+EN_UNPRODUCTIVE = [
+    'Thank you so much for the help, have a great weekend!',
+    'Congratulations on the launch, great job everyone.',
+    'Happy holidays to the whole team!',
+]
+FILLER_PT = [
+    'Fico no aguardo do retorno.', 'Qualquer dúvida estou à disposição.',
+    'Encaminho também para o time financeiro.', 'Conforme conversamos por telefone.',
+]
+FILLER_EN = ['Looking forward to your reply.', 'Let me know if you need anything else.', 'As discussed on the phone.']
+
+
+def generate_emails(n: int, seed: int = 42, en_ratio: float = 0.3, long_ratio: float = 0.1) -> List[Dict]:
+    """
+    Gera `n` e-mails: {'id', 'lang', 'category', 'sender', 'subject', 'text'}
+    """
+    rng = random.Random(seed)
+    emails = []
+    for i in range(n):
+        lang = 'en' if rng.random() < en_ratio else 'pt'
+        productive = rng.random() < 0.6
+        pool = {
+            ('pt', True): PT_PRODUCTIVE, ('pt', False): PT_UNPRODUCTIVE,
+            ('en', True): EN_PRODUCTIVE, ('en', False): EN_UNPRODUCTIVE,
+        }[(lang, productive)]
+        filler = FILLER_PT if lang == 'pt' else FILLER_EN
+        name = rng.choice(NAMES)
+        ticket = f"{rng.randint(2020, 2026)}-{rng.randint(1, 99999):05d}"
+        body = [rng.choice(pool).format(ticket=ticket)]
+        body += rng.sample(filler, k=rng.randint(0, 2))
+        if rng.random() < long_ratio:
+            # Thread longa com citações: o pedido fica no fim
+            quoted = ' '.join(rng.choice(filler) for _ in range(rng.randint(40, 120)))
+            body = [f"> {quoted}"] + body
+        closing = 'Atenciosamente,' if lang == 'pt' else 'Best regards,'
+        text = ' '.join(body) + f"\n{closing}\n{name}"
+        emails.append({
+            'id': i + 1,
+            'lang': lang,
+            'category': 'Produtivo' if productive else 'Improdutivo',
+            'sender': f"{name.split()[0].lower()}@{rng.choice(DOMAINS)}",
+            'subject': body[-1][:40] if len(body) == 1 else body[0][:40].lstrip('> '),
+            'text': text,
+        })
+    return emails
+
+
+def multi_email_txt(emails: List[Dict], fmt: str = 'email_n') -> str:
+    """
+    Junta os e-mails em um arquivo: 'email_n' (EMAIL N - CATEGORIA) ou
+    'headers' (blocos De:/From: + Assunto:/Subject:)
+    """
+    blocks = []
+    for e in emails:
+        if fmt == 'email_n':
+            blocks.append(f"EMAIL {e['id']} - {e['category'].upper()}\n{e['text']}\n")
+        else:
+            de, assunto = ('De:', 'Assunto:') if e['lang'] == 'pt' else ('From:', 'Subject:')
+            blocks.append(f"{de} {e['sender']}\n{assunto} {e['subject']}\n\n{e['text']}\n")
+    return '\n'.join(blocks)
+
+
+def _pdf_escape(line: str) -> bytes:
+    data = line.encode('cp1252', errors='replace')
+    return data.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+
+
+def make_pdf(text: str, pages: int, lines_per_page: int = 45, width: int = 95) -> bytes:
+    """
+    PDF de texto com exatamente `pages` páginas de `lines_per_page` linhas; o
+    texto é quebrado em linhas, repetido ou cortado para preencher as páginas
+    """
+    lines = []
+    for paragraph in text.splitlines() or ['']:
+        while len(paragraph) > width:
+            cut = paragraph.rfind(' ', 0, width)
+            cut = cut if cut > 0 else width
+            lines.append(paragraph[:cut])
+            paragraph = paragraph[cut:].lstrip()
+        lines.append(paragraph)
+    needed = pages * lines_per_page
+    lines = (lines * (needed // max(len(lines), 1) + 1))[:needed]
+
+    objects = {1: b'<< /Type /Catalog /Pages 2 0 R >>',
+               3: b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>'}
+    kids = []
+    for p in range(pages):
+        chunk = lines[p * lines_per_page:(p + 1) * lines_per_page]
+        stream = b'BT /F1 10 Tf 12 TL 40 800 Td\n' + b''.join(b'(' + _pdf_escape(line) + b') Tj T*\n' for line in chunk) + b'ET'
+        page_id, content_id = 4 + 2 * p, 5 + 2 * p
+        objects[content_id] = b'<< /Length %d >>\nstream\n' % len(stream) + stream + b'\nendstream'
+        objects[page_id] = (b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] '
+                            b'/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>' % content_id)
+        kids.append(b'%d 0 R' % page_id)
+    objects[2] = b'<< /Type /Pages /Kids [' + b' '.join(kids) + b'] /Count %d >>' % pages
+
+    out = bytearray(b'%PDF-1.4\n')
+    offsets = {}
+    for num in sorted(objects):
+        offsets[num] = len(out)
+        out += b'%d 0 obj\n' % num + objects[num] + b'\nendobj\n'
+    xref = len(out)
+    size = max(objects) + 1
+    out += b'xref\n0 %d\n0000000000 65535 f \n' % size
+    for num in range(1, size):
+        out += b'%010d 00000 n \n' % offsets[num]
+    out += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (size, xref)
+    return bytes(out)
+
+
+def write_corpus(out_dir: str, n: int, seed: int, pdf_pages: List[int]) -> Dict[str, str]:
+    os.makedirs(out_dir, exist_ok=True)
+    emails = generate_emails(n, seed)
+    paths = {'jsonl': os.path.join(out_dir, 'emails.jsonl')}
+    with open(paths['jsonl'], 'w', encoding='utf-8') as f:
+        for e in emails:
+            f.write(json.dumps({'id': e['id'], 'category': e['category'], 'text': e['text']}, ensure_ascii=False) + '\n')
+    for fmt in ('email_n', 'headers'):
+        paths[fmt] = os.path.join(out_dir, f'multi_{fmt}.txt')
+        with open(paths[fmt], 'w', encoding='utf-8') as f:
+            f.write(multi_email_txt(emails, fmt))
+    text = multi_email_txt(emails, 'email_n')
+    for pages in pdf_pages:
+        paths[f'pdf_{pages}'] = os.path.join(out_dir, f'multi_{pages}p.pdf')
+        with open(paths[f'pdf_{pages}'], 'wb') as f:
+            f.write(make_pdf(text, pages))
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--out', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'synthetic'))
+    parser.add_argument('--emails', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--pdf-pages', default='1,10,50')
+    args = parser.parse_args()
+    paths = write_corpus(args.out, args.emails, args.seed, [int(p) for p in args.pdf_pages.split(',') if p])
+    for name, path in paths.items():
+        print(f"{name:8s} {path}")
+
+
+if __name__ == '__main__':
+    main()
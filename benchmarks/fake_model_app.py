@@ -0,0 +1,45 @@
+"""
+App com um modelo zero-shot falso, para testes de carga sem baixar pesos.
+
+Cada chamada custa FAKE_MODEL_MS = "base,por_item" milissegundos e as chamadas
+são serializadas (um forward por vez, como uma CPU saturada), então o ganho
+medido vem de agrupar e-mails no mesmo forward, não de paralelismo falso.
+
+Uso (via benchmarks/load_test.py):
+    FAKE_MODEL_MS=40,4 gunicorn -c gunicorn.conf.py --pythonpath .,benchmarks fake_model_app:app
+"""
+import os
+import sys
+import time
+import threading
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import nlp  # noqa: E402
+from app import app  # noqa: E402,F401
+
+PRODUCTIVE_WORDS = ('status', 'erro', 'error', 'problema', 'acessar', 'fatura', 'anexo', 'suporte', 'ticket', 'chamado')
+
+
+class FakeZeroShot:
+    model = None
+
+    def __init__(self, base: float, per_item: float):
+        self.base = base
+        self.per_item = per_item
+        self._lock = threading.Lock()
+
+    def __call__(self, texts, candidate_labels, batch_size=None):
+        batch = [texts] if isinstance(texts, str) else list(texts)
+        with self._lock:
+            time.sleep(self.base + self.per_item * len(batch))
+        outputs = []
+        for text in batch:
+            productive = any(w in text.lower() for w in PRODUCTIVE_WORDS)
+            outputs.append({'labels': candidate_labels, 'scores': [0.8, 0.2] if productive else [0.3, 0.7]})
+        return outputs[0] if isinstance(texts, str) else outputs
+
+
+_base, _, _per_item = os.getenv('FAKE_MODEL_MS', '40,4').partition(',')
+nlp._MODELS['zero-shot'] = FakeZeroShot(float(_base) / 1000, float(_per_item or 0) / 1000)
@@ -0,0 +1,129 @@
+"""
+Servidor local que imita o endpoint /v1/chat/completions da OpenAI.
+
+Serve para desenvolver e medir o backend de respostas `openai` sem rede e sem
+custo: latência, taxa de erros 500 e respostas lentas (acima do timeout) são
+configuráveis. A resposta ecoa a categoria recebida no prompt.
+
+Uso:
+    python benchmarks/fake_openai.py --port 8089 --latency 0.3 --error-rate 0.1
+    OPENAI_BASE_URL=http://127.0.0.1:8089/v1 OPENAI_API_KEY=fake MODEL_BACKEND=openai python app.py
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive: permite medir o reaproveitamento de conexões
+
+    def log_message(self, fmt, *args):
+        if self.server.verbose:
+            super().log_message(fmt, *args)
+
+    def _send_json(self, status: int, payload: dict) -> None:
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            request = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            return self._send_json(400, {'error': {'message': 'JSON inválido', 'type': 'invalid_request_error'}})
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            return self._send_json(404, {'error': {'message': f'rota desconhecida: {self.path}'}})
+
+        stats = self.server.stats
+        with self.server.lock:
+            stats['requests'] += 1
+            stats['connections'].add(self.client_address)
+            stats['inflight'] += 1
+            stats['max_inflight'] = max(stats['max_inflight'], stats['inflight'])
+        try:
+            prompt = request.get('messages', [{}])[-1].get('content', '')
+            delay = self.server.latency if self.server.latency_for is None else self.server.latency_for(prompt)
+            if random.random() < self.server.slow_rate:
+                delay = self.server.slow_latency
+            time.sleep(delay)
+            if random.random() < self.server.error_rate:
+                with self.server.lock:
+                    stats['errors'] += 1
+                return self._send_json(500, {'error': {'message': 'falha simulada', 'type': 'server_error'}})
+
+            category = re.search(r'Categoria: *(\S+)', prompt)
+            content = f"Resposta simulada ({category.group(1) if category else 'sem categoria'})."
+            self._send_json(200, {
+                'id': f"chatcmpl-fake-{stats['requests']}",
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': request.get('model', 'fake'),
+                'choices': [{
+                    'index': 0,
+                    'message': {'role': 'assistant', 'content': content},
+                    'finish_reason': 'stop',
+                }],
+                'usage': {'prompt_tokens': len(prompt.split()), 'completion_tokens': 3, 'total_tokens': len(prompt.split()) + 3},
+            })
+        finally:
+            with self.server.lock:
+                stats['inflight'] -= 1
+
+
+def make_server(port: int = 0, latency: float = 0.0, error_rate: float = 0.0, slow_rate: float = 0.0,
+                slow_latency: float = 30.0, verbose: bool = False,
+                latency_for: Callable[[str], float] | None = None) -> ThreadingHTTPServer:
+    """
+    Cria o servidor (porta 0 = livre); `server.server_address[1]` é a porta
+    usada e `server.stats` acumula requisições, erros, conexões e pico de
+    chamadas simultâneas. `latency_for(prompt)`, se dado, substitui a
+    latência fixa (ex.: respostas fora de ordem nos testes).
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', port), FakeOpenAIHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.latency_for = latency_for
+    server.error_rate = error_rate
+    server.slow_rate = slow_rate
+    server.slow_latency = slow_latency
+    server.verbose = verbose
+    server.lock = threading.Lock()
+    server.stats = {'requests': 0, 'errors': 0, 'inflight': 0, 'max_inflight': 0, 'connections': set()}
+    return server
+
+
+def start_background(**kwargs) -> ThreadingHTTPServer:
+    server = make_server(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency', type=float, default=0.2, help='Atraso de cada resposta (s)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fração de respostas HTTP 500')
+    parser.add_argument('--slow-rate', type=float, default=0.0, help='Fração de respostas lentas (testa o timeout)')
+    parser.add_argument('--slow-latency', type=float, default=30.0)
+    parser.add_argument('-v', '--verbose', action='store_true')
+    args = parser.parse_args()
+
+    server = make_server(args.port, args.latency, args.error_rate, args.slow_rate, args.slow_latency, args.verbose)
+    print(f"fake OpenAI em http://127.0.0.1:{server.server_address[1]}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,196 @@
+"""
+Teste de carga de /api/classify: vazão e latência (p50/p95/p99).
+
+Com --compare, sobe o gunicorn duas vezes com os mesmos workers e o mesmo
+cliente: 'sync' (1 thread por worker, sem micro-batching, como antes) e
+'threaded' (worker gthread + fila de micro-batching do nlp.py). Por padrão usa
+benchmarks/fake_model_app.py (modelo falso com custo por forward, sem baixar
+pesos); --fake-model-ms 0 usa o modelo real (app:app). A cascata e o cache
+ficam desligados para todo e-mail chegar ao modelo.
+
+Uso:
+    python benchmarks/load_test.py --compare --workers 2 --threads 8 --concurrency 32 --requests 1000
+    python benchmarks/load_test.py --url http://127.0.0.1:5001 --concurrency 16
+"""
+import argparse
+import http.client
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import urllib.request
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, HERE)
+
+import corpus  # noqa: E402
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def run_load(url: str, texts, concurrency: int, requests: int) -> dict:
+    parsed = urllib.parse.urlparse(url)
+    latencies, errors = [], []
+    lock = threading.Lock()
+    counter = iter(range(requests))
+
+    def client():
+        conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=120)
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                break
+            body = json.dumps({'text': texts[i % len(texts)]})
+            t0 = time.perf_counter()
+            try:
+                conn.request('POST', '/api/classify', body=body, headers={'Content-Type': 'application/json'})
+                resp = conn.getresponse()
+                resp.read()
+                ok = resp.status == 200
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                ok, resp = False, e
+            elapsed = time.perf_counter() - t0
+            with lock:
+                (latencies if ok else errors).append(elapsed if ok else str(getattr(resp, 'status', resp)))
+        conn.close()
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    seconds = time.perf_counter() - started
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'seconds': round(seconds, 3),
+        'rps': round(len(latencies) / seconds, 2) if seconds else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+        'mean_ms': round(statistics.mean(latencies) * 1000, 1) if latencies else 0.0,
+    }
+
+
+def server_stats(url: str) -> dict | None:
+    # Micro-batching de um dos workers (o que atender o pedido)
+    try:
+        with urllib.request.urlopen(url + '/api/classify/stats', timeout=5) as resp:
+            return json.load(resp).get('microbatch')
+    except (OSError, ValueError):
+        return None
+
+
+def wait_ready(url: str, proc: subprocess.Popen, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"gunicorn saiu com código {proc.returncode}")
+        try:
+            with urllib.request.urlopen(url + '/ready', timeout=2):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError('servidor não ficou pronto a tempo')
+
+
+def start_server(mode: str, args, port: int) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update({
+        'CASCADE_ENABLED': '0',
+        'CLASSIFY_CACHE_SIZE': '0',
+        'DEDUP_ENABLED': '0',
+        'MODEL_BACKEND': 'local',
+        'JOBS_WORKERS': '0',
+        'LOG_LEVEL': 'WARNING',
+        'PROMETHEUS_MULTIPROC_DIR': tempfile.mkdtemp(prefix='autou-load-'),
+        'FAKE_MODEL_MS': args.fake_model_ms,
+        'GUNICORN_THREADS': '1' if mode == 'sync' else str(args.threads),
+        'MICROBATCH_ENABLED': '0' if mode == 'sync' else '1',
+        'MICROBATCH_WAIT_MS': str(args.wait_ms),
+        'MICROBATCH_MAX_SIZE': str(args.max_batch),
+    })
+    for name in ('RENDER', 'CLASSIFY_CACHE_DB'):
+        env.pop(name, None)
+    fake = args.fake_model_ms not in ('', '0')
+    cmd = [
+        sys.executable, '-m', 'gunicorn', '-c', os.path.join(ROOT, 'gunicorn.conf.py'),
+        '--pythonpath', f"{ROOT},{HERE}", '--bind', f"127.0.0.1:{port}", '--workers', str(args.workers),
+        '--timeout', '300', '--log-level', 'warning',
+        'fake_model_app:app' if fake else 'app:app',
+    ]
+    return subprocess.Popen(cmd, cwd=ROOT, env=env)
+
+
+def report(name: str, r: dict) -> None:
+    print(f"{name:10s} {r['rps']:9.1f} req/s  p50 {r['p50_ms']:8.1f} ms  p95 {r['p95_ms']:8.1f} ms  "
+          f"p99 {r['p99_ms']:8.1f} ms  erros {r['errors']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', help='Servidor já em execução (sem --compare)')
+    parser.add_argument('--compare', action='store_true', help="Sobe e compara os modos 'sync' e 'threaded'")
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--wait-ms', type=float, default=5)
+    parser.add_argument('--max-batch', type=int, default=16)
+    parser.add_argument('--fake-model-ms', default='40,4', help="'base,por_item' do modelo falso; 0 = modelo real")
+    parser.add_argument('--port', type=int, default=5099)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', help='Grava os resultados em JSON')
+    args = parser.parse_args()
+
+    texts = [e['text'] for e in corpus.generate_emails(200, args.seed)]
+    results = {}
+    if args.url:
+        url = args.url.rstrip('/')
+        run_load(url, texts, min(args.concurrency, 4), min(args.requests, 20))  # aquecimento
+        results['target'] = run_load(url, texts, args.concurrency, args.requests)
+        results['target']['microbatch'] = server_stats(url)
+        report('target', results['target'])
+    elif args.compare:
+        url = f"http://127.0.0.1:{args.port}"
+        for mode in ('sync', 'threaded'):
+            proc = start_server(mode, args, args.port)
+            try:
+                wait_ready(url, proc)
+                run_load(url, texts, min(args.concurrency, 4), min(args.requests, 20))
+                results[mode] = run_load(url, texts, args.concurrency, args.requests)
+                results[mode]['microbatch'] = server_stats(url)
+            finally:
+                proc.terminate()
+                proc.wait(timeout=30)
+            report(mode, results[mode])
+        sync, threaded = results['sync'], results['threaded']
+        if sync['rps'] and threaded['p99_ms']:
+            print(f"\nthreaded/sync: vazão x{threaded['rps'] / sync['rps']:.2f}, p99 x{threaded['p99_ms'] / sync['p99_ms']:.2f}")
+        if threaded.get('microbatch'):
+            print(f"lote médio (um worker): {threaded['microbatch']['mean_batch']:.1f} e-mails")
+    else:
+        parser.error('use --url ou --compare')
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
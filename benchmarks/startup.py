@@ -0,0 +1,185 @@
+"""
+Benchmark de cold start: tempo de import por módulo e do start ao primeiro request.
+
+Para cada modo ('fast' = FAST_START=1, 'default' = tudo carregado no start),
+mede em processos novos:
+  - o import do app com `python -X importtime`, somado por pacote de topo;
+  - o tempo do lançamento do gunicorn (1 worker) até a primeira resposta 200
+    de POST /api/classify, e em seguida a latência do primeiro GET da
+    especificação do Swagger (o custo que o modo 'fast' adia).
+A classificação roda só com a heurística (RENDER=1), para o resultado não
+depender do modelo. Com --budget-ms / --import-budget-ms (ou STARTUP_BUDGET_MS
+/ IMPORT_BUDGET_MS), termina com código 1 se a mediana de algum modo medido
+passar do orçamento.
+
+Uso:
+    python benchmarks/startup.py --mode compare --runs 5
+    python benchmarks/startup.py --mode fast --budget-ms 1500 --import-budget-ms 400
+"""
+import argparse
+import json
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODES = {'fast': '1', 'default': '0'}
+IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s+)(\S+)')
+
+
+def bench_env(fast_start: str) -> dict:
+    env = dict(os.environ)
+    env.update({
+        'FAST_START': fast_start,
+        'RENDER': '1',
+        'MODEL_BACKEND': 'local',
+        'ZSC_PRELOAD': '0',
+        'JOBS_WORKERS': '0',
+        'LOG_LEVEL': 'WARNING',
+        'PROMETHEUS_MULTIPROC_DIR': tempfile.mkdtemp(prefix='autou-startup-'),
+    })
+    env.pop('CLASSIFY_CACHE_DB', None)
+    return env
+
+
+def import_times(env: dict) -> tuple[float, dict]:
+    """
+    Import do app em um processo novo: (total em ms, ms por pacote de topo).
+    O tempo de cada pacote é a soma do tempo próprio dos seus módulos.
+    """
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'],
+                          cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    total = 0.0
+    packages: dict = {}
+    for line in proc.stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if match is None:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        if name == 'app' and len(indent) == 1:
+            total = int(cumulative_us) / 1000
+        top = name.split('.')[0]
+        packages[top] = packages.get(top, 0.0) + int(self_us) / 1000
+    return total, packages
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def request(url: str, data: bytes | None = None) -> int:
+    req = urllib.request.Request(url, data=data, headers={'Content-Type': 'application/json'} if data else {})
+    with urllib.request.urlopen(req, timeout=30) as resp:
+        resp.read()
+        return resp.status
+
+
+def cold_start(env: dict, timeout: float = 60) -> dict:
+    """
+    Lança o gunicorn e mede até a primeira resposta 200 de /api/classify
+    (inclui o import do app no worker), depois o primeiro acesso à especificação
+    """
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    body = json.dumps({'text': 'Bom dia, poderiam informar o status do chamado 4512?'}).encode()
+    cmd = [
+        sys.executable, '-m', 'gunicorn', '-c', os.path.join(ROOT, 'gunicorn.conf.py'),
+        '--pythonpath', ROOT, '--bind', f"127.0.0.1:{port}", '--workers', '1',
+        '--log-level', 'warning', 'app:app',
+    ]
+    started = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env)
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            if proc.poll() is not None:
+                raise RuntimeError(f"gunicorn saiu com código {proc.returncode}")
+            if time.monotonic() > deadline:
+                raise RuntimeError('servidor não respondeu a tempo')
+            try:
+                if request(url + '/api/classify', body) == 200:
+                    break
+            except (OSError, urllib.error.HTTPError):
+                time.sleep(0.005)
+        first_response = time.perf_counter() - started
+        t0 = time.perf_counter()
+        request(url + '/apispec_1.json')
+        first_docs = time.perf_counter() - t0
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+    return {'first_response_ms': first_response * 1000, 'first_docs_ms': first_docs * 1000}
+
+
+def measure(mode: str, runs: int) -> dict:
+    env = bench_env(MODES[mode])
+    imports, packages, starts = [], {}, []
+    for _ in range(runs):
+        total, per_package = import_times(env)
+        imports.append(total)
+        for name, ms in per_package.items():
+            packages.setdefault(name, []).append(ms)
+        starts.append(cold_start(env))
+    return {
+        'import_ms': round(statistics.median(imports), 1),
+        'first_response_ms': round(statistics.median(s['first_response_ms'] for s in starts), 1),
+        'first_docs_ms': round(statistics.median(s['first_docs_ms'] for s in starts), 1),
+        'packages_ms': {
+            name: round(statistics.median(values), 1)
+            for name, values in sorted(packages.items(), key=lambda kv: -statistics.median(kv[1]))
+        },
+    }
+
+
+def report(mode: str, r: dict, top: int) -> None:
+    print(f"{mode:8s} import {r['import_ms']:8.1f} ms  primeira resposta {r['first_response_ms']:8.1f} ms  "
+          f"primeira spec {r['first_docs_ms']:8.1f} ms")
+    for name, ms in list(r['packages_ms'].items())[:top]:
+        print(f"           {name:24s} {ms:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--mode', choices=['fast', 'default', 'compare'], default='compare')
+    parser.add_argument('--runs', type=int, default=5, help='Execuções por modo (vale a mediana)')
+    parser.add_argument('--top', type=int, default=10, help='Pacotes mais lentos listados por modo')
+    parser.add_argument('--budget-ms', type=float, default=float(os.getenv('STARTUP_BUDGET_MS', '0')),
+                        help='Orçamento do start à primeira resposta (0 = sem limite)')
+    parser.add_argument('--import-budget-ms', type=float, default=float(os.getenv('IMPORT_BUDGET_MS', '0')),
+                        help='Orçamento do import do app (0 = sem limite)')
+    parser.add_argument('--json', help='Grava os resultados em JSON')
+    args = parser.parse_args()
+
+    modes = list(MODES) if args.mode == 'compare' else [args.mode]
+    results = {}
+    for mode in modes:
+        results[mode] = measure(mode, max(1, args.runs))
+        report(mode, results[mode], args.top)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+    failures = []
+    for mode, r in results.items():
+        if args.budget_ms and r['first_response_ms'] > args.budget_ms:
+            failures.append(f"{mode}: primeira resposta {r['first_response_ms']:.1f} ms > {args.budget_ms:.0f} ms")
+        if args.import_budget_ms and r['import_ms'] > args.import_budget_ms:
+            failures.append(f"{mode}: import {r['import_ms']:.1f} ms > {args.import_budget_ms:.0f} ms")
+    for failure in failures:
+        print(f"ACIMA DO ORÇAMENTO  {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,209 @@
+"""
+Suíte de benchmarks reproduzível do pipeline (nlp.py / responders.py / app.py).
+
+O corpus sintético (benchmarks/corpus.py) é gerado em memória a partir da
+semente, então duas execuções medem exatamente a mesma entrada. Por padrão
+a classificação roda só com a heurística (RENDER=1), sem cache e com respostas
+por template, para o resultado não depender do modelo nem da rede; use
+--classifier model para incluir o modelo configurado.
+
+Uso:
+    python benchmarks/suite.py --save benchmarks/results/baseline.json
+    python benchmarks/suite.py --compare benchmarks/results/baseline.json --threshold 0.15
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import corpus  # noqa: E402
+
+
+def configure_env(classifier: str, dedup: str) -> None:
+    # Precisa acontecer antes de importar nlp/app (configuração lida no import)
+    os.environ['CLASSIFY_CACHE_SIZE'] = '0'
+    os.environ['MODEL_BACKEND'] = 'local'
+    os.environ['DEDUP_ENABLED'] = '1' if dedup == 'on' else '0'
+    os.environ.pop('CLASSIFY_CACHE_DB', None)
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    if classifier == 'heuristic':
+        os.environ['RENDER'] = '1'
+    else:
+        os.environ.pop('RENDER', None)
+
+
+def measure(fn, ops: int, repeat: int, warmup: int = 1) -> dict:
+    """
+    Executa `fn` (que processa `ops` itens) `repeat` vezes; tempos por item
+    """
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) / ops)
+    return {
+        'ops': ops,
+        'repeat': repeat,
+        'median_us': statistics.median(samples) * 1e6,
+        'min_us': min(samples) * 1e6,
+        'stdev_us': (statistics.stdev(samples) if len(samples) > 1 else 0.0) * 1e6,
+    }
+
+
+def build_benchmarks(args):
+    import nlp
+    import dedup
+    import app as app_module
+
+    emails = corpus.generate_emails(args.emails, args.seed)
+    texts = [e['text'] for e in emails]
+    normalized = [nlp.normalize_text(t) for t in texts]
+    preprocessed = [nlp.preprocess(t) for t in normalized]
+    multi = {fmt: corpus.multi_email_txt(emails, fmt) for fmt in ('email_n', 'headers')}
+    pdfs = {pages: corpus.make_pdf(multi['email_n'], pages) for pages in args.pdf_pages}
+    client = app_module.app.test_client()
+    single = texts[: min(len(texts), 50)]
+    multi_small = corpus.multi_email_txt(emails[:20], 'email_n')
+
+    benches = {
+        'preprocess': (lambda: [nlp.preprocess(t) for t in normalized], len(normalized)),
+        'heuristic_classifier': (lambda: [nlp.heuristic_classifier(p) for p in preprocessed], len(preprocessed)),
+        'detect_sub_intent': (lambda: [nlp.detect_sub_intent(t) for t in normalized], len(normalized)),
+        'split_emails[email_n]': (lambda: nlp.split_emails(multi['email_n']), len(emails)),
+        'split_emails[headers]': (lambda: nlp.split_emails(multi['headers']), len(emails)),
+        'extract_text_from_file[txt]': (
+            lambda: nlp.extract_text_from_file('emails.txt', io.BytesIO(multi['email_n'].encode('utf-8'))), 1),
+        # Texto inteiro do arquivo: caminho de /process, /process/stream e dos jobs (com o DEDUP_ENABLED da execução)
+        'classify_multiple_emails': (lambda: nlp.classify_multiple_emails(multi['email_n']), len(emails)),
+    }
+    index = dedup.NearDuplicateIndex()
+    benches['dedup_signature'] = (
+        lambda: [index.signature(dedup.shingles(p)) for p in preprocessed], len(preprocessed))
+    for pages, data in pdfs.items():
+        benches[f'extract_text_from_file[pdf_{pages}p]'] = (
+            lambda data=data: nlp.extract_text_from_file('emails.pdf', io.BytesIO(data)), 1)
+
+    def api_single():
+        for text in single:
+            r = client.post('/api/classify', json={'text': text})
+            assert r.status_code == 200, r.data
+
+    def api_multi():
+        r = client.post('/api/classify', data={'file': (io.BytesIO(multi_small.encode('utf-8')), 'emails.txt')},
+                        content_type='multipart/form-data')
+        assert r.status_code == 200 and r.get_json()['multiple_emails'], r.data
+
+    # Classificador linear treinado no próprio corpus: mede só a inferência em lote
+    import linear
+    linear_model, _ = linear.train(normalized, [e['category'] for e in emails], epochs=50, validation=0)
+    benches['linear_predict[batch]'] = (lambda: linear_model.predict(normalized), len(normalized))
+
+    benches['api_classify[single]'] = (api_single, len(single))
+    benches['api_classify[multi_20]'] = (api_multi, 1)
+    return benches
+
+
+def git_revision() -> str | None:
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True)
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                               capture_output=True, text=True).stdout.strip()
+        return out.stdout.strip() + ('-dirty' if dirty else '') if out.returncode == 0 else None
+    except OSError:
+        return None
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """
+    Compara a mediana por item com o baseline; retorna as regressões
+    (piora acima de `threshold`, ex.: 0.15 = 15%)
+    """
+    regressions = []
+    print(f"\n{'benchmark':36s} {'base µs':>11s} {'atual µs':>11s} {'variação':>9s}")
+    for name, current in results['results'].items():
+        base = baseline.get('results', {}).get(name)
+        if base is None:
+            print(f"{name:36s} {'—':>11s} {current['median_us']:11.2f} {'novo':>9s}")
+            continue
+        change = current['median_us'] / base['median_us'] - 1 if base['median_us'] else 0.0
+        flag = ''
+        if change > threshold:
+            flag = '  REGRESSÃO'
+            regressions.append(name)
+        elif change < -threshold:
+            flag = '  melhora'
+        print(f"{name:36s} {base['median_us']:11.2f} {current['median_us']:11.2f} {change:+9.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--emails', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--pdf-pages', default='1,10,50')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--classifier', choices=['heuristic', 'model'], default='heuristic')
+    parser.add_argument('--dedup', choices=['on', 'off'], default='on', help='DEDUP_ENABLED (padrão do app: on)')
+    parser.add_argument('--only', help='Roda só os benchmarks cujo nome contém este texto')
+    parser.add_argument('--save', help='Grava os resultados em JSON')
+    parser.add_argument('--compare', metavar='BASELINE', help='JSON de uma execução anterior')
+    parser.add_argument('--threshold', type=float, default=0.15, help='Piora tolerada na comparação (0.15 = 15%%)')
+    args = parser.parse_args()
+    args.pdf_pages = [int(p) for p in args.pdf_pages.split(',') if p]
+
+    configure_env(args.classifier, args.dedup)
+    benches = build_benchmarks(args)
+
+    results = {
+        'meta': {
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'emails': args.emails,
+            'seed': args.seed,
+            'classifier': args.classifier,
+            'dedup': args.dedup,
+        },
+        'results': {},
+    }
+    print(f"{'benchmark':36s} {'mediana µs':>11s} {'mín µs':>11s} {'itens':>6s}")
+    for name, (fn, ops) in benches.items():
+        if args.only and args.only not in name:
+            continue
+        r = measure(fn, ops, args.repeat)
+        results['results'][name] = r
+        print(f"{name:36s} {r['median_us']:11.2f} {r['min_us']:11.2f} {ops:6d}")
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"\nresultados salvos em {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('meta', {}).get('emails') != args.emails or baseline.get('meta', {}).get('seed') != args.seed:
+            print("aviso: baseline gerado com outro corpus (--emails/--seed)", file=sys.stderr)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regressão(ões) acima de {args.threshold:.0%}: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,203 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict
+
+
+# Cache de classificações/respostas endereçado por conteúdo.
+# Camada 1: LRU em memória (por processo) com limite de tamanho e TTL.
+# Camada 2 (opcional): SQLite compartilhado entre os workers do gunicorn.
+CACHE_SIZE = int(os.getenv('CLASSIFY_CACHE_SIZE', '2048'))  # 0 desliga o cache
+CACHE_TTL = float(os.getenv('CLASSIFY_CACHE_TTL', '3600'))  # segundos
+CACHE_DB = os.getenv('CLASSIFY_CACHE_DB', '')  # caminho do SQLite; vazio desliga
+CACHE_DB_SIZE = int(os.getenv('CLASSIFY_CACHE_DB_SIZE', '100000'))
+
+
+def make_key(*parts: str) -> str:
+    """
+    Gera a chave do cache a partir do conteúdo (texto normalizado, backend, modelo...)
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        h.update(str(part).encode('utf-8', errors='surrogatepass'))
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+def _copy(value):
+    # Resultados são dicts pequenos; copia listas para o chamador não alterar o cache
+    if isinstance(value, dict):
+        return {k: (list(v) if isinstance(v, list) else v) for k, v in value.items()}
+    return value
+
+
+class LRUCache:
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expira_em, valor)
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value, ttl: float | None = None) -> None:
+        # `ttl` menor que o padrão: entrada trazida de outra camada com o tempo que lhe resta
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SQLiteCache:
+    """
+    Camada compartilhada: um arquivo SQLite (WAL) acessado por todos os workers.
+    """
+
+    def __init__(self, path: str, ttl: float, maxsize: int):
+        self.path = path
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._local = threading.local()
+        self._writes = 0
+        self.evictions = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        # Uma conexão por thread e por processo (não atravessa o fork do gunicorn)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS cache '
+                '(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)'
+            )
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key: str):
+        """
+        (valor, segundos até expirar), ou (None, 0) se ausente/expirado
+        """
+        now = time.time()
+        row = self._conn().execute(
+            'SELECT value, expires FROM cache WHERE key = ? AND expires > ?', (key, now)
+        ).fetchone()
+        return (json.loads(row[0]), row[1] - now) if row else (None, 0.0)
+
+    def set(self, key: str, value) -> None:
+        conn = self._conn()
+        conn.execute(
+            'INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)',
+            (key, json.dumps(value, ensure_ascii=False), time.time() + self.ttl),
+        )
+        self._writes += 1
+        if self._writes % 500 == 0:
+            self._purge(conn)
+
+    def _purge(self, conn: sqlite3.Connection) -> None:
+        # Remove expirados e, se passar do limite, os que expiram primeiro
+        removed = conn.execute('DELETE FROM cache WHERE expires <= ?', (time.time(),)).rowcount
+        excess = conn.execute('SELECT COUNT(*) FROM cache').fetchone()[0] - self.maxsize
+        if excess > 0:
+            removed += conn.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY expires LIMIT ?)', (excess,)
+            ).rowcount
+        self.evictions += max(removed, 0)
+
+    def clear(self) -> None:
+        self._conn().execute('DELETE FROM cache')
+
+
+class ContentCache:
+    def __init__(self, maxsize: int = CACHE_SIZE, ttl: float = CACHE_TTL, db_path: str = CACHE_DB):
+        self.enabled = maxsize > 0
+        self.memory = LRUCache(maxsize, ttl)
+        self.shared = SQLiteCache(db_path, ttl, CACHE_DB_SIZE) if (db_path and self.enabled) else None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def get(self, key: str):
+        if not self.enabled:
+            return None
+        value = self.memory.get(key)
+        if value is None and self.shared is not None:
+            try:
+                value, remaining = self.shared.get(key)
+            except sqlite3.Error:
+                value = None
+            if value is not None:
+                # Mantém a expiração original: a cópia em memória não vive mais que a compartilhada
+                self.memory.set(key, value, ttl=min(remaining, self.memory.ttl))
+                with self._lock:
+                    self.shared_hits += 1
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return _copy(value) if value is not None else None
+
+    def set(self, key: str, value) -> None:
+        if not self.enabled:
+            return
+        self.memory.set(key, _copy(value))
+        if self.shared is not None:
+            try:
+                self.shared.set(key, value)
+            except sqlite3.Error:
+                pass  # camada compartilhada é best-effort
+
+    def clear(self) -> None:
+        self.memory.clear()
+        if self.shared is not None:
+            self.shared.clear()
+
+    def stats(self) -> Dict:
+        return {
+            'enabled': self.enabled,
+            'hits': self.hits,
+            'shared_hits': self.shared_hits,
+            'misses': self.misses,
+            'evictions': self.memory.evictions + (self.shared.evictions if self.shared else 0),
+            'expirations': self.memory.expirations,
+            'size': len(self.memory),
+            'maxsize': self.memory.maxsize,
+            'ttl': self.memory.ttl,
+            'shared_db': self.shared.path if self.shared else None,
+        }
+
+
+# Instância única usada por nlp.classify_email e responders.suggest_reply
+content_cache = ContentCache()
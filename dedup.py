@@ -0,0 +1,143 @@
+import os
+import re
+from typing import Dict, List
+
+import numpy as np
+
+
+# Detecção de quase-duplicatas: e-mails que só mudam em nome, número de chamado
+# ou assinatura caem no mesmo grupo e reaproveitam a classificação do primeiro
+# (representante). Shingles de caracteres sobre o texto de `preprocess`, com os
+# dígitos mascarados; assinaturas MinHash e buckets LSH para achar candidatos
+# sem comparar todos os pares; confirmação pela fração de posições iguais nas
+# assinaturas (estimativa do Jaccard). Só a assinatura de cada representante
+# fica guardada. Shingles e assinatura são calculados com NumPy de uma vez.
+DEDUP_ENABLED = os.getenv('DEDUP_ENABLED', '1') == '1'
+DEDUP_THRESHOLD = float(os.getenv('DEDUP_THRESHOLD', '0.8'))  # Jaccard mínimo (estimado)
+DEDUP_NUM_PERM = int(os.getenv('DEDUP_NUM_PERM', '128'))
+DEDUP_BANDS = int(os.getenv('DEDUP_BANDS', '16'))  # 16 bandas x 8 linhas: candidatos a partir de ~0.7
+DEDUP_SHINGLE = int(os.getenv('DEDUP_SHINGLE', '5'))  # bytes por shingle (até 8)
+DEDUP_MAX_ITEMS = int(os.getenv('DEDUP_MAX_ITEMS', '10000'))  # representantes guardados por índice
+# Rotas que leem um stream sem fim definido (NDJSON, upload mapeado): limite menor
+DEDUP_STREAM_MAX_ITEMS = int(os.getenv('DEDUP_STREAM_MAX_ITEMS', '1000'))
+
+_DIGITS_RE = re.compile(r'\d+')
+_SHIFT = np.uint64(32)
+_CHUNK = 4096  # shingles por passo da assinatura (limita a matriz temporária)
+
+
+def _permutations(n: int) -> tuple[np.ndarray, np.ndarray]:
+    # Fixas (semente constante): a mesma assinatura em qualquer processo. Hash
+    # multiply-shift: 32 bits altos de (a * x + b) mod 2**64, com `a` ímpar
+    rng = np.random.default_rng(1337)
+    a = rng.integers(0, 1 << 64, size=n, dtype=np.uint64) | np.uint64(1)
+    b = rng.integers(0, 1 << 64, size=n, dtype=np.uint64)
+    return a, b
+
+
+def shingles(pre: str, size: int = DEDUP_SHINGLE) -> np.ndarray:
+    """
+    Shingles de bytes do texto pré-processado (números de chamado/protocolo
+    viram '0'), cada um empacotado num inteiro: array ordenado e sem repetição
+    """
+    data = np.frombuffer(_DIGITS_RE.sub('0', pre).encode('utf-8'), dtype=np.uint8).astype(np.uint64)
+    width = min(size, 8, len(data))
+    if not width:
+        return np.empty(0, dtype=np.uint64)
+    count = len(data) - width + 1
+    values = np.zeros(count, dtype=np.uint64)
+    for k in range(width):
+        values = (values << np.uint64(8)) | data[k:k + count]
+    return np.unique(values)
+
+
+class NearDuplicateIndex:
+    """
+    Índice incremental de quase-duplicatas. `add` recebe o texto de
+    `preprocess` e devolve a posição do representante do grupo (a própria
+    posição quando o e-mail abre um grupo novo).
+    """
+
+    def __init__(self, threshold: float = DEDUP_THRESHOLD, num_perm: int = DEDUP_NUM_PERM,
+                 bands: int = DEDUP_BANDS, max_items: int = DEDUP_MAX_ITEMS):
+        self.threshold = threshold
+        self.bands = max(1, min(bands, num_perm))
+        self.rows = max(1, num_perm // self.bands)
+        self.max_items = max_items
+        self._a, self._b = _permutations(self.bands * self.rows)
+        # Banda -> {hash da banda: representante, ou lista se houver mais de um}
+        self._buckets: List[Dict[int, int | List[int]]] = [{} for _ in range(self.bands)]
+        self._signatures: Dict[int, np.ndarray] = {}
+        self._sizes: Dict[int, int] = {}  # só dos representantes guardados
+        self.count = 0
+        self.clusters = 0
+        self.largest = 0
+
+    def __contains__(self, position: int) -> bool:
+        return position in self._signatures
+
+    def signature(self, items: np.ndarray) -> np.ndarray:
+        # Mínimo de cada função de hash sobre todos os shingles (uma linha por função)
+        a, b = self._a[:, None], self._b[:, None]
+        signature = np.full(len(self._a), np.iinfo(np.uint64).max, dtype=np.uint64)
+        for i in range(0, len(items), _CHUNK):
+            hashed = (a * items[None, i:i + _CHUNK] + b) >> _SHIFT
+            np.minimum(signature, hashed.min(axis=1), out=signature)
+        return signature.astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> List[int]:
+        # Hash da banda como chave (int ocupa menos que bytes); colisões só geram candidatos a mais
+        r = self.rows
+        return [hash(signature[band * r:(band + 1) * r].tobytes()) for band in range(self.bands)]
+
+    def add(self, pre: str) -> int:
+        position = self.count
+        self.count += 1
+        items = shingles(pre)
+        if not len(items):
+            self._new_cluster()
+            return position
+
+        signature = self.signature(items)
+        keys = self._band_keys(signature)
+        best, best_sim = None, self.threshold
+        seen = set()
+        for buckets, key in zip(self._buckets, keys):
+            found = buckets.get(key, ())
+            for candidate in (found,) if isinstance(found, int) else found:
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                sim = np.count_nonzero(signature == self._signatures[candidate]) / len(signature)
+                if sim >= best_sim:
+                    best, best_sim = candidate, sim
+        if best is not None:
+            self._sizes[best] += 1
+            self.largest = max(self.largest, self._sizes[best])
+            return best
+
+        self._new_cluster()
+        if len(self._signatures) < self.max_items:
+            self._signatures[position] = signature
+            self._sizes[position] = 1
+            for buckets, key in zip(self._buckets, keys):
+                found = buckets.get(key)
+                if found is None:
+                    buckets[key] = position
+                elif isinstance(found, int):
+                    buckets[key] = [found, position]
+                else:
+                    found.append(position)
+        return position
+
+    def _new_cluster(self) -> None:
+        self.clusters += 1
+        self.largest = max(self.largest, 1)
+
+    def stats(self) -> Dict:
+        return {
+            'emails': self.count,
+            'clusters': self.clusters,
+            'duplicates': self.count - self.clusters,
+            'largest_cluster': self.largest,
+        }
@@ -0,0 +1,119 @@
+import os
+import json
+import time
+import zlib
+import sqlite3
+import threading
+from typing import Dict, List
+
+import nlp
+from cache import LRUCache, make_key
+
+
+# Documentos com múltiplos e-mails já extraídos, guardados por algum tempo para
+# a interface buscar o conteúdo completo de um e-mail só quando ele é aberto
+# (as respostas levam apenas a prévia). SQLite compartilhado pelos workers; o
+# id é o hash do texto, então reenviar o mesmo arquivo reaproveita a linha.
+# As posições dos e-mails ficam junto do texto (abrir um cartão não separa o
+# documento de novo) e os últimos documentos abertos ficam em memória.
+DOCUMENTS_DB = os.getenv(
+    'DOCUMENTS_DB', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'documents.sqlite3')
+)
+DOCUMENTS_TTL = float(os.getenv('DOCUMENTS_TTL', '3600'))  # segundos
+DOCUMENTS_MEMORY = int(os.getenv('DOCUMENTS_MEMORY', '4'))  # documentos em memória por processo
+
+
+class DocumentStore:
+    """
+    Texto dos documentos (comprimido) e posições dos e-mails em SQLite (WAL),
+    com uma conexão por thread e por processo
+    """
+
+    def __init__(self, path: str = DOCUMENTS_DB, ttl: float = DOCUMENTS_TTL, memory: int = DOCUMENTS_MEMORY):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        self._recent = LRUCache(memory, ttl)  # doc_id -> (texto, spans)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS documents (id TEXT PRIMARY KEY, expires REAL NOT NULL, text BLOB NOT NULL, '
+                'spans BLOB)'
+            )
+            columns = {row[1] for row in conn.execute('PRAGMA table_info(documents)')}
+            if 'spans' not in columns:  # banco criado antes da coluna
+                conn.execute('ALTER TABLE documents ADD COLUMN spans BLOB')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def put(self, text: str, spans: List[nlp.EmailSpan] | None = None) -> str:
+        """
+        Guarda o documento; `spans` são as posições vindas da extração
+        (.eml/.mbox), senão o texto é separado aqui, uma única vez
+        """
+        doc_id = make_key('document', text)
+        spans = nlp.email_spans(text, spans)
+        conn = self._conn()
+        now = time.time()
+        conn.execute('DELETE FROM documents WHERE expires < ?', (now,))
+        conn.execute(
+            'INSERT INTO documents (id, expires, text, spans) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT(id) DO UPDATE SET expires = excluded.expires, spans = excluded.spans',
+            (doc_id, now + self.ttl, zlib.compress(text.encode('utf-8', errors='surrogatepass'), 1),
+             zlib.compress(json.dumps(spans, ensure_ascii=False).encode('utf-8', errors='surrogatepass'), 1)),
+        )
+        self._recent.set(doc_id, (text, spans))
+        return doc_id
+
+    def _load(self, doc_id: str) -> tuple[str, List[nlp.EmailSpan]] | None:
+        document = self._recent.get(doc_id)
+        if document is not None:
+            return document
+        row = self._conn().execute(
+            'SELECT text, spans, expires FROM documents WHERE id = ? AND expires >= ?', (doc_id, time.time())
+        ).fetchone()
+        if row is None:
+            return None
+        text = zlib.decompress(row[0]).decode('utf-8', errors='surrogatepass')
+        if row[1] is None:
+            # Linha gravada antes da coluna spans
+            spans = nlp.email_spans(text)
+        else:
+            data = zlib.decompress(row[1]).decode('utf-8', errors='surrogatepass')
+            spans = [nlp.EmailSpan(*span) for span in json.loads(data)]
+        self._recent.set(doc_id, (text, spans), ttl=row[2] - time.time())
+        return text, spans
+
+    def get(self, doc_id: str) -> str | None:
+        document = self._load(doc_id)
+        return document[0] if document is not None else None
+
+    def email(self, doc_id: str, position: int) -> Dict | None:
+        """
+        E-mail na posição `position` (ordem dos resultados), ou None
+        """
+        document = self._load(doc_id)
+        if document is None:
+            return None
+        text, spans = document
+        return spans[position].to_dict(text) if 0 <= position < len(spans) else None
+
+
+_STORE = None
+_STORE_LOCK = threading.Lock()
+
+
+def get_store() -> DocumentStore:
+    global _STORE
+    if _STORE is None:
+        with _STORE_LOCK:
+            if _STORE is None:
+                _STORE = DocumentStore()
+    return _STORE
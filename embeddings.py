@@ -0,0 +1,170 @@
+import os
+import json
+import hashlib
+from typing import Dict, List
+
+
+# Classificador por protótipos de embedding: uma passada do encoder por e-mail
+# (em lote), comparada por similaridade de cosseno com embeddings de frases
+# protótipo de cada categoria/sub-intenção. Os protótipos são codificados uma
+# vez e salvos em disco; o custo não cresce com o número de labels.
+EMBED_MODEL = os.getenv('EMBED_MODEL', 'sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2')
+EMBED_PROTOTYPES_PATH = os.getenv(
+    'EMBED_PROTOTYPES_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'prototypes.npz'),
+)
+EMBED_BATCH_SIZE = int(os.getenv('EMBED_BATCH_SIZE', '32'))
+EMBED_TEMPERATURE = float(os.getenv('EMBED_TEMPERATURE', '0.05'))  # softmax das similaridades
+EMBED_SUB_INTENT_MIN = float(os.getenv('EMBED_SUB_INTENT_MIN', '0.5'))  # similaridade mínima
+
+
+CATEGORY_PROTOTYPES = {
+    'Produtivo': [
+        'Poderiam informar o andamento da minha solicitação?',
+        'Estou com um problema no sistema e preciso de suporte.',
+        'Não consigo acessar minha conta.',
+        'Segue anexo o documento solicitado para análise.',
+        'Qual o prazo para resolver o chamado?',
+        'A fatura veio com valor errado, podem verificar?',
+        'Please update me on the status of my support ticket.',
+        'The application shows an error when I try to log in.',
+    ],
+    'Improdutivo': [
+        'Feliz Natal e boas festas a toda a equipe!',
+        'Parabéns pelo ótimo trabalho.',
+        'Muito obrigado pela atenção, tenham um ótimo dia.',
+        'Bom dia a todos, desejo uma excelente semana.',
+        'Feliz aniversário!',
+        'Thank you so much, have a great weekend!',
+        'Congratulations on your achievement.',
+    ],
+}
+
+SUB_INTENT_PROTOTYPES = {
+    'status_update': [
+        'Qual o status do meu chamado?',
+        'Gostaria de uma atualização sobre o andamento do caso.',
+        'Há previsão para a solução do problema?',
+    ],
+    'attachment': [
+        'Segue em anexo o arquivo solicitado.',
+        'Envio o documento para validação.',
+        'Anexei o comprovante neste e-mail.',
+    ],
+    'greetings': [
+        'Feliz Natal e próspero Ano Novo!',
+        'Parabéns pelo excelente trabalho!',
+        'Obrigado pela ajuda, tenham um ótimo dia.',
+    ],
+    'access_issue': [
+        'Não consigo fazer login na minha conta.',
+        'Minha senha foi bloqueada, preciso de acesso.',
+        'Solicito liberação de acesso ao sistema.',
+    ],
+    'billing': [
+        'Minha fatura veio com cobrança indevida.',
+        'O boleto está com o valor errado.',
+        'Preciso da segunda via do boleto.',
+    ],
+    'error_report': [
+        'O sistema apresenta erro ao salvar.',
+        'O aplicativo trava ao abrir o extrato.',
+        'Encontrei um bug na tela de pagamentos.',
+    ],
+}
+
+
+def prototype_fingerprint(model_name: str = EMBED_MODEL) -> str:
+    # Muda quando o modelo ou as frases protótipo mudam (invalida o arquivo salvo)
+    payload = json.dumps([model_name, CATEGORY_PROTOTYPES, SUB_INTENT_PROTOTYPES], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+class EmbeddingClassifier:
+    def __init__(self, encoder, model_name: str, prototypes_path: str = EMBED_PROTOTYPES_PATH):
+        import numpy as np
+
+        self.encoder = encoder
+        self.model_name = model_name
+        self.fingerprint = prototype_fingerprint(model_name)
+        self.labels, self.kinds, self.matrix = self._load_prototypes(prototypes_path)
+        self.categories = list(CATEGORY_PROTOTYPES)
+        self.sub_intents = list(SUB_INTENT_PROTOTYPES)
+        # Máscaras (label x protótipo) para agregar a similaridade máxima por label
+        self._category_rows = [np.flatnonzero((self.kinds == 'category') & (self.labels == c)) for c in self.categories]
+        self._intent_rows = [np.flatnonzero((self.kinds == 'sub_intent') & (self.labels == s)) for s in self.sub_intents]
+
+    @classmethod
+    def load(cls, model_name: str | None = None, prototypes_path: str | None = None) -> 'EmbeddingClassifier':
+        from sentence_transformers import SentenceTransformer
+
+        model_name = model_name or EMBED_MODEL
+        return cls(SentenceTransformer(model_name, device='cpu'), model_name, prototypes_path or EMBED_PROTOTYPES_PATH)
+
+    @property
+    def model(self):
+        return self.encoder
+
+    def _load_prototypes(self, path: str):
+        import numpy as np
+
+        if os.path.exists(path):
+            try:
+                data = np.load(path, allow_pickle=False)
+                if str(data['fingerprint']) == self.fingerprint:
+                    return data['labels'], data['kinds'], data['matrix']
+            except (OSError, KeyError, ValueError):
+                pass  # arquivo antigo ou corrompido: recalcula
+
+        labels, kinds, sentences = [], [], []
+        for kind, table in (('category', CATEGORY_PROTOTYPES), ('sub_intent', SUB_INTENT_PROTOTYPES)):
+            for label, examples in table.items():
+                for sentence in examples:
+                    labels.append(label)
+                    kinds.append(kind)
+                    sentences.append(sentence)
+        matrix = self.embed(sentences)
+        labels = np.array(labels)
+        kinds = np.array(kinds)
+        try:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            tmp = path + '.tmp.npz'
+            np.savez(tmp, fingerprint=np.array(self.fingerprint), labels=labels, kinds=kinds, matrix=matrix)
+            os.replace(tmp, path)
+        except OSError:
+            pass  # sem permissão de escrita: segue com os protótipos em memória
+        return labels, kinds, matrix
+
+    def embed(self, texts: List[str]):
+        import numpy as np
+
+        vectors = self.encoder.encode(
+            texts, batch_size=EMBED_BATCH_SIZE, normalize_embeddings=True, convert_to_numpy=True,
+        )
+        return np.asarray(vectors, dtype=np.float32)
+
+    def predict(self, texts: List[str]) -> List[Dict]:
+        """
+        Classifica um lote de e-mails com uma única chamada ao encoder
+        """
+        import numpy as np
+
+        sims = self.embed(texts) @ self.matrix.T  # (e-mails x protótipos), cosseno
+        category_scores = np.stack([sims[:, rows].max(axis=1) for rows in self._category_rows], axis=1)
+        intent_scores = np.stack([sims[:, rows].max(axis=1) for rows in self._intent_rows], axis=1)
+
+        logits = category_scores / EMBED_TEMPERATURE
+        logits -= logits.max(axis=1, keepdims=True)
+        probs = np.exp(logits)
+        probs /= probs.sum(axis=1, keepdims=True)
+
+        results = []
+        for p, intents in zip(probs, intent_scores):
+            best = int(p.argmax())
+            best_intent = int(intents.argmax())
+            results.append({
+                'category': self.categories[best],
+                'confidence': float(p[best]),
+                'sub_intent': self.sub_intents[best_intent] if intents[best_intent] >= EMBED_SUB_INTENT_MIN else None,
+            })
+        return results
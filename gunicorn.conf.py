@@ -0,0 +1,36 @@
+import os
+import glob
+import tempfile
+
+# Lido automaticamente pelo gunicorn (Dockerfile/Procfile). As métricas de cada
+# worker ficam em PROMETHEUS_MULTIPROC_DIR e /metrics soma todos os processos;
+# a variável precisa existir antes de o app (e o prometheus_client) ser importado.
+_metrics_dir = os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "autou-prometheus")
+)
+os.makedirs(_metrics_dir, exist_ok=True)
+# Valores de uma execução anterior não devem entrar na soma
+for _path in glob.glob(os.path.join(_metrics_dir, "*.db")):
+    os.remove(_path)
+
+# Worker gthread: cada processo carrega o modelo uma vez e atende vários
+# requests em threads; as chamadas concorrentes ao modelo são agrupadas pela
+# fila de micro-batching (nlp.py). GUNICORN_THREADS=1 volta ao worker sync.
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+
+
+def child_exit(server, worker):
+    # Remove os valores "ao vivo" (gauges) do worker encerrado; contadores e
+    # histogramas continuam somando
+    try:
+        from prometheus_client import multiprocess
+    except ImportError:
+        return
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def post_worker_init(worker):
+    # Cada worker inicia seu pool de jobs em segundo plano e retoma os pendentes
+    import jobs
+    if jobs.JOBS_WORKERS > 0:
+        jobs.get_manager()
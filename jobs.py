@@ -0,0 +1,386 @@
+import io
+import os
+import json
+import time
+import uuid
+import logging
+import sqlite3
+import threading
+from typing import Dict, Iterator, List, Set
+
+import nlp
+from responders import generate_reply
+from telemetry import log_event
+
+
+# Jobs assíncronos para uploads grandes: o pedido só grava a entrada no SQLite
+# e volta na hora; threads em segundo plano extraem, separam e classificam os
+# e-mails em lotes, gravando cada lote junto com o progresso. Se o processo
+# reiniciar, o job é retomado a partir do último lote gravado. Vários workers
+# do gunicorn podem dividir o mesmo arquivo: cada job é reservado por um só,
+# que renova o heartbeat em uma thread própria enquanto o processa. Toda
+# gravação confere o dono: se o job foi retomado por outro processo, o
+# anterior para sem escrever (JobLost).
+JOBS_DB = os.getenv(
+    'JOBS_DB', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'jobs.sqlite3')
+)
+JOBS_WORKERS = int(os.getenv('JOBS_WORKERS', '2'))  # threads por processo
+JOBS_STALE_AFTER = float(os.getenv('JOBS_STALE_AFTER', '120'))  # s sem heartbeat: job volta para a fila
+JOBS_RETENTION = float(os.getenv('JOBS_RETENTION', str(7 * 24 * 3600)))  # s que jobs terminados ficam guardados
+JOBS_POLL_INTERVAL = 1.0
+RESULTS_PAGE = 500  # resultados lidos por consulta ao retomar um job
+
+JOB_STATUSES = ('queued', 'running', 'done', 'failed')
+
+logger = logging.getLogger(__name__)
+
+
+class JobLost(Exception):
+    """
+    O job passou a outro dono (heartbeat expirado): quem perdeu para sem gravar
+    """
+
+
+class JobStore:
+    """
+    Jobs e resultados em SQLite (WAL), com uma conexão por thread e por processo
+    """
+
+    def __init__(self, path: str = JOBS_DB):
+        self.path = path
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.executescript('''
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    updated REAL NOT NULL,
+                    heartbeat REAL,
+                    owner TEXT,
+                    filename TEXT,
+                    payload BLOB,
+                    text TEXT,
+                    spans TEXT,
+                    is_multi INTEGER,
+                    partial TEXT,
+                    total INTEGER,
+                    done INTEGER NOT NULL DEFAULT 0,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    error TEXT
+                );
+                CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created);
+                CREATE TABLE IF NOT EXISTS job_results (
+                    job_id TEXT NOT NULL,
+                    idx INTEGER NOT NULL,
+                    result TEXT NOT NULL,
+                    PRIMARY KEY (job_id, idx)
+                );
+            ''')
+            columns = {row['name'] for row in conn.execute('PRAGMA table_info(jobs)')}
+            if 'spans' not in columns:  # banco criado antes da coluna
+                conn.execute('ALTER TABLE jobs ADD COLUMN spans TEXT')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def create(self, text: str | None = None, filename: str | None = None, payload: bytes | None = None) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self._conn().execute(
+            'INSERT INTO jobs (id, status, created, updated, filename, payload, text) VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (job_id, 'queued', now, now, filename, payload, text),
+        )
+        return job_id
+
+    def get(self, job_id: str) -> Dict | None:
+        row = self._conn().execute(
+            'SELECT id, status, created, updated, filename, is_multi, partial, total, done, attempts, error '
+            'FROM jobs WHERE id = ?', (job_id,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def claim(self, owner: str) -> sqlite3.Row | None:
+        """
+        Reserva o próximo job da fila (ou um 'running' abandonado por um
+        processo que parou de dar sinal de vida)
+        """
+        conn = self._conn()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' OR (status = 'running' AND heartbeat < ?) "
+                "ORDER BY created LIMIT 1", (now - JOBS_STALE_AFTER,)
+            ).fetchone()
+            if row is None:
+                conn.execute('COMMIT')
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', owner = ?, heartbeat = ?, updated = ?, attempts = attempts + 1 "
+                "WHERE id = ?", (owner, now, now, row['id'])
+            )
+            job = conn.execute('SELECT * FROM jobs WHERE id = ?', (row['id'],)).fetchone()
+            conn.execute('COMMIT')
+            return job
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def set_document(self, job_id: str, owner: str, text: str, is_multi: bool, partial: str | None,
+                     total: int, spans: List[nlp.EmailSpan] | None = None) -> None:
+        # Depois da extração a entrada original não é mais necessária; as
+        # posições dos e-mails ficam junto do texto (.eml/.mbox não são
+        # separados de novo a partir do texto na retomada)
+        now = time.time()
+        updated = self._conn().execute(
+            'UPDATE jobs SET text = ?, spans = ?, payload = NULL, is_multi = ?, partial = ?, total = ?, updated = ?, '
+            "heartbeat = ? WHERE id = ? AND owner = ? AND status = 'running'",
+            (text, None if spans is None else json.dumps(spans, ensure_ascii=False), int(is_multi), partial, total,
+             now, now, job_id, owner),
+        ).rowcount
+        if not updated:
+            raise JobLost(job_id)
+
+    def save_results(self, job_id: str, owner: str, start: int, results: List[Dict]) -> None:
+        # Resultados do lote e progresso na mesma transação: a retomada começa em `done`
+        conn = self._conn()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            updated = conn.execute(
+                "UPDATE jobs SET done = ?, updated = ?, heartbeat = ? WHERE id = ? AND owner = ? AND status = 'running'",
+                (start + len(results), now, now, job_id, owner),
+            ).rowcount
+            if not updated:
+                raise JobLost(job_id)
+            conn.executemany(
+                'INSERT OR REPLACE INTO job_results (job_id, idx, result) VALUES (?, ?, ?)',
+                [(job_id, start + i, json.dumps(r, ensure_ascii=False)) for i, r in enumerate(results)],
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def finish(self, job_id: str, owner: str, status: str, error: str | None = None) -> bool:
+        # False se o job já não é deste dono (nada é alterado)
+        return bool(self._conn().execute(
+            "UPDATE jobs SET status = ?, error = ?, updated = ?, heartbeat = NULL "
+            "WHERE id = ? AND owner = ? AND status = 'running'",
+            (status, error, time.time(), job_id, owner),
+        ).rowcount)
+
+    def heartbeat(self, owner: str, job_ids: List[str]) -> int:
+        # Sinal de vida dos jobs em andamento neste processo, independente do progresso
+        if not job_ids:
+            return 0
+        marks = ', '.join('?' * len(job_ids))
+        return self._conn().execute(
+            f"UPDATE jobs SET heartbeat = ? WHERE owner = ? AND status = 'running' AND id IN ({marks})",
+            (time.time(), owner, *job_ids),
+        ).rowcount
+
+    def results(self, job_id: str, offset: int = 0, limit: int = 100) -> List[Dict]:
+        rows = self._conn().execute(
+            'SELECT result FROM job_results WHERE job_id = ? AND idx >= ? ORDER BY idx LIMIT ?',
+            (job_id, offset, limit),
+        ).fetchall()
+        return [json.loads(r['result']) for r in rows]
+
+    def iter_results(self, job_id: str, stop: int) -> Iterator[Dict]:
+        # Resultados [0, stop) em páginas, sem manter um cursor aberto entre gravações
+        for offset in range(0, stop, RESULTS_PAGE):
+            yield from self.results(job_id, offset, min(RESULTS_PAGE, stop - offset))
+
+    def purge(self, older_than: float) -> int:
+        conn = self._conn()
+        old = "SELECT id FROM jobs WHERE status IN ('done', 'failed') AND updated < ?"
+        cutoff = time.time() - older_than
+        conn.execute(f'DELETE FROM job_results WHERE job_id IN ({old})', (cutoff,))
+        return conn.execute(f"DELETE FROM jobs WHERE id IN ({old})", (cutoff,)).rowcount
+
+
+def _single_result(text: str) -> Dict:
+    # Mesmo formato da resposta de /api/classify para um e-mail
+    clf = nlp.classify_email(text)
+    reply = generate_reply(text, clf['category'], clf.get('sub_intent'), backend=os.getenv('MODEL_BACKEND', 'local'))
+    return {
+        'category': clf['category'],
+        'confidence': float(clf['confidence']),
+        'sub_intent': clf.get('sub_intent'),
+        'signals': clf.get('signals', []),
+        'reply': reply.text,
+        'reply_source': reply.source,
+    }
+
+
+def run_job(store: JobStore, job: sqlite3.Row) -> None:
+    """
+    Processa (ou retoma) um job: extração uma única vez, depois os e-mails
+    a partir de `done`, em lotes gravados à medida que ficam prontos. Na
+    retomada, os grupos de quase-duplicatas são refeitos a partir dos
+    resultados já gravados, sem classificar de novo.
+    """
+    job_id = job['id']
+    owner = job['owner']
+    text = job['text']
+    if job['total'] is None:
+        if job['payload'] is not None:
+            document = nlp.extract_text_from_file(job['filename'], io.BytesIO(job['payload']))
+            if document.error:
+                store.finish(job_id, owner, 'failed', document.error)
+                return
+        else:
+            document = nlp.ingest_text(text, normalize_single=False)
+        text = document.text
+        total = nlp.count_emails(text, document.spans) if document.is_multi else 1
+        store.set_document(job_id, owner, text, document.is_multi, document.partial, total, document.spans)
+        is_multi = document.is_multi
+        spans = document.spans
+    else:
+        is_multi = bool(job['is_multi'])
+        spans = [nlp.EmailSpan(*span) for span in json.loads(job['spans'])] if job['spans'] else None
+
+    done = job['done']
+    if not is_multi:
+        if done == 0:
+            store.save_results(job_id, owner, 0, [_single_result(text)])
+    else:
+        tracker = nlp.DuplicateTracker() if nlp.DEDUP_ENABLED else None
+        previous = store.iter_results(job_id, done) if tracker is not None and done else None
+        for batch in nlp.iter_classified_batches(text, spans, tracker=tracker, start=done, previous=previous):
+            store.save_results(job_id, owner, done, batch)
+            done += len(batch)
+    if not store.finish(job_id, owner, 'done'):
+        raise JobLost(job_id)
+
+
+class JobManager:
+    """
+    Pool de threads deste processo que consome a fila de jobs
+    """
+
+    def __init__(self, store: JobStore, workers: int = JOBS_WORKERS):
+        self.store = store
+        self.workers = workers
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._wake = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._active: Set[str] = set()  # jobs em andamento neste processo
+        self._active_lock = threading.Lock()
+
+    def start(self) -> None:
+        try:
+            self.store.purge(JOBS_RETENTION)
+        except sqlite3.Error:
+            pass
+        for n in range(max(0, self.workers)):
+            thread = threading.Thread(target=self._loop, name=f'jobs-{n}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        if self.workers > 0:
+            thread = threading.Thread(target=self._heartbeat_loop, name='jobs-heartbeat', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def notify(self) -> None:
+        self._wake.set()
+
+    def beat(self) -> int:
+        with self._active_lock:
+            active = list(self._active)
+        return self.store.heartbeat(self.owner, active)
+
+    def _heartbeat_loop(self) -> None:
+        # Lotes podem levar mais que JOBS_STALE_AFTER: o sinal de vida não depende deles
+        while True:
+            time.sleep(max(JOBS_STALE_AFTER / 4, 0.05))
+            try:
+                self.beat()
+            except sqlite3.Error as e:
+                log_event(logger, logging.WARNING, 'job_heartbeat_failed', error=str(e))
+
+    def _loop(self) -> None:
+        while True:
+            try:
+                self._step()
+            except Exception as e:
+                # A thread não pode morrer: o job fica 'running' e volta para a fila
+                # quando o heartbeat expirar
+                log_event(logger, logging.ERROR, 'job_loop_error', error=f"{type(e).__name__}: {e}")
+                time.sleep(JOBS_POLL_INTERVAL)
+
+    def _step(self) -> None:
+        try:
+            job = self.store.claim(self.owner)
+        except sqlite3.Error as e:
+            log_event(logger, logging.WARNING, 'job_claim_failed', error=str(e))
+            job = None
+        if job is None:
+            self._wake.wait(JOBS_POLL_INTERVAL)
+            self._wake.clear()
+            return
+        with self._active_lock:
+            self._active.add(job['id'])
+        t0 = time.perf_counter()
+        try:
+            run_job(self.store, job)
+            log_event(logger, logging.INFO, 'job_done', job=job['id'], attempts=job['attempts'],
+                      resumed_from=job['done'], seconds=round(time.perf_counter() - t0, 3))
+        except JobLost:
+            log_event(logger, logging.WARNING, 'job_lost', job=job['id'])
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            log_event(logger, logging.WARNING, 'job_failed', job=job['id'], error=error)
+            try:
+                self.store.finish(job['id'], self.owner, 'failed', error)
+            except sqlite3.Error as db_error:
+                log_event(logger, logging.WARNING, 'job_finish_failed', job=job['id'], error=str(db_error))
+        finally:
+            with self._active_lock:
+                self._active.discard(job['id'])
+
+
+_MANAGER = None
+_MANAGER_PID = None
+_MANAGER_LOCK = threading.Lock()
+
+
+def get_manager() -> JobManager:
+    # Threads não sobrevivem ao fork (gunicorn --preload): um pool por processo
+    global _MANAGER, _MANAGER_PID
+    with _MANAGER_LOCK:
+        if _MANAGER is None or _MANAGER_PID != os.getpid():
+            _MANAGER = JobManager(JobStore())
+            _MANAGER.start()
+            _MANAGER_PID = os.getpid()
+        return _MANAGER
+
+
+def submit(text: str | None = None, filename: str | None = None, payload: bytes | None = None) -> str:
+    manager = get_manager()
+    job_id = manager.store.create(text=text, filename=filename, payload=payload)
+    manager.notify()
+    return job_id
+
+
+def job_status(job_id: str) -> Dict | None:
+    job = get_manager().store.get(job_id)
+    if job is None:
+        return None
+    job['is_multi'] = None if job['is_multi'] is None else bool(job['is_multi'])
+    job['progress'] = job['done'] / job['total'] if job['total'] else 0.0
+    return job
+
+
+def job_results(job_id: str, offset: int = 0, limit: int = 100) -> List[Dict]:
+    return get_manager().store.results(job_id, offset, limit)
@@ -0,0 +1,263 @@
+import os
+import re
+import math
+import zlib
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from nlp import preprocess
+
+
+# Classificador linear leve: bag de n-gramas de palavras do texto de
+# `preprocess` (números mascarados), projetado por hashing em 2**bits
+# posições com sinal alternado, e pesos de regressão logística treinados
+# offline (train_linear.py). O lote inteiro vira uma matriz esparsa em
+# coordenadas e o score é um único produto esparso x denso (np.bincount);
+# a confiança sai da calibração de Platt feita na validação do treino.
+LINEAR_WEIGHTS_PATH = os.getenv(
+    'LINEAR_WEIGHTS_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models', 'linear.npz'),
+)
+LINEAR_HASH_BITS = int(os.getenv('LINEAR_HASH_BITS', '18'))  # só no treino: o arquivo guarda o valor usado
+LINEAR_NGRAM_MAX = int(os.getenv('LINEAR_NGRAM_MAX', '2'))
+
+CATEGORIES = ('Improdutivo', 'Produtivo')  # rótulo 0 e 1
+FORMAT_VERSION = 1
+PLATT_MAX_SLOPE = 50.0  # limite de `a` na calibração (scores do treino ficam em poucas unidades)
+
+_DIGITS_RE = re.compile(r'\d+')
+
+
+def weights_fingerprint(path: str = LINEAR_WEIGHTS_PATH) -> str | None:
+    # Muda quando o arquivo de pesos é regravado (entra na chave do cache)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return f"{st.st_mtime_ns}-{st.st_size}"
+
+
+@lru_cache(maxsize=1 << 16)
+def _gram_hash(gram: str) -> int:
+    # O vocabulário de e-mails se repete muito: o hash de cada n-grama é calculado uma vez
+    return zlib.crc32(gram.encode('utf-8'))
+
+
+def _gram_hashes(pre: str, ngram_max: int) -> List[int]:
+    tokens = _DIGITS_RE.sub('0', pre).split()
+    hashes = list(map(_gram_hash, tokens))
+    for n in range(2, ngram_max + 1):
+        hashes.extend(map(_gram_hash, map(' '.join, zip(*(tokens[k:] for k in range(n))))))
+    return hashes
+
+
+def vectorize(pres: List[str], bits: int, ngram_max: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Matriz esparsa do lote em coordenadas (linhas, colunas, valores): contagem
+    com sinal de cada posição do hashing, tf sublinear (1 + log) e norma L2
+    igual a 1 por e-mail. Só o hash dos n-gramas roda em Python; o resto é
+    feito de uma vez para o lote.
+    """
+    per_text = [_gram_hashes(pre, ngram_max) for pre in pres]
+    hashes = np.fromiter((h for hs in per_text for h in hs), dtype=np.int64)
+    rows = np.repeat(np.arange(len(pres), dtype=np.int64), [len(hs) for hs in per_text])
+    # Bit alto do hash define o sinal: colisões tendem a se cancelar em vez de somar
+    signs = np.where(hashes & 0x80000000, 1.0, -1.0)
+    keys, inverse = np.unique((rows << bits) | (hashes & ((1 << bits) - 1)), return_inverse=True)
+    counts = np.bincount(inverse, weights=signs, minlength=len(keys))
+    nonzero = counts != 0
+    keys, counts = keys[nonzero], counts[nonzero]
+    rows, cols = keys >> bits, keys & ((1 << bits) - 1)
+    vals = np.sign(counts) * (1.0 + np.log(np.abs(counts)))
+    norms = np.sqrt(np.bincount(rows, weights=vals * vals, minlength=len(pres)))
+    vals = vals / norms[rows]
+    return rows, cols, vals.astype(np.float32)
+
+
+def _scores(matrix, n: int, weights: np.ndarray, bias: float) -> np.ndarray:
+    rows, cols, vals = matrix
+    return np.bincount(rows, weights=vals * weights[cols], minlength=n) + bias
+
+
+def _sigmoid(z: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-np.clip(z, -35, 35)))
+
+
+class LinearClassifier:
+    def __init__(self, weights: np.ndarray, bias: float, platt: Tuple[float, float], bits: int, ngram_max: int,
+                 path: str | None = None):
+        self.weights = weights
+        self.bias = float(bias)
+        self.platt = (float(platt[0]), float(platt[1]))
+        self.bits = bits
+        self.ngram_max = ngram_max
+        self.path = path
+
+    @classmethod
+    def load(cls, path: str | None = None) -> 'LinearClassifier':
+        path = path or LINEAR_WEIGHTS_PATH
+        with np.load(path, allow_pickle=False) as data:
+            if int(data['version']) != FORMAT_VERSION:
+                raise ValueError(f"formato de pesos não suportado: {int(data['version'])}")
+            bits = int(data['bits'])
+            # Só os pesos não nulos ficam no arquivo
+            weights = np.zeros(1 << bits, dtype=np.float32)
+            weights[data['indices']] = data['values']
+            return cls(weights, float(data['bias']), tuple(data['platt']), bits, int(data['ngram_max']), path)
+
+    def save(self, path: str) -> None:
+        nonzero = np.flatnonzero(self.weights)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = path + '.tmp.npz'
+        np.savez_compressed(
+            tmp, version=np.array(FORMAT_VERSION), bits=np.array(self.bits), ngram_max=np.array(self.ngram_max),
+            indices=nonzero.astype(np.int32), values=self.weights[nonzero],
+            bias=np.array(self.bias), platt=np.array(self.platt),
+        )
+        os.replace(tmp, path)
+
+    @property
+    def model(self):
+        return self
+
+    @property
+    def nbytes(self) -> int:
+        return self.weights.nbytes
+
+    def scores(self, pres: List[str]) -> np.ndarray:
+        # Score linear (antes da calibração) de cada texto pré-processado
+        return _scores(vectorize(pres, self.bits, self.ngram_max), len(pres), self.weights, self.bias)
+
+    def probabilities(self, pres: List[str]) -> np.ndarray:
+        a, c = self.platt
+        return _sigmoid(a * self.scores(pres) + c)
+
+    def predict(self, texts: List[str]) -> List[Dict]:
+        """
+        Classifica um lote de textos normalizados com um único produto esparso x denso
+        """
+        probs = self.probabilities([preprocess(t) for t in texts])
+        return [
+            {'category': CATEGORIES[1], 'confidence': float(p)} if p >= 0.5
+            else {'category': CATEGORIES[0], 'confidence': float(1 - p)}
+            for p in probs
+        ]
+
+
+def _fit_logistic(matrix, y: np.ndarray, dim: int, l2: float, epochs: int, lr: float):
+    """
+    Regressão logística com L2 por gradiente completo e passo AdaGrad por
+    coordenada (n-gramas raros recebem passos maiores)
+    """
+    rows, cols, vals = matrix
+    n = len(y)
+    weights = np.zeros(dim, dtype=np.float64)
+    bias = 0.0
+    acc_w = np.full(dim, 1e-8)
+    acc_b = 1e-8
+    for _ in range(epochs):
+        residual = _sigmoid(_scores(matrix, n, weights, bias)) - y
+        grad_w = np.bincount(cols, weights=vals * residual[rows], minlength=dim) / n + l2 * weights
+        grad_b = residual.mean()
+        acc_w += grad_w * grad_w
+        acc_b += grad_b * grad_b
+        weights -= lr * grad_w / np.sqrt(acc_w)
+        bias -= lr * grad_b / math.sqrt(acc_b)
+    # Pesos sem nenhum exemplo continuam exatamente zero (arquivo compacto)
+    return weights.astype(np.float32), bias
+
+
+def _platt_loss(scores: np.ndarray, target: np.ndarray, a: float, c: float) -> float:
+    # Log-loss contra os alvos suavizados, estável para |z| grande
+    z = a * scores + c
+    return float((np.logaddexp(0.0, z) - target * z).sum())
+
+
+def _fit_platt(scores: np.ndarray, y: np.ndarray, iterations: int = 100) -> Tuple[float, float]:
+    """
+    Calibração de Platt: sigmoid(a * score + c) ajustada sobre alvos
+    suavizados, para a confiança refletir a taxa de acerto. Newton com busca
+    linear (passo cortado pela metade até a perda cair) e `a` limitado a
+    [0, PLATT_MAX_SLOPE]: com validação separável o passo puro diverge.
+    """
+    positives = float(y.sum())
+    negatives = float(len(y) - positives)
+    if not positives or not negatives:
+        return 1.0, 0.0
+    target = np.where(y > 0, (positives + 1) / (positives + 2), 1 / (negatives + 2))
+    a, c = 0.0, math.log((positives + 1) / (negatives + 1))
+    loss = _platt_loss(scores, target, a, c)
+    for _ in range(iterations):
+        p = _sigmoid(a * scores + c)
+        r = p - target
+        g = np.array([(r * scores).sum(), r.sum()])
+        if np.abs(g).max() < 1e-6:
+            break
+        w = p * (1 - p)
+        h = np.array([[(w * scores * scores).sum() + 1e-12, (w * scores).sum()],
+                      [(w * scores).sum(), w.sum() + 1e-12]])
+        step = np.linalg.solve(h, g)
+        t = 1.0
+        while t >= 1e-10:
+            new_a = min(max(a - t * step[0], 0.0), PLATT_MAX_SLOPE)
+            new_c = c - t * step[1]
+            new_loss = _platt_loss(scores, target, new_a, new_c)
+            if new_loss < loss:
+                break
+            t /= 2
+        else:
+            break  # nenhum passo melhora: mínimo (ou limite de `a`) alcançado
+        a, c, loss = new_a, new_c, new_loss
+    return float(a), float(c)
+
+
+def calibration_report(probs: np.ndarray, y: np.ndarray, bins: int = 10) -> Dict:
+    # Acurácia, log-loss e erro de calibração esperado (ECE) da confiança prevista
+    if not len(y):
+        return {'emails': 0}
+    predicted = (probs >= 0.5).astype(float)
+    confidence = np.where(predicted > 0, probs, 1 - probs)
+    correct = (predicted == y).astype(float)
+    edges = np.minimum((confidence - 0.5) * 2 * bins, bins - 1).astype(int)
+    ece = sum(
+        abs(correct[edges == b].mean() - confidence[edges == b].mean()) * (edges == b).sum()
+        for b in range(bins) if (edges == b).any()
+    ) / len(y)
+    probs = np.clip(probs, 1e-12, 1 - 1e-12)
+    log_loss = -np.mean(y * np.log(probs) + (1 - y) * np.log(1 - probs))
+    return {'emails': int(len(y)), 'accuracy': float(correct.mean()), 'log_loss': float(log_loss), 'ece': float(ece)}
+
+
+def train(texts: List[str], labels: List[str], bits: int = LINEAR_HASH_BITS, ngram_max: int = LINEAR_NGRAM_MAX,
+          l2: float = 1e-4, epochs: int = 300, lr: float = 0.5, validation: float = 0.2,
+          seed: int = 42) -> Tuple[LinearClassifier, Dict]:
+    """
+    Treina com e-mails normalizados e rótulos 'Produtivo'/'Improdutivo'.
+    Uma fração `validation` fica de fora do ajuste dos pesos e serve para a
+    calibração e para o relatório.
+    """
+    pres = [preprocess(t) for t in texts]
+    y = np.array([1.0 if label == CATEGORIES[1] else 0.0 for label in labels])
+    dim = 1 << bits
+    order = np.random.default_rng(seed).permutation(len(pres))
+    n_val = int(len(pres) * validation) if len(pres) >= 10 else 0
+    val_idx, train_idx = order[:n_val], order[n_val:]
+
+    def subset(idx):
+        return vectorize([pres[i] for i in idx], bits, ngram_max), y[idx]
+
+    train_matrix, y_train = subset(train_idx)
+    weights, bias = _fit_logistic(train_matrix, y_train, dim, l2, epochs, lr)
+    report = {'train': {'emails': int(len(train_idx)), 'produtivos': int(y_train.sum())}}
+    platt = (1.0, 0.0)
+    if n_val:
+        val_matrix, y_val = subset(val_idx)
+        val_scores = _scores(val_matrix, n_val, weights, bias)
+        report['validation_raw'] = calibration_report(_sigmoid(val_scores), y_val)
+        platt = _fit_platt(val_scores, y_val)
+        report['validation'] = calibration_report(_sigmoid(platt[0] * val_scores + platt[1]), y_val)
+    report['platt'] = list(platt)
+    report['nonzero_weights'] = int(np.count_nonzero(weights))
+    return LinearClassifier(weights, bias, platt, bits, ngram_max), report
@@ -0,0 +1,274 @@
+import os
+import re
+import html
+import json
+import mmap
+import zlib
+import email
+from email.errors import HeaderParseError
+from email.header import decode_header, make_header
+from typing import Dict, Iterator, List, NamedTuple
+
+
+# Leitura nativa de .eml/.mbox. O mbox é varrido uma única vez atrás das
+# linhas "From " que separam as mensagens, o que gera só um índice de offsets
+# em bytes; cabeçalhos e partes MIME de texto são decodificados apenas quando
+# a mensagem é classificada. O índice é salvo ao lado do arquivo (ou em
+# MAIL_INDEX_DIR): reexecuções não varrem de novo, um mbox que só cresceu é
+# indexado a partir da última mensagem, e faixas disjuntas de mensagens podem
+# ser lidas por processos diferentes direto do arquivo.
+MAIL_EXTENSIONS = ('.eml', '.mbox')
+MAIL_INDEX_DIR = os.getenv('MAIL_INDEX_DIR') or None  # padrão: ao lado do mbox
+MAIL_INDEX_SUFFIX = '.idx.json'
+INDEX_VERSION = 1
+
+_FROM_LINE_RE = re.compile(rb'^From [^\n]*\n', re.MULTILINE)
+_MBOXRD_RE = re.compile(rb'^>(>*From )', re.MULTILINE)
+_BREAK_RE = re.compile(r'<br\s*/?>|</(?:p|div|tr|li)>', re.IGNORECASE)
+_TAG_RE = re.compile(r'<(script|style)\b.*?</\1>|<[^>]+>', re.IGNORECASE | re.DOTALL)
+_HEAD_BYTES = 4096  # trecho do início que identifica o arquivo no índice
+
+
+class MessageRef(NamedTuple):
+    """
+    Posição de uma mensagem no arquivo (sem a linha "From " do mbox)
+    """
+    number: int
+    start: int
+    end: int
+
+    @property
+    def id(self) -> str:
+        return f'Email {self.number}'
+
+
+def scan_mbox(buffer, start: int = 0, number: int = 1) -> Iterator[MessageRef]:
+    """
+    Offsets das mensagens de um mbox (bytes ou mmap) a partir de `start`, que
+    deve ser o início de uma linha; sem nenhuma linha "From ", o conteúdo
+    inteiro é uma única mensagem
+    """
+    body = None
+    for match in _FROM_LINE_RE.finditer(buffer, start):
+        if body is not None:
+            yield MessageRef(number, body, match.start())
+            number += 1
+        elif match.start() > start and buffer[start:match.start()].strip():
+            # Texto antes da primeira linha "From " (arquivo .eml renomeado, por exemplo)
+            yield MessageRef(number, start, match.start())
+            number += 1
+        body = match.end()
+    if body is not None:
+        yield MessageRef(number, body, len(buffer))
+    elif buffer[start:].strip():
+        yield MessageRef(number, start, len(buffer))
+
+
+def _decode_payload(data: bytes, charset: str | None = None) -> str:
+    if charset:
+        try:
+            return data.decode(charset, errors='replace')
+        except LookupError:
+            pass  # charset desconhecido: mesma regra dos .txt
+    try:
+        return data.decode('utf-8')
+    except UnicodeDecodeError:
+        return data.decode('latin-1')
+
+
+def _decode_header(value) -> str:
+    if value is None:
+        return ''
+    try:
+        text = str(make_header(decode_header(str(value))))
+    except (HeaderParseError, LookupError, UnicodeError, ValueError):
+        text = str(value)
+    return ' '.join(text.split())
+
+
+def _html_to_text(markup: str) -> str:
+    return html.unescape(_TAG_RE.sub(' ', _BREAK_RE.sub('\n', markup)))
+
+
+def parse_message(raw: bytes, mbox: bool = False) -> tuple[str, str]:
+    """
+    Assunto e corpo de uma mensagem: partes text/plain (ou text/html sem as
+    tags, se não houver texto puro), sem os anexos
+    """
+    if mbox:
+        raw = _MBOXRD_RE.sub(rb'\1', raw)  # desfaz o escape ">From " do mbox
+    message = email.message_from_bytes(raw)
+    subject = _decode_header(message.get('Subject'))
+    plain, rich = [], []
+    for part in message.walk():
+        if part.is_multipart() or part.get_content_maintype() != 'text':
+            continue
+        if part.get_content_disposition() == 'attachment':
+            continue
+        payload = part.get_payload(decode=True) or b''
+        text = _decode_payload(payload, part.get_content_charset())
+        if part.get_content_subtype() == 'plain':
+            plain.append(text)
+        elif part.get_content_subtype() == 'html':
+            rich.append(_html_to_text(text))
+    body = '\n\n'.join(t.strip() for t in (plain or rich) if t.strip())
+    return subject, body
+
+
+def message_dict(ref: MessageRef, buffer, mbox: bool = True) -> Dict[str, str]:
+    # Mesmo formato de nlp.EmailSpan.to_dict; o assunto também entra no conteúdo
+    subject, body = parse_message(bytes(buffer[ref.start:ref.end]), mbox)
+    return {
+        'id': ref.id,
+        'header': subject,
+        'content': f"{subject}\n\n{body}".strip() if subject else body,
+        'category_hint': None,
+    }
+
+
+def iter_messages(data: bytes, mbox: bool) -> Iterator[Dict[str, str]]:
+    """
+    Mensagens de um .eml (uma só) ou .mbox já em memória, decodificadas uma a uma
+    """
+    refs = scan_mbox(data) if mbox else [MessageRef(1, 0, len(data))]
+    for ref in refs:
+        yield message_dict(ref, data, mbox)
+
+
+def index_path(path: str) -> str:
+    if MAIL_INDEX_DIR is None:
+        return path + MAIL_INDEX_SUFFIX
+    # Nome único por caminho absoluto: mboxes com o mesmo nome em pastas diferentes
+    tag = zlib.crc32(os.path.abspath(path).encode('utf-8'))
+    return os.path.join(MAIL_INDEX_DIR, f"{os.path.basename(path)}-{tag:08x}{MAIL_INDEX_SUFFIX}")
+
+
+class MailIndex:
+    """
+    Índice de offsets de um mbox. `head_crc` identifica o arquivo; `tail` é o
+    início da linha "From " da última mensagem e `tail_crc` o CRC do trecho
+    dali até `size`: se o arquivo só recebeu mensagens no fim, os dois
+    continuam batendo e a varredura recomeça em `tail`.
+    """
+
+    def __init__(self, size: int, refs: List[MessageRef], tail: int, head_crc: int, tail_crc: int):
+        self.size = size
+        self.refs = refs
+        self.tail = tail
+        self.head_crc = head_crc
+        self.tail_crc = tail_crc
+
+    @classmethod
+    def build(cls, buffer, previous: 'MailIndex | None' = None) -> 'MailIndex':
+        refs: List[MessageRef] = []
+        start = 0
+        if previous is not None and previous.matches_prefix(buffer):
+            # Só mensagens novas no fim: a última é relida (pode ter sido completada)
+            refs = previous.refs[:-1]
+            start = previous.tail
+        refs.extend(scan_mbox(buffer, start, len(refs) + 1))
+        tail = 0
+        if refs:
+            line = buffer.rfind(b'\n', 0, max(refs[-1].start - 1, 0))
+            tail = line + 1 if buffer[line + 1:refs[-1].start].startswith(b'From ') else refs[-1].start
+        size = len(buffer)
+        return cls(size, refs, tail, zlib.crc32(buffer[:_HEAD_BYTES]), zlib.crc32(buffer[tail:size]))
+
+    def matches_prefix(self, buffer) -> bool:
+        return (
+            len(buffer) >= self.size
+            # Arquivo menor que _HEAD_BYTES no índice: o CRC cobriu só `size` bytes
+            and zlib.crc32(buffer[:min(_HEAD_BYTES, self.size)]) == self.head_crc
+            and zlib.crc32(buffer[self.tail:self.size]) == self.tail_crc
+        )
+
+    def is_current(self, buffer) -> bool:
+        return len(buffer) == self.size and self.matches_prefix(buffer)
+
+    @classmethod
+    def load(cls, path: str) -> 'MailIndex | None':
+        # Índice ausente, corrompido ou de outra versão: None (o mbox é varrido de novo)
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') != INDEX_VERSION:
+                return None
+            offsets = data['offsets']
+            refs = [MessageRef(n, s, e) for n, s, e in zip(offsets[0::3], offsets[1::3], offsets[2::3])]
+            return cls(data['size'], refs, data['tail'], data['head_crc'], data['tail_crc'])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def save(self, path: str) -> bool:
+        data = {
+            'version': INDEX_VERSION,
+            'size': self.size,
+            'tail': self.tail,
+            'head_crc': self.head_crc,
+            'tail_crc': self.tail_crc,
+            'offsets': [v for ref in self.refs for v in ref],
+        }
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(tmp, path)
+            return True
+        except OSError:
+            # Diretório só de leitura: segue sem índice persistido
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return False
+
+    def ranges(self, size: int) -> Iterator[List[MessageRef]]:
+        # Faixas disjuntas de mensagens consecutivas, uma por tarefa
+        for i in range(0, len(self.refs), max(1, size)):
+            yield self.refs[i:i + size]
+
+
+class MailFile:
+    """
+    .eml/.mbox mapeado só para leitura; as mensagens são decodificadas uma a
+    uma, sob demanda
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.mbox = path.lower().endswith('.mbox')
+        self.file = open(path, 'rb')
+        size = os.fstat(self.file.fileno()).st_size
+        # mmap não aceita arquivo vazio
+        self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+
+    def index(self, persist: bool = True) -> MailIndex:
+        """
+        Índice do arquivo: reaproveita o salvo se o arquivo não mudou, completa
+        se ele só cresceu e varre tudo nos demais casos
+        """
+        if not self.mbox:
+            refs = [MessageRef(1, 0, len(self.buffer))] if self.buffer else []
+            return MailIndex(len(self.buffer), refs, 0, 0, 0)
+        path = index_path(self.path)
+        previous = MailIndex.load(path)
+        if previous is not None and previous.is_current(self.buffer):
+            return previous
+        index = MailIndex.build(self.buffer, previous)
+        if persist:
+            index.save(path)
+        return index
+
+    def message(self, ref: MessageRef) -> Dict[str, str]:
+        return message_dict(ref, self.buffer, self.mbox)
+
+    def close(self) -> None:
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+        self.file.close()
+
+    def __enter__(self) -> 'MailFile':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,91 @@
+import time
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, List
+
+
+class MicroBatcher:
+    """
+    Fila de inferência por processo: chamadas concorrentes (threads de
+    requests diferentes) entram na fila e uma única thread as agrupa em lotes
+    de até `max_size` itens, esperando no máximo `wait` segundos por mais
+    itens depois do primeiro. `fn` recebe a lista de itens e devolve a lista
+    de resultados na mesma ordem; um erro vale para todos os itens do lote.
+    """
+
+    def __init__(self, fn: Callable[[List], List], max_size: int, wait: float, name: str = 'microbatch'):
+        self.fn = fn
+        self.max_size = max(1, max_size)
+        self.wait = max(0.0, wait)
+        self.name = name
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats = {'batches': 0, 'items': 0, 'max_batch': 0, 'errors': 0}
+        self._last_size = 0
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+                    self._thread.start()
+
+    def submit_many(self, items: List) -> List:
+        # Bloqueia até todos os itens serem processados (podem cair em lotes diferentes)
+        self._ensure_thread()
+        futures = []
+        for item in items:
+            future = Future()
+            self._queue.put((item, future))
+            futures.append(future)
+        return [future.result() for future in futures]
+
+    def submit(self, item):
+        return self.submit_many([item])[0]
+
+    def _next_batch(self) -> List[tuple]:
+        batch = [self._queue.get()]
+        # Sem concorrência no último lote, não espera: um request sozinho não
+        # paga a janela; sob carga os itens se acumulam durante o forward anterior
+        wait = self.wait if self._last_size > 1 else 0.0
+        deadline = time.monotonic() + wait
+        while len(batch) < self.max_size:
+            remaining = deadline - time.monotonic()
+            try:
+                # Itens que já estão na fila entram mesmo com a janela esgotada
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self) -> None:
+        while True:
+            batch = self._next_batch()
+            items = [item for item, _ in batch]
+            self._last_size = len(items)
+            try:
+                results = self.fn(items)
+                if len(results) != len(items):
+                    raise RuntimeError(f"{self.name}: {len(results)} resultados para {len(items)} itens")
+            except BaseException as e:
+                with self._lock:
+                    self._stats['errors'] += 1
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            with self._lock:
+                self._stats['batches'] += 1
+                self._stats['items'] += len(items)
+                self._stats['max_batch'] = max(self._stats['max_batch'], len(items))
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats['mean_batch'] = stats['items'] / stats['batches'] if stats['batches'] else 0.0
+        stats['max_size'] = self.max_size
+        stats['wait_ms'] = self.wait * 1000
+        return stats
@@ -1,7 +1,23 @@
 import re
 import os
+import logging
 import io
-from typing import Dict, List
+import codecs
+import time
+import threading
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, NamedTuple
+
+from cache import content_cache, make_key
+from telemetry import CLASSIFICATIONS, MODEL_FAILURES, inc, log_event, observe, timed
+from responders import Reply, suggest_replies, reply_template, reuse_reply, uses_openai
+from dedup import DEDUP_ENABLED, DEDUP_MAX_ITEMS, NearDuplicateIndex
+from microbatch import MicroBatcher
+from pdf_extract import PdfPages, extract_pdf_text
+from mail_extract import MAIL_EXTENSIONS, iter_messages
+
+
+logger = logging.getLogger(__name__)
 
 
 # Stopwords básicas PT/EN (reduzidas para evitar downloads em produção)
@@ -15,36 +31,351 @@ SUB_INTENT_PATTERNS = {
 'attachment': [r'\banexo\b', r'\barquivo\b', r'\bdocumento\b', r'\banexei\b', r'\bsegue?\b'],
 'greetings': [r'\bparabéns\b', r'\bfeliz\b', r'\bobrigad', r'\bagradec', r'\bboas festas\b', r'\bcongrat', r'\bthanks?\b'],
 }
+SUB_INTENT_ORDER = ['status_update', 'attachment', 'greetings']
 
 
-# Zero-shot local com transformers (otimizado para memória baixa)
-_CACHE_PIPELINE = None
+def _compile_sub_intent_matcher():
+    # Uma única regex com um grupo nomeado por padrão (p0, p1, ...). Quando
+    # todos os padrões começam com \b + letra, o \b é fatorado e a primeira
+    # letra vira um filtro: o motor descarta rápido as posições que não interessam.
+    flat = [(intent, p) for intent, patterns in SUB_INTENT_PATTERNS.items() for p in patterns]
+    if all(p.startswith(r'\b') and p[2:3].isalpha() for _, p in flat):
+        first = ''.join(sorted({p[2] for _, p in flat}))
+        alternation = '|'.join(f'(?P<p{n}>{p[2:]})' for n, (_, p) in enumerate(flat))
+        regex = rf'\b(?=[{first}])(?:{alternation})'
+    else:
+        regex = '|'.join(f'(?P<p{n}>{p})' for n, (_, p) in enumerate(flat))
+    # Padrões que podem casar mais de uma palavra (ex.: "boas festas")
+    multiword = {f'p{n}' for n, (_, p) in enumerate(flat) if not re.fullmatch(r'\\b[\w()|?]+(\\b)?', p)}
+    return flat, multiword, re.compile(regex, re.IGNORECASE)
 
 
-def _get_zero_shot_pipeline():
-    global _CACHE_PIPELINE
-    if _CACHE_PIPELINE is not None:
-        return _CACHE_PIPELINE
+_SUB_INTENT_FLAT, _SUB_INTENT_MULTIWORD, _SUB_INTENT_RE = _compile_sub_intent_matcher()
+
+
+# Palavras indicativas do classificador heurístico (busca por substring)
+HEURISTIC_PROD = (
+    'andamento', 'atualiza', 'status', 'prazo', 'previs', 'erro', 'bug', 'falha', 'problema',
+    'suporte', 'duvida', 'acesso', 'liberacao', 'conta', 'fatura', 'boleto', 'chamado', 'protocolo', 'anexo', 'segue'
+)
+HEURISTIC_IMPR = ('parabens', 'feliz', 'boas', 'agradec', 'obrigad', 'bom dia', 'boa tarde', 'boa noite', 'saudacoes')
+
+
+# Modelos locais (zero-shot com transformers, ou protótipos de embedding),
+# carregados sob demanda e mantidos em cache por processo
+CLASSIFIER_BACKENDS = ('zero-shot', 'embedding', 'linear')
+_MODELS = {}
+_MODEL_LOCK = threading.Lock()
+# Estado do carregamento por tipo de modelo: falhas ficam em cache e só são
+# tentadas de novo depois de um backoff exponencial (evita reimportar
+# transformers a cada request)
+_MODEL_STATE = {}
+
+
+def _new_model_state() -> Dict:
+    return {
+        'load_seconds': None,
+        'memory_bytes': None,
+        'rss_bytes': None,
+        'last_error': None,
+        'failures': 0,
+        'retry_at': 0.0,
+    }
+
+
+ZSC_RETRY_BACKOFF = float(os.getenv('ZSC_RETRY_BACKOFF', '30'))  # segundos (dobra a cada falha)
+ZSC_RETRY_BACKOFF_MAX = float(os.getenv('ZSC_RETRY_BACKOFF_MAX', '600'))
+
+ZSC_LABELS = ["technical support", "social conversation"]  # Labels em inglês para BART
+ZSC_MAX_CHARS = 300  # Truncar texto para economizar memória
+ZSC_BATCH_SIZE = int(os.getenv('ZSC_BATCH_SIZE', '8'))
+
+# Micro-batching: com o servidor em threads (gunicorn.conf.py), todas as
+# chamadas ao modelo do processo passam por uma fila; pedidos concorrentes
+# viram um único lote de até MICROBATCH_MAX_SIZE e-mails, com espera máxima
+# de MICROBATCH_WAIT_MS depois do primeiro
+MICROBATCH_ENABLED = os.getenv('MICROBATCH_ENABLED', '1') == '1'
+MICROBATCH_MAX_SIZE = int(os.getenv('MICROBATCH_MAX_SIZE', '16'))
+MICROBATCH_WAIT_MS = float(os.getenv('MICROBATCH_WAIT_MS', '5'))
+
+# E-mails longos: no modo 'chunk' o texto é dividido em janelas de palavras com
+# sobreposição, todas classificadas em uma única chamada ao modelo, e os scores
+# são combinados ('max' ou 'weighted' pelo tamanho da janela). O modo 'truncate'
+# mantém o comportamento antigo: heurística acima de 1000 caracteres e só os
+# primeiros ZSC_MAX_CHARS caracteres para o modelo.
+LONG_EMAIL_MODE = os.getenv('LONG_EMAIL_MODE', 'chunk')
+LONG_WINDOW_TOKENS = int(os.getenv('LONG_WINDOW_TOKENS', '64'))
+LONG_WINDOW_OVERLAP = int(os.getenv('LONG_WINDOW_OVERLAP', '16'))
+LONG_MAX_WINDOWS = int(os.getenv('LONG_MAX_WINDOWS', '8'))  # limita a latência por e-mail
+LONG_COMBINE = os.getenv('LONG_COMBINE', 'max')
+
+# Cascata: a heurística decide os casos claros (pontuação >= PRODUCTIVE_SCORE ou
+# <= UNPRODUCTIVE_SCORE) e só os neutros/ambíguos vão para o modelo
+CASCADE_ENABLED = os.getenv('CASCADE_ENABLED', '1') == '1'
+CASCADE_PRODUCTIVE_SCORE = int(os.getenv('CASCADE_PRODUCTIVE_SCORE', '1'))
+CASCADE_UNPRODUCTIVE_SCORE = int(os.getenv('CASCADE_UNPRODUCTIVE_SCORE', '-1'))
+
+# Contadores por camada: cache, duplicate (quase-duplicata de outro e-mail do
+# mesmo arquivo/lote), heuristic_only (RENDER/texto longo), heuristic (decidido
+# pela cascata), model e fallback (modelo indisponível ou com erro)
+TIERS = ('cache', 'duplicate', 'heuristic_only', 'heuristic', 'model', 'fallback')
+_TIER_COUNTS = dict.fromkeys(TIERS, 0)
+_TIER_LOCK = threading.Lock()
+
+
+def _count_tier(tier: str, n: int = 1) -> None:
+    with _TIER_LOCK:
+        _TIER_COUNTS[tier] += n
+    inc(CLASSIFICATIONS, tier, n)
+
+
+def _tier_method(tier: str) -> str:
+    # Rótulo `method` das métricas de classificação: o modelo aparece pelo backend
+    return classifier_backend() if tier == 'model' else tier
+
+
+def _log_heuristic_only(count: int) -> None:
+    reason = 'render' if _render_heuristic_only() else 'long_text'
+    log_event(logger, logging.INFO, 'heuristic_only', emails=count, reason=reason)
+
+
+def _model_failed(error: Exception) -> None:
+    # Erro na inferência: o e-mail cai na heurística (sem cache)
+    backend = classifier_backend()
+    inc(MODEL_FAILURES, backend)
+    log_event(logger, logging.WARNING, 'model_fallback', backend=backend, error=f"{type(error).__name__}: {error}")
+
+
+def tier_stats() -> Dict:
+    with _TIER_LOCK:
+        counts = dict(_TIER_COUNTS)
+    total = sum(counts.values())
+    return {
+        'cascade_enabled': CASCADE_ENABLED,
+        'thresholds': {'productive': CASCADE_PRODUCTIVE_SCORE, 'unproductive': CASCADE_UNPRODUCTIVE_SCORE},
+        'counts': counts,
+        'total': total,
+        'model_fraction': counts['model'] / total if total else 0.0,
+        'microbatch': _BATCHER.stats() if MICROBATCH_ENABLED and _BATCHER_PID == os.getpid() else None,
+    }
+
+
+def _zsc_model_name() -> str:
+    # Usar modelo menor e mais eficiente para deploy gratuito
+    return os.getenv('ZSC_MODEL', 'facebook/bart-large-mnli')
+
+
+ZSC_BACKENDS = ('torch', 'int8', 'onnx')
+
+
+def _zsc_backend() -> str:
+    # torch: float32 (padrão) | int8: quantização dinâmica | onnx: ONNX Runtime
+    backend = os.getenv('ZSC_BACKEND', 'torch').lower()
+    return backend if backend in ZSC_BACKENDS else 'torch'
+
+
+def _build_pipeline(model: str, backend: str):
+    """
+    Monta o pipeline zero-shot no backend escolhido; todos devolvem o mesmo
+    formato (labels/scores), então classify_email não muda
+    """
+    from transformers import pipeline
+
+    if backend == 'onnx':
+        from optimum.onnxruntime import ORTModelForSequenceClassification
+        from transformers import AutoTokenizer
+
+        # ZSC_ONNX_PATH: diretório com o modelo já exportado (ou onde salvar a exportação)
+        onnx_path = os.getenv('ZSC_ONNX_PATH', '')
+        if onnx_path and os.path.isdir(onnx_path):
+            ort_model = ORTModelForSequenceClassification.from_pretrained(onnx_path)
+            tokenizer = AutoTokenizer.from_pretrained(onnx_path)
+        else:
+            ort_model = ORTModelForSequenceClassification.from_pretrained(model, export=True)
+            tokenizer = AutoTokenizer.from_pretrained(model)
+            if onnx_path:
+                ort_model.save_pretrained(onnx_path)
+                tokenizer.save_pretrained(onnx_path)
+        return pipeline('zero-shot-classification', model=ort_model, tokenizer=tokenizer)
+
+    import torch
+
+    if backend == 'int8':
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+        tokenizer = AutoTokenizer.from_pretrained(model)
+        fp32 = AutoModelForSequenceClassification.from_pretrained(
+            model, torch_dtype=torch.float32, low_cpu_mem_usage=True
+        )
+        # Pesos das camadas lineares em int8; ativações quantizadas em tempo de execução
+        quantized = torch.ao.quantization.quantize_dynamic(fp32, {torch.nn.Linear}, dtype=torch.qint8)
+        return pipeline('zero-shot-classification', model=quantized, tokenizer=tokenizer, device=-1)
+
+    # Configurações para otimizar memória
+    return pipeline(
+        'zero-shot-classification',
+        model=model,
+        device=-1,  # Forçar CPU
+        torch_dtype=torch.float32,  # Precisão padrão
+        model_kwargs={'low_cpu_mem_usage': True}
+    )
+
+
+def _model_memory_bytes(model) -> int | None:
+    # Tamanho dos pesos em memória (parâmetros + buffers + pesos int8 empacotados)
+    if hasattr(model, 'nbytes'):  # pesos NumPy (classificador linear)
+        return model.nbytes
     try:
-        from transformers import pipeline
         import torch
-        
-        # Usar modelo menor e mais eficiente para deploy gratuito
-        model = os.getenv('ZSC_MODEL', 'facebook/bart-large-mnli')
-        
-        # Configurações para otimizar memória
-        _CACHE_PIPELINE = pipeline(
-            'zero-shot-classification', 
-            model=model,
-            device=-1,  # Forçar CPU
-            torch_dtype=torch.float32,  # Precisão padrão
-            model_kwargs={'low_cpu_mem_usage': True}
-        )
-        return _CACHE_PIPELINE
+        total = 0
+        for value in model.state_dict().values():
+            if isinstance(value, torch.Tensor):
+                total += value.numel() * value.element_size()
+            elif isinstance(value, tuple):  # _packed_params de camadas quantizadas
+                total += sum(t.numel() * t.element_size() for t in value if isinstance(t, torch.Tensor))
+        return total
     except Exception:
+        return None  # ex.: modelo ONNX Runtime (pesos fora do PyTorch)
+
+
+def _rss_bytes() -> int | None:
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
         return None
 
 
+def _load_model(kind: str, build):
+    model = _MODELS.get(kind)
+    if model is not None:
+        return model
+    state = _MODEL_STATE.setdefault(kind, _new_model_state())
+    if time.monotonic() < state['retry_at']:
+        return None
+    with _MODEL_LOCK:
+        model = _MODELS.get(kind)
+        if model is not None:
+            return model
+        if time.monotonic() < state['retry_at']:
+            return None
+        t0 = time.perf_counter()
+        try:
+            model = build()
+        except Exception as e:
+            failures = state['failures'] + 1
+            backoff = min(ZSC_RETRY_BACKOFF * 2 ** (failures - 1), ZSC_RETRY_BACKOFF_MAX)
+            state.update(
+                failures=failures,
+                last_error=f"{type(e).__name__}: {e}",
+                retry_at=time.monotonic() + backoff,
+            )
+            log_event(logger, logging.WARNING, f'model_load_failed:{kind}', classifier=kind,
+                      error=state['last_error'], failures=failures, retry_in_seconds=backoff)
+            return None
+
+        state.update(
+            load_seconds=time.perf_counter() - t0,
+            memory_bytes=_model_memory_bytes(model.model),
+            rss_bytes=_rss_bytes(),
+            last_error=None,
+            failures=0,
+            retry_at=0.0,
+        )
+        _MODELS[kind] = model
+        observe('model_load', kind, state['load_seconds'])
+        log_event(logger, logging.INFO, f'model_loaded:{kind}', classifier=kind,
+                  seconds=round(state['load_seconds'], 3), memory_bytes=state['memory_bytes'])
+        return model
+
+
+def _get_zero_shot_pipeline():
+    return _load_model('zero-shot', lambda: _build_pipeline(_zsc_model_name(), _zsc_backend()))
+
+
+def _get_embedding_classifier():
+    from embeddings import EmbeddingClassifier
+    return _load_model('embedding', EmbeddingClassifier.load)
+
+
+def _get_linear_classifier():
+    from linear import LinearClassifier
+    return _load_model('linear', LinearClassifier.load)
+
+
+def classifier_backend() -> str:
+    # Modelo usado quando a heurística não decide sozinha: zero-shot (padrão), embedding ou linear
+    backend = os.getenv('CLASSIFIER_BACKEND', 'zero-shot').lower()
+    return backend if backend in CLASSIFIER_BACKENDS else 'zero-shot'
+
+
+def _get_classifier_model():
+    if classifier_backend() == 'embedding':
+        return _get_embedding_classifier()
+    if classifier_backend() == 'linear':
+        return _get_linear_classifier()
+    return _get_zero_shot_pipeline()
+
+
+def _classifier_signature() -> tuple:
+    # Identifica o modelo ativo (entra na chave do cache)
+    if classifier_backend() == 'embedding':
+        from embeddings import EMBED_MODEL, prototype_fingerprint
+        return ('embedding', EMBED_MODEL, prototype_fingerprint())
+    if classifier_backend() == 'linear':
+        from linear import LINEAR_WEIGHTS_PATH, weights_fingerprint
+        return ('linear', LINEAR_WEIGHTS_PATH, weights_fingerprint())
+    return ('zero-shot', _zsc_model_name(), _zsc_backend())
+
+
+def _render_heuristic_only() -> bool:
+    # Com RENDER definido só a heurística é usada, exceto com o classificador
+    # linear (alguns MB de pesos NumPy cabem no plano gratuito)
+    return bool(os.getenv('RENDER')) and classifier_backend() != 'linear'
+
+
+def model_required() -> bool:
+    return not _render_heuristic_only()
+
+
+def warm_up_model() -> bool:
+    """
+    Carrega o modelo antes do primeiro request. Chamado no import do app com
+    ZSC_PRELOAD=1; com `gunicorn --preload` o carregamento acontece no master e
+    os workers compartilham os pesos por copy-on-write após o fork.
+    """
+    if not model_required():
+        return False
+    loaded = _get_classifier_model() is not None
+    if loaded:
+        import gc
+        # Objetos já criados saem do GC: ele não toca mais nessas páginas,
+        # o que preserva o compartilhamento copy-on-write nos workers
+        gc.freeze()
+    return loaded
+
+
+def model_status() -> Dict:
+    kind = classifier_backend()
+    signature = _classifier_signature()
+    state = _MODEL_STATE.get(kind) or _new_model_state()
+    retry_in = max(0.0, state['retry_at'] - time.monotonic())
+    return {
+        'classifier': kind,
+        'model': signature[1],
+        'backend': _zsc_backend() if kind == 'zero-shot' else None,
+        'required': model_required(),
+        'loaded': kind in _MODELS,
+        'load_seconds': state['load_seconds'],
+        'memory_bytes': state['memory_bytes'],
+        'rss_bytes': _rss_bytes(),
+        'rss_after_load_bytes': state['rss_bytes'],
+        'failures': state['failures'],
+        'last_error': state['last_error'],
+        'retry_in_seconds': round(retry_in, 1) if retry_in else 0.0,
+    }
+
+
 
 
 def normalize_text(text: str) -> str:
@@ -67,18 +398,24 @@ def preprocess(text: str) -> str:
 
 
 def detect_sub_intent(text: str) -> tuple[str, List[str]]:
-    hits = []
+    # Varredura única do texto com a regex combinada
+    found = {m.lastgroup for m in _SUB_INTENT_RE.finditer(text)}
+    if found & _SUB_INTENT_MULTIWORD:
+        # Um match com mais de uma palavra pode esconder outro que comece dentro
+        # dele: refaz a busca avançando uma posição por vez após cada match.
+        found = set()
+        pos = 0
+        while (m := _SUB_INTENT_RE.search(text, pos)) is not None:
+            found.add(m.lastgroup)
+            pos = m.start() + 1
+
+    hits = [_SUB_INTENT_FLAT[int(g[1:])] for g in sorted(found, key=lambda g: int(g[1:]))]
     chosen = None
-    for intent, patterns in SUB_INTENT_PATTERNS.items():
-        for p in patterns:
-            if re.search(p, text, flags=re.IGNORECASE):
-                hits.append((intent, p))
-    
     if hits:
         # prioriza intents por ordem definida
-        order = ['status_update', 'attachment', 'greetings']
-        for o in order:
-            if any(h[0] == o for h in hits):
+        hit_intents = {h[0] for h in hits}
+        for o in SUB_INTENT_ORDER:
+            if o in hit_intents:
                 chosen = o
                 break
     
@@ -87,42 +424,49 @@ def detect_sub_intent(text: str) -> tuple[str, List[str]]:
 
 
 
-def classify_email(text: str) -> Dict:
-    raw = normalize_text(text)
-    pre = preprocess(raw)
-
+def _use_heuristic_only(text: str) -> bool:
     # Verificar se está em ambiente com pouca memória (Render Free)
-    if os.getenv('RENDER') or len(text) > 1000:
-        print("Usando classificação heurística (ambiente otimizado)")
-        category, conf = heuristic_classifier(pre)
-        return {
-            'category': category,
-            'confidence': conf,
-            'method': 'heuristic'
-        }
+    if _render_heuristic_only():
+        return True
+    # Sem o modo de janelas, textos longos ficam só com a heurística
+    return LONG_EMAIL_MODE != 'chunk' and len(text) > 1000
+
+
+def split_windows(raw: str) -> List[str]:
+    """
+    Divide um texto normalizado em janelas de LONG_WINDOW_TOKENS palavras com
+    sobreposição; acima de LONG_MAX_WINDOWS, mantém janelas espaçadas do
+    início ao fim (o pedido costuma estar no topo ou no fim da thread)
+    """
+    if LONG_EMAIL_MODE != 'chunk' or len(raw) <= ZSC_MAX_CHARS:
+        return [raw]
+    words = raw.split(' ')
+    size = max(1, LONG_WINDOW_TOKENS)
+    if len(words) <= size:
+        return [raw]
+    step = max(1, size - max(0, LONG_WINDOW_OVERLAP))
+    starts = list(range(0, len(words) - size + 1, step))
+    if starts[-1] + size < len(words):
+        starts.append(len(words) - size)
+    n = LONG_MAX_WINDOWS
+    if n > 0 and len(starts) > n:
+        last = len(starts) - 1
+        starts = [starts[round(k * last / (n - 1))] for k in range(n)] if n > 1 else starts[:1]
+    return [' '.join(words[start:start + size]) for start in starts]
 
-    # Tenta zero-shot com configurações otimizadas
-    zsc = _get_zero_shot_pipeline()
-    labels = ["technical support", "social conversation"]  # Labels em inglês para BART
-    if zsc is not None:
-        try:
-            # Truncar texto para economizar memória
-            text_truncated = raw[:300]
-            res = zsc(text_truncated, candidate_labels=labels)
-            if isinstance(res, list):
-                res = res[0]
-            scores = dict(zip(res["labels"], res["scores"]))
-            top_label = max(scores, key=scores.get)
-            conf = float(scores[top_label])
-            # Mapear de volta para os labels originais
-            category = "Produtivo" if top_label == "technical support" else "Improdutivo"
-        except Exception as e:
-            print(f"Fallback para heurística: {e}")
-            category, conf = heuristic_classifier(pre)
-    else:
-        category, conf = heuristic_classifier(pre)
 
+def _zero_shot_category(res) -> tuple[str, float]:
+    if isinstance(res, list):
+        res = res[0]
+    scores = dict(zip(res["labels"], res["scores"]))
+    top_label = max(scores, key=scores.get)
+    conf = float(scores[top_label])
+    # Mapear de volta para os labels originais
+    category = "Produtivo" if top_label == "technical support" else "Improdutivo"
+    return category, conf
 
+
+def _finalize_classification(raw: str, category: str, conf: float) -> Dict:
     sub_intent, signals = detect_sub_intent(raw)
     # Ajuste: saudações fortes → improdutivo, a menos que haja pedido junto
     if sub_intent == 'greetings' and category == 'Produtivo' and conf < 0.8:
@@ -135,24 +479,294 @@ def classify_email(text: str) -> Dict:
         'signals': signals,
     }
 
-def heuristic_classifier(pre: str):
-# Palavras indicativas
-    prod = [
-        'andamento','atualiza','status','prazo','previs', 'erro','bug','falha','problema',
-        'suporte','duvida','acesso','liberacao','conta','fatura','boleto','chamado','protocolo', 'anexo','segue'
-    ]
-    impr = ['parabens','feliz','boas','agradec','obrigad','bom dia','boa tarde','boa noite','saudacoes']
 
+def _classification_key(text: str, raw: str) -> str:
+    # Chave de cache: texto normalizado + rota (heurística ou modelo) + modelo
+    if _use_heuristic_only(text):
+        return make_key('clf', 'heuristic', raw)
+    cascade = (CASCADE_PRODUCTIVE_SCORE, CASCADE_UNPRODUCTIVE_SCORE) if CASCADE_ENABLED else None
+    windows = (
+        (LONG_WINDOW_TOKENS, LONG_WINDOW_OVERLAP, LONG_MAX_WINDOWS, LONG_COMBINE)
+        if LONG_EMAIL_MODE == 'chunk' else None
+    )
+    return make_key('clf', *_classifier_signature(), cascade, windows, raw)
 
-    score = 0
-    for p in prod:
-        if p in pre:
-            score += 1
-    for q in impr:
-        if q in pre:
-            score -= 1
 
+def _cascade_decision(raw: str, pre: str) -> Dict | None:
+    # Camada barata da cascata: devolve o resultado se a heurística for conclusiva
+    if not CASCADE_ENABLED:
+        return None
+    score = heuristic_score(pre)
+    if CASCADE_UNPRODUCTIVE_SCORE < score < CASCADE_PRODUCTIVE_SCORE:
+        return None
+    category, conf = _heuristic_decision(score)
+    result = _finalize_classification(raw, category, conf)
+    result['method'] = 'heuristic'
+    return result
+
+
+def _predict_texts(model, texts: List[str]) -> List[Dict]:
+    if classifier_backend() in ('embedding', 'linear'):
+        return model.predict(texts)
+
+    # Zero-shot: no modo 'truncate', truncar texto para economizar memória
+    if LONG_EMAIL_MODE != 'chunk':
+        texts = [text[:ZSC_MAX_CHARS] for text in texts]
+    if len(texts) == 1:
+        outputs = [model(texts[0], candidate_labels=ZSC_LABELS)]
+    else:
+        outputs = model(
+            texts,
+            candidate_labels=ZSC_LABELS,
+            batch_size=min(len(texts), max(ZSC_BATCH_SIZE, 1)),
+        )
+        if isinstance(outputs, dict):
+            outputs = [outputs]
+    predictions = []
+    for res in outputs:
+        category, conf = _zero_shot_category(res)
+        predictions.append({'category': category, 'confidence': conf})
+    return predictions
+
+
+def _combine_windows(windows: List[str], predictions: List[Dict]) -> Dict:
+    # Probabilidade de 'Produtivo' em cada janela (duas categorias: soma 1)
+    probs = [p['confidence'] if p['category'] == 'Produtivo' else 1 - p['confidence'] for p in predictions]
+    if LONG_COMBINE == 'weighted':
+        weights = [len(w) for w in windows]
+        prob = sum(p * w for p, w in zip(probs, weights)) / sum(weights)
+    else:
+        # 'max': um pedido em qualquer trecho torna o e-mail produtivo
+        prob = max(probs)
+    category = 'Produtivo' if prob >= 0.5 else 'Improdutivo'
+    combined = {'category': category, 'confidence': max(prob, 1 - prob), 'windows': len(windows)}
+    # Sub-intenção sugerida pela janela mais confiante na categoria escolhida
+    ranked = sorted(zip(probs, predictions), key=lambda item: item[0], reverse=(category == 'Produtivo'))
+    for _, p in ranked:
+        if p.get('sub_intent'):
+            combined['sub_intent'] = p['sub_intent']
+            break
+    return combined
 
+
+def _model_predict(model, raws: List[str]) -> List[Dict]:
+    """
+    Roda o modelo ativo sobre um lote de textos normalizados, com todas as
+    janelas dos e-mails longos em uma única chamada.
+    Retorna category/confidence (e sub_intent, quando o modelo sugere um).
+    """
+    windows = [split_windows(raw) for raw in raws]
+    predictions = _predict_texts(model, [w for ws in windows for w in ws])
+    results = []
+    offset = 0
+    for ws in windows:
+        chunk = predictions[offset:offset + len(ws)]
+        offset += len(ws)
+        results.append(chunk[0] if len(ws) == 1 else _combine_windows(ws, chunk))
+    return results
+
+
+def _run_model_batch(raws: List[str]) -> List[Dict]:
+    model = _get_classifier_model()
+    if model is None:
+        raise RuntimeError('modelo indisponível')
+    return _model_predict(model, raws)
+
+
+_BATCHER = None
+_BATCHER_PID = None
+_BATCHER_LOCK = threading.Lock()
+
+
+def _get_batcher() -> MicroBatcher:
+    # A thread da fila não sobrevive ao fork: uma fila por processo
+    global _BATCHER, _BATCHER_PID
+    with _BATCHER_LOCK:
+        if _BATCHER is None or _BATCHER_PID != os.getpid():
+            _BATCHER = MicroBatcher(_run_model_batch, MICROBATCH_MAX_SIZE, MICROBATCH_WAIT_MS / 1000, name='nlp-microbatch')
+            _BATCHER_PID = os.getpid()
+        return _BATCHER
+
+
+def _predict_raws(model, raws: List[str]) -> List[Dict]:
+    # Com micro-batching a inferência roda na thread da fila, junto com a de outros requests
+    if MICROBATCH_ENABLED:
+        return _get_batcher().submit_many(raws)
+    return _model_predict(model, raws)
+
+
+def _model_result(raw: str, prediction: Dict) -> Dict:
+    result = _finalize_classification(raw, prediction['category'], prediction['confidence'])
+    if prediction.get('sub_intent'):
+        result['sub_intent'] = prediction['sub_intent']
+    if prediction.get('windows'):
+        result['windows'] = prediction['windows']
+    return result
+
+
+def _classify_email(text: str) -> tuple[Dict, str]:
+    # Resultado e a camada que decidiu (cache, heuristic_only, heuristic, model, fallback)
+    raw = normalize_text(text)
+    key = _classification_key(text, raw)
+    cached = content_cache.get(key)
+    if cached is not None:
+        return cached, 'cache'
+
+    pre = preprocess(raw)
+
+    if _use_heuristic_only(text):
+        category, conf = heuristic_classifier(pre)
+        result = {
+            'category': category,
+            'confidence': conf,
+            'method': 'heuristic'
+        }
+        content_cache.set(key, result)
+        return result, 'heuristic_only'
+
+    result = _cascade_decision(raw, pre)
+    if result is not None:
+        content_cache.set(key, result)
+        return result, 'heuristic'
+
+    # Tenta o modelo (zero-shot ou embedding) com configurações otimizadas
+    model = _get_classifier_model()
+    if model is not None:
+        try:
+            result = _model_result(raw, _predict_raws(model, [raw])[0])
+            content_cache.set(key, result)
+            return result, 'model'
+        except Exception as e:
+            _model_failed(e)
+
+    # Fallback para heurística não entra no cache: o modelo pode voltar
+    category, conf = heuristic_classifier(pre)
+    return _finalize_classification(raw, category, conf), 'fallback'
+
+
+def classify_email(text: str) -> Dict:
+    t0 = time.perf_counter()
+    result, tier = _classify_email(text)
+    _count_tier(tier)
+    observe('classify', _tier_method(tier), time.perf_counter() - t0)
+    if tier == 'heuristic_only':
+        _log_heuristic_only(1)
+    return result
+
+
+def _classify_cheaply(texts: List[str]) -> tuple[List[Dict | None], List[tuple], List[tuple]]:
+    """
+    Primeira etapa de classify_emails_batch: cache, heurística pura e cascata.
+    Devolve os resultados já decididos (None nos demais), os pendentes do
+    modelo e os e-mails repetidos no lote
+    """
+    results: List[Dict | None] = [None] * len(texts)
+    pending = []  # (índice, texto normalizado, texto pré-processado, chave do cache)
+
+    heuristic_only = 0
+    first_by_key = {}
+    duplicates = []  # e-mails repetidos no mesmo lote: (índice, índice do primeiro)
+    for i, text in enumerate(texts):
+        t_item = time.perf_counter()
+        raw = normalize_text(text)
+        key = _classification_key(text, raw)
+        if key in first_by_key:
+            duplicates.append((i, first_by_key[key]))
+            continue
+        first_by_key[key] = i
+        cached = content_cache.get(key)
+        if cached is not None:
+            results[i] = cached
+            _count_tier('cache')
+            observe('classify', 'cache', time.perf_counter() - t_item)
+            continue
+        pre = preprocess(raw)
+        if _use_heuristic_only(text):
+            category, conf = heuristic_classifier(pre)
+            results[i] = {'category': category, 'confidence': conf, 'method': 'heuristic'}
+            content_cache.set(key, results[i])
+            heuristic_only += 1
+            _count_tier('heuristic_only')
+            observe('classify', 'heuristic_only', time.perf_counter() - t_item)
+            continue
+        decided = _cascade_decision(raw, pre)
+        if decided is not None:
+            results[i] = decided
+            content_cache.set(key, decided)
+            _count_tier('heuristic')
+            observe('classify', 'heuristic', time.perf_counter() - t_item)
+        else:
+            pending.append((i, raw, pre, key))
+    if heuristic_only:
+        _log_heuristic_only(heuristic_only)
+    return results, pending, duplicates
+
+
+def _classify_pending(results: List[Dict | None], pending: List[tuple], batch_size: int,
+                      timings: List[Dict] | None) -> None:
+    # Segunda etapa: o modelo em lotes de `batch_size` (heurística se ele falhar)
+    model = _get_classifier_model() if pending else None
+    for start in range(0, len(pending), batch_size):
+        chunk = pending[start:start + batch_size]
+        t0 = time.perf_counter()
+        predictions = None
+        if model is not None:
+            try:
+                predictions = _predict_raws(model, [raw for _, raw, _, _ in chunk])
+            except Exception as e:
+                _model_failed(e)
+                predictions = None
+
+        tier = 'model' if predictions is not None else 'fallback'
+        for j, (i, raw, pre, key) in enumerate(chunk):
+            if predictions is not None:
+                results[i] = _model_result(raw, predictions[j])
+                content_cache.set(key, results[i])
+            else:
+                category, conf = heuristic_classifier(pre)
+                results[i] = _finalize_classification(raw, category, conf)
+
+        seconds = time.perf_counter() - t0
+        _count_tier(tier, len(chunk))
+        observe('classify', _tier_method(tier), seconds / len(chunk), len(chunk))
+        if timings is not None:
+            timings.append({
+                'batch': start // batch_size,
+                'size': len(chunk),
+                'method': classifier_backend() if predictions is not None else 'heuristic',
+                'seconds': seconds,
+            })
+
+
+def classify_emails_batch(texts: List[str], batch_size: int | None = None, timings: List[Dict] | None = None) -> List[Dict]:
+    """
+    Classifica vários e-mails agrupando as chamadas ao modelo em lotes.
+    Mesmo resultado de chamar classify_email para cada texto; se `timings`
+    for uma lista, recebe o tempo de cada lote para ajuste do batch_size.
+    """
+    results, pending, duplicates = _classify_cheaply(texts)
+    _classify_pending(results, pending, max(1, batch_size or ZSC_BATCH_SIZE), timings)
+    for i, first in duplicates:
+        results[i] = dict(results[first])
+    return results
+
+
+def classify_cheaply(text: str) -> Dict | None:
+    """
+    Classificação pelo cache ou pela heurística, sem o modelo; None quando
+    o e-mail precisaria do modelo
+    """
+    return _classify_cheaply([text])[0][0]
+
+
+def heuristic_score(pre: str) -> int:
+    # `in` usa a busca de substring em C; numa regex combinada o CPython
+    # fica mais lento para literais simples (ver benchmarks/bench_keywords.py)
+    contains = pre.__contains__
+    return sum(map(contains, HEURISTIC_PROD)) - sum(map(contains, HEURISTIC_IMPR))
+
+
+def _heuristic_decision(score: int) -> tuple[str, float]:
     if score >= 1:
         return 'Produtivo', 0.75
     elif score <= -1:
@@ -162,184 +776,579 @@ def heuristic_classifier(pre: str):
         return 'Improdutivo', 0.55
 
 
+def heuristic_classifier(pre: str):
+    return _heuristic_decision(heuristic_score(pre))
+
+
+# Separação de múltiplos e-mails: marcadores "EMAIL N", cabeçalhos De:/From:
+# ou blocos separados por linhas em branco (nessa ordem de prioridade)
+EMAIL_MARKER_RE = re.compile(r'EMAIL\s+\d+', re.IGNORECASE)
+EMAIL_HEADER_RE = re.compile(r'EMAIL\s+(\d+)\s*[-–—]*\s*([^\n]*)\n', re.IGNORECASE)
+HEADER_SPLIT_RE = re.compile(r'\n(?=(?:De:|From:|Para:|To:|Assunto:|Subject:))')
+BLANK_SPLIT_RE = re.compile(r'\n\s*\n\s*\n')
+
+
+class _SplitPatterns(NamedTuple):
+    marker: re.Pattern
+    header: re.Pattern
+    header_split: re.Pattern
+    blank_split: re.Pattern
+
+
+_STR_PATTERNS = _SplitPatterns(EMAIL_MARKER_RE, EMAIL_HEADER_RE, HEADER_SPLIT_RE, BLANK_SPLIT_RE)
+# Mesmas regras sobre bytes (UTF-8/latin-1), para separar um arquivo mapeado
+# em memória (uploads.py) sem decodificá-lo inteiro
+_BYTES_PATTERNS = _SplitPatterns(
+    re.compile(rb'EMAIL\s+\d+', re.IGNORECASE),
+    re.compile(rb'EMAIL\s+(\d+)\s*(?:-|\xe2\x80\x93|\xe2\x80\x94)*\s*([^\n]*)\n', re.IGNORECASE),
+    re.compile(rb'\n(?=(?:De:|From:|Para:|To:|Assunto:|Subject:))'),
+    re.compile(rb'\n\s*\n\s*\n'),
+)
+
+
+class EmailSpan(NamedTuple):
+    """
+    Posição de um e-mail dentro do texto (conteúdo já sem espaços nas pontas)
+    """
+    id: str
+    start: int
+    end: int
+    header: str
+    category_hint: str | None
+
+    def content(self, text: str) -> str:
+        return text[self.start:self.end]
+
+    def to_dict(self, text: str) -> Dict[str, str]:
+        content = text[self.start:self.end]
+        if not isinstance(content, str):
+            # Buffer em bytes (arquivo mapeado): cada e-mail é decodificado só quando usado
+            content = decode_bytes(content)[0]
+        return {
+            'id': self.id,
+            'header': self.header,
+            'content': content,
+            'category_hint': self.category_hint,
+        }
+
+
+def _strip_span(text: str, start: int, end: int) -> tuple[int, int]:
+    # Equivalente a text[start:end].strip(), sem copiar a seção (fatias de um
+    # caractere também funcionam em bytes/mmap, onde o índice devolve int)
+    while start < end and text[start:start + 1].isspace():
+        start += 1
+    while end > start and text[end - 1:end].isspace():
+        end -= 1
+    return start, end
+
+
+def _span_chars(text: str, start: int, end: int, min_len: int) -> int:
+    # Tamanho em caracteres; em bytes só as seções curtas precisam ser decodificadas
+    if isinstance(text, str) or end - start > 4 * min_len:
+        return end - start
+    content = text[start:end]
+    return len(content if isinstance(content, str) else decode_bytes(content)[0])
+
+
+def _iter_separated_spans(text: str, separators, min_len: int) -> Iterator[EmailSpan]:
+    # Seções entre separadores; a numeração conta também as seções descartadas
+    start = 0
+    i = 1
+    for sep in separators:
+        s, e = _strip_span(text, start, sep.start())
+        if _span_chars(text, s, e, min_len) > min_len:
+            yield EmailSpan(f'Email {i}', s, e, '', None)
+        start = sep.end()
+        i += 1
+    s, e = _strip_span(text, start, len(text))
+    if _span_chars(text, s, e, min_len) > min_len:
+        yield EmailSpan(f'Email {i}', s, e, '', None)
+
+
+def iter_email_spans(text: str) -> Iterator[EmailSpan]:
+    """
+    Detecta múltiplos e-mails em um texto em uma única varredura, gerando as
+    posições de cada um à medida que são encontrados. Aceita também bytes ou
+    um mmap: as posições passam a ser offsets em bytes.
+    """
+    patterns = _STR_PATTERNS if isinstance(text, str) else _BYTES_PATTERNS
+    # Primeiro, e-mails marcados explicitamente (EMAIL 1, EMAIL 2, etc.): o
+    # conteúdo vai do fim da linha do marcador até o próximo "EMAIL N"
+    markers = patterns.marker.finditer(text)
+    next_marker = next(markers, None)
+    pos = 0
+    found = False
+    while True:
+        match = patterns.header.search(text, pos)
+        if match is None:
+            break
+        found = True
+        content_start = match.end()
+        while next_marker is not None and next_marker.start() < content_start:
+            next_marker = next(markers, None)
+        content_end = next_marker.start() if next_marker is not None else len(text)
+
+        email_number, email_header = match.group(1), match.group(2).strip()
+        if isinstance(email_header, bytes):
+            email_number = email_number.decode('ascii')
+            email_header = decode_bytes(email_header)[0]
+        # Detectar categoria do cabeçalho
+        category_hint = None
+        # 'improdutivo' primeiro: 'produtivo' também aparece dentro dele
+        if 'improdutivo' in email_header.lower():
+            category_hint = 'Improdutivo'
+        elif 'produtivo' in email_header.lower():
+            category_hint = 'Produtivo'
+
+        s, e = _strip_span(text, content_start, content_end)
+        yield EmailSpan(f'Email {email_number}', s, e, email_header, category_hint)
+        pos = content_end
+    if found:
+        return
+
+    emitted = False
+    if patterns.header_split.search(text):
+        # Divide por linhas que começam com "De:", "From:", etc.
+        # (evita seções muito pequenas)
+        for span in _iter_separated_spans(text, patterns.header_split.finditer(text), 20):
+            emitted = True
+            yield span
+    elif patterns.blank_split.search(text):
+        # Abordagem mais simples: dividir por linhas em branco múltiplas
+        # (seções maiores para evitar fragmentos)
+        for span in _iter_separated_spans(text, patterns.blank_split.finditer(text), 50):
+            emitted = True
+            yield span
+
+    # Se não encontrou nada, considera como um único e-mail
+    if not emitted:
+        s, e = _strip_span(text, 0, len(text))
+        yield EmailSpan('Email único', s, e, '', None)
+
+
+def iter_emails(text: str) -> Iterator[Dict[str, str]]:
+    """
+    Versão preguiçosa de split_emails: cada e-mail vira string só quando é consumido
+    """
+    for span in iter_email_spans(text):
+        yield span.to_dict(text)
+
+
 def split_emails(text: str) -> List[Dict[str, str]]:
     """
     Detecta e separa múltiplos e-mails em um texto
     """
-    emails = []
-    
-    # Primeiro, tenta detectar e-mails marcados explicitamente (EMAIL 1, EMAIL 2, etc.)
-    # Padrão corrigido para capturar todo o conteúdo até o próximo EMAIL
-    explicit_pattern = r'EMAIL\s+(\d+)\s*[-–—]*\s*([^\n]*)\n((?:(?!EMAIL\s+\d+)[\s\S])*)'
-    matches = list(re.finditer(explicit_pattern, text, re.IGNORECASE | re.MULTILINE))
-    
-    if matches:
-        for match in matches:
-            email_num = match.group(1)
-            email_header = match.group(2).strip()
-            email_content = match.group(3).strip()
-            
-            # Detectar categoria do cabeçalho
-            category_hint = None
-            if 'produtivo' in email_header.lower():
-                category_hint = 'Produtivo'
-            elif 'improdutivo' in email_header.lower():
-                category_hint = 'Improdutivo'
-                
-            emails.append({
-                'id': f'Email {email_num}',
-                'header': email_header,
-                'content': email_content,
-                'category_hint': category_hint
-            })
-    else:
-        # Se não encontrou padrão EMAIL X, tenta detectar por cabeçalhos
-        # Divide por linhas que começam com "De:", "From:", etc.
-        sections = re.split(r'\n(?=(?:De:|From:|Para:|To:|Assunto:|Subject:))', text)
-        
-        if len(sections) > 1:
-            for i, section in enumerate(sections, 1):
-                section = section.strip()
-                if len(section) > 20:  # Evita seções muito pequenas
-                    emails.append({
-                        'id': f'Email {i}',
-                        'header': '',
-                        'content': section,
-                        'category_hint': None
-                    })
-        else:
-            # Tenta uma abordagem mais simples: dividir por linhas em branco múltiplas
-            sections = re.split(r'\n\s*\n\s*\n', text)
-            
-            if len(sections) > 1:
-                for i, section in enumerate(sections, 1):
-                    section = section.strip()
-                    if len(section) > 50:  # Seções maiores para evitar fragmentos
-                        emails.append({
-                            'id': f'Email {i}',
-                            'header': '',
-                            'content': section,
-                            'category_hint': None
-                        })
-    
-    # Se ainda não encontrou nada, considera como um único e-mail
-    if not emails:
-        emails.append({
-            'id': 'Email único',
-            'header': '',
-            'content': text.strip(),
-            'category_hint': None
-        })
-    
-    return emails
+    return list(iter_emails(text))
+
+
+MULTI_EMAIL_MARKER_RE = re.compile(r'EMAIL [12]', re.IGNORECASE)
+
+
+def is_multi_email(content: str) -> bool:
+    """
+    Verifica se o texto tem múltiplos e-mails (marcadores EMAIL 1/2 ou mais de um De:/From:)
+    """
+    if MULTI_EMAIL_MARKER_RE.search(content):
+        return True
+    for header in ('De:', 'From:'):
+        i = content.find(header)
+        if i != -1 and content.find(header, i + len(header)) != -1:
+            return True
+    return False
+
+
+class ExtractedText(NamedTuple):
+    """
+    Resultado da extração: texto decodificado uma vez, com a detecção de
+    múltiplos e-mails e as posições de cada um já calculadas
+    """
+    text: str
+    encoding: str | None = None
+    is_multi: bool = False
+    spans: List[EmailSpan] | None = None
+    error: str | None = None
+    partial: str | None = None  # motivo da extração parcial ('max_pages' / 'time_budget')
 
 
-def extract_text_from_file(filename: str, file_stream: io.BytesIO) -> str:
+def ingest_text(content: str, encoding: str | None = None, normalize_single: bool = True,
+                partial: str | None = None) -> ExtractedText:
+    # Verifica se é arquivo com múltiplos e-mails - preserva quebras de linha
+    if is_multi_email(content):
+        text = content.strip()  # Só remove espaços do início/fim
+        with timed('split', 'markers'):
+            spans = list(iter_email_spans(text))
+        return ExtractedText(text, encoding, True, spans, None, partial)
+    text = normalize_text(content) if normalize_single else content  # Normaliza texto normal
+    return ExtractedText(text, encoding, False, None, None, partial)
+
+
+def ingest_messages(messages: Iterator[Dict[str, str]], encoding: str) -> ExtractedText:
     """
-    Extrai texto de arquivos .txt ou .pdf
+    Mensagens de .eml/.mbox, já separadas: uma vira e-mail único; várias são
+    unidas em um texto (cada uma sob uma linha "EMAIL N - assunto", só para
+    leitura) com as posições de cada mensagem montadas aqui. O texto não passa
+    pelo separador: um corpo que cita "email 2" não pode virar um marcador.
+    """
+    messages = [m for m in messages if m['content'].strip()]
+    if len(messages) <= 1:
+        return ExtractedText(normalize_text(messages[0]['content']) if messages else '', encoding)
+    parts: List[str] = []
+    spans: List[EmailSpan] = []
+    offset = 0
+    for m in messages:
+        head = f"{m['id'].replace('Email', 'EMAIL', 1)} - {m['header']}\n"
+        content = m['content'].strip()
+        start = offset + len(head)
+        spans.append(EmailSpan(m['id'], start, start + len(content), m['header'], m.get('category_hint')))
+        parts.append(head + content)
+        offset = start + len(content) + 2  # '\n\n' entre as mensagens
+    return ExtractedText('\n\n'.join(parts), encoding, True, spans)
+
+
+def _extraction_error(message: str) -> ExtractedText:
+    return ExtractedText(message, None, False, None, message)
+
+
+def decode_bytes(data: bytes) -> tuple[str, str]:
+    """
+    Decodifica o conteúdo de um .txt: uma única decodificação no caso comum (UTF-8)
+    """
+    if data.startswith(codecs.BOM_UTF8):
+        return data[len(codecs.BOM_UTF8):].decode('utf-8', errors='replace'), 'utf-8-sig'
+    try:
+        return data.decode('utf-8'), 'utf-8'
+    except UnicodeDecodeError:
+        # latin-1 aceita qualquer sequência de bytes (cp1252/iso-8859-1 nunca eram usados)
+        return data.decode('latin-1'), 'latin-1'
+
+
+def extract_text_from_file(filename: str, file_stream: io.BytesIO) -> ExtractedText:
+    """
+    Extrai texto de arquivos .txt, .pdf, .eml ou .mbox
     """
     try:
         file_stream.seek(0)  # Reset stream position
         
         if filename.lower().endswith('.txt'):
-            # Para arquivos .txt, tenta diferentes encodings
-            encodings = ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1']
-            for encoding in encodings:
-                try:
-                    file_stream.seek(0)
-                    content = file_stream.read().decode(encoding)
-                    
-                    # Verifica se é arquivo com múltiplos e-mails - preserva quebras de linha
-                    if 'EMAIL 1' in content.upper() or 'EMAIL 2' in content.upper() or content.count('De:') > 1 or content.count('From:') > 1:
-                        return content.strip()  # Só remove espaços do início/fim
-                    else:
-                        return normalize_text(content)  # Normaliza texto normal
-                        
-                except UnicodeDecodeError:
-                    continue
-            # Se nenhum encoding funcionou, usa errors='ignore'
-            file_stream.seek(0)
-            content = file_stream.read().decode('utf-8', errors='ignore')
-            
-            # Verifica se é arquivo com múltiplos e-mails - preserva quebras de linha
-            if 'EMAIL 1' in content.upper() or 'EMAIL 2' in content.upper() or content.count('De:') > 1 or content.count('From:') > 1:
-                return content.strip()  # Só remove espaços do início/fim
-            else:
-                return normalize_text(content)  # Normaliza texto normal
+            with timed('extract', 'txt'):
+                content, encoding = decode_bytes(file_stream.read())
+            return ingest_text(content, encoding)
             
         elif filename.lower().endswith('.pdf'):
-            # Para arquivos .pdf, usa pdfminer
+            # Páginas extraídas em paralelo (pdfminer, ou PyPDF2 como fallback),
+            # com limite de páginas e de tempo: PDFs patológicos voltam parciais
             try:
-                from pdfminer.high_level import extract_text
-                file_stream.seek(0)
-                text = extract_text(file_stream)
-                
-                # Verifica se é arquivo com múltiplos e-mails - preserva quebras de linha
-                if 'EMAIL 1' in text.upper() or 'EMAIL 2' in text.upper() or text.count('De:') > 1 or text.count('From:') > 1:
-                    return text.strip()  # Só remove espaços do início/fim
-                else:
-                    return normalize_text(text)  # Normaliza texto normal
-                    
+                with timed('extract', 'pdf'):
+                    text, pages = extract_pdf_text(file_stream.read())
             except ImportError:
-                # Fallback para PyPDF2 se pdfminer não estiver disponível
-                try:
-                    import PyPDF2
-                    file_stream.seek(0)
-                    pdf_reader = PyPDF2.PdfReader(file_stream)
-                    text = ""
-                    for page in pdf_reader.pages:
-                        text += page.extract_text()
-                    
-                    # Verifica se é arquivo com múltiplos e-mails - preserva quebras de linha
-                    if 'EMAIL 1' in text.upper() or 'EMAIL 2' in text.upper() or text.count('De:') > 1 or text.count('From:') > 1:
-                        return text.strip()  # Só remove espaços do início/fim
-                    else:
-                        return normalize_text(text)  # Normaliza texto normal
-                except ImportError:
-                    return "Erro: Biblioteca para leitura de PDF não encontrada"
+                return _extraction_error("Erro: Biblioteca para leitura de PDF não encontrada")
             except Exception as e:
-                return f"Erro ao processar PDF: {str(e)}"
+                return _extraction_error(f"Erro ao processar PDF: {str(e)}")
+            return ingest_text(text, 'pdf', partial=pages.reason)
+
+        elif filename.lower().endswith(MAIL_EXTENSIONS):
+            # Mensagens separadas pela estrutura do arquivo, não por heurística no texto
+            mbox = filename.lower().endswith('.mbox')
+            with timed('extract', 'mbox' if mbox else 'eml'):
+                return ingest_messages(iter_messages(file_stream.read(), mbox), 'mbox' if mbox else 'eml')
         else:
-            return "Formato de arquivo não suportado"
+            return _extraction_error("Formato de arquivo não suportado")
             
     except Exception as e:
-        return f"Erro ao extrair texto: {str(e)}"
+        return _extraction_error(f"Erro ao extrair texto: {str(e)}")
 
 
-def classify_multiple_emails(text: str) -> List[Dict]:
+class PagedText:
     """
-    Classifica múltiplos e-mails encontrados no texto
+    Texto de um PDF lido página a página. `iter_spans()` gera cada e-mail
+    assim que o início do seguinte já foi extraído (o último, no fim do
+    documento), e o próprio objeto pode ser passado como `text` para
+    iter_classified_batches: o primeiro lote é classificado enquanto as
+    páginas seguintes ainda estão no pool. `document()` devolve o resultado
+    completo depois da iteração.
     """
-    emails = split_emails(text)
-    results = []
-    
-    for email_data in emails:
-        content = email_data['content']
-        if len(content.strip()) < 10:  # Pula conteúdo muito pequeno
+
+    def __init__(self, pages: Iterable[str]):
+        self.pages = pages
+        self._pages = iter(pages)
+        self.parts: List[str] = []
+        self.text = ''  # páginas lidas até agora, sem os espaços do início
+        self.is_multi = False
+        self.complete = False
+        self.extract_seconds = 0.0
+        self._spans: List[EmailSpan] = []  # e-mails já entregues
+
+    @property
+    def partial(self) -> str | None:
+        return getattr(self.pages, 'reason', None)
+
+    def __getitem__(self, key):
+        return self.text[key]
+
+    def __len__(self) -> int:
+        return len(self.text)
+
+    def _read_page(self) -> bool:
+        t0 = time.perf_counter()
+        page = next(self._pages, None)
+        self.extract_seconds += time.perf_counter() - t0
+        if page is None:
+            self.complete = True
+            self.text = self.text.rstrip()
+            observe('extract', 'pdf', self.extract_seconds)
+            return False
+        self.parts.append(page)
+        self.text = self.text + page if self.text else page.lstrip()
+        self.is_multi = self.is_multi or is_multi_email(self.text)
+        return True
+
+    def read_until_multi(self) -> None:
+        # Só o necessário para decidir entre e-mail único e múltiplos e-mails
+        while not self.is_multi and self._read_page():
+            pass
+
+    def iter_spans(self) -> Iterator[EmailSpan]:
+        while True:
+            found = list(iter_email_spans(self.text))
+            if not self.complete:
+                found.pop()  # o último e-mail pode continuar na próxima página
+            emitted = len(self._spans)
+            if found[:emitted] == self._spans:
+                new = found[emitted:]
+            elif self.complete:
+                # O formato mudou depois dos primeiros e-mails (ex.: cabeçalhos
+                # "EMAIL N" só nas páginas finais): segue do último entregue
+                new = [span for span in found if span.start >= self._spans[-1].end]
+            else:
+                new = []
+            for span in new:
+                self._spans.append(span)
+                yield span
+            if self.complete:
+                return
+            self._read_page()
+
+    def document(self) -> ExtractedText:
+        """
+        Texto completo e as posições dos e-mails entregues por iter_spans()
+        """
+        return ExtractedText(self.text, 'pdf', True, list(self._spans), None, self.partial)
+
+
+def stream_text_from_file(filename: str, file_stream: io.BytesIO) -> 'ExtractedText | PagedText':
+    """
+    Como extract_text_from_file, mas um PDF com múltiplos e-mails volta como
+    PagedText logo que isso é detectado, com o restante das páginas ainda por
+    extrair; sem múltiplos e-mails, o PDF é lido inteiro (e-mail único)
+    """
+    if not filename.lower().endswith('.pdf'):
+        return extract_text_from_file(filename, file_stream)
+    try:
+        file_stream.seek(0)
+        paged = PagedText(PdfPages(file_stream.read()))
+        paged.read_until_multi()
+    except ImportError:
+        return _extraction_error("Erro: Biblioteca para leitura de PDF não encontrada")
+    except Exception as e:
+        return _extraction_error(f"Erro ao processar PDF: {str(e)}")
+    if paged.is_multi:
+        return paged
+    return ingest_text(''.join(paged.parts), 'pdf', partial=paged.partial)
+
+
+class DuplicateTracker:
+    """
+    Agrupa quase-duplicatas ao longo de um arquivo ou lote: guarda, para cada
+    representante, só a classificação e a resposta sem nome e chamado (o
+    texto do e-mail não fica em memória). Só e-mails que iriam ao modelo ou
+    ao LLM passam pelo índice (`wants`); os demais contam como grupos de um
+    e-mail só. `max_items` limita os representantes (streams: menor).
+    """
+
+    def __init__(self, max_items: int = DEDUP_MAX_ITEMS):
+        self.index = NearDuplicateIndex(max_items=max_items)
+        self.representatives: Dict[int, tuple] = {}  # posição -> (id, classificação, ReplyTemplate)
+        self.skipped = 0
+
+    @staticmethod
+    def wants(decided: bool) -> bool:
+        # Decididos pelo cache/heurística só interessam se a resposta vier do LLM
+        return not decided or uses_openai(os.getenv("MODEL_BACKEND", "local"))
+
+    def skip(self) -> None:
+        self.skipped += 1
+
+    def assign(self, text: str) -> tuple[int, int]:
+        # (posição do e-mail, posição do representante do grupo)
+        position = self.index.count
+        return position, self.index.add(preprocess(normalize_text(text)))
+
+    def remember(self, position: int, email_id, text: str, classification: Dict, reply) -> None:
+        # O índice só devolve representantes que ele guardou (limite DEDUP_MAX_ITEMS)
+        if position in self.index:
+            kept = {k: classification.get(k) for k in ('category', 'confidence', 'sub_intent', 'signals')}
+            self.representatives[position] = (email_id, kept, reply_template(reply, text))
+
+    def replay(self, text: str, result: Dict) -> None:
+        """
+        Refaz o grupo de um e-mail já classificado a partir do resultado
+        gravado (retomada de job), sem chamar o modelo
+        """
+        raw = normalize_text(text)
+        if not self.wants(_use_heuristic_only(text) or _cascade_decision(raw, preprocess(raw)) is not None):
+            self.skip()
+            return
+        position, representative = self.assign(text)
+        if position == representative:
+            classification = {k: result[k] for k in ('category', 'confidence', 'sub_intent', 'signals')}
+            self.remember(position, result['id'], text, classification, Reply(result['reply'], result['reply_source']))
+
+    def reuse(self, representative: int, text: str, count: bool = True) -> tuple:
+        """
+        Id do representante, sua classificação e a resposta personalizada para
+        `text`; `count=False` quando o e-mail já foi contado em outra camada
+        """
+        email_id, classification, template = self.representatives[representative]
+        if count:
+            _count_tier('duplicate')
+        reply = reuse_reply(template, text, classification['category'], classification['sub_intent'])
+        return email_id, {**classification, 'signals': list(classification['signals'] or [])}, reply
+
+    def stats(self) -> Dict:
+        stats = self.index.stats()
+        if self.skipped:
+            stats['emails'] += self.skipped
+            stats['clusters'] += self.skipped
+            stats['largest_cluster'] = max(stats['largest_cluster'], 1)
+        return stats
+
+
+def _email_result(email_data: Dict, classification: Dict, reply, duplicate_of=None) -> Dict:
+    content = email_data['content']
+    return {
+        'id': email_data['id'],
+        'header': email_data['header'],
+        'content_preview': content[:150] + '...' if len(content) > 150 else content,
+        'content_full': content,
+        'category': classification['category'],
+        'confidence': classification['confidence'],
+        'sub_intent': classification.get('sub_intent'),
+        'signals': classification.get('signals', []),
+        'category_hint': email_data['category_hint'],
+        'reply': reply.text,
+        'reply_source': reply.source,
+        'duplicate_of': duplicate_of,
+    }
+
+
+def _classify_email_chunk(emails: List[Dict], timings: List[Dict] | None,
+                          tracker: DuplicateTracker | None = None) -> List[Dict]:
+    texts = [e['content'] for e in emails]
+    classifications, pending, repeated = _classify_cheaply(texts)
+    # A assinatura das quase-duplicatas custa mais que a heurística: só os
+    # e-mails que iriam ao modelo (e seus repetidos no lote) passam pelo
+    # índice, ou todos quando a resposta vem do LLM
+    waiting = {i for i, *_ in pending}
+    waiting.update(i for i, first in repeated if first in waiting)
+    positions = {}
+    if tracker is not None:
+        for j, text in enumerate(texts):
+            if tracker.wants(j not in waiting):
+                positions[j] = tracker.assign(text)
+            else:
+                tracker.skip()
+    reused = {j: representative for j, (position, representative) in positions.items() if position != representative}
+    for i, first in repeated:
+        if first in reused:
+            reused.setdefault(i, reused[first])
+
+    # Só o primeiro e-mail de cada grupo vai para o modelo e o LLM; os demais
+    # reaproveitam o resultado do representante (deste lote ou de um anterior)
+    _classify_pending(classifications, [p for p in pending if p[0] not in reused], max(1, ZSC_BATCH_SIZE), timings)
+    for i, first in repeated:
+        if i not in reused:
+            classifications[i] = dict(classifications[first])
+    fresh = [j for j in range(len(emails)) if j not in reused]
+
+    # Gera as respostas sugeridas do lote (em paralelo com o backend openai)
+    replies = suggest_replies(
+        [(texts[j], classifications[j]['category'], classifications[j].get('sub_intent')) for j in fresh],
+        backend=os.getenv("MODEL_BACKEND", "local"),
+    )
+
+    results: List[Dict | None] = [None] * len(emails)
+    for j, reply in zip(fresh, replies):
+        results[j] = _email_result(emails[j], classifications[j], reply)
+        if j in positions:
+            tracker.remember(positions[j][0], emails[j]['id'], texts[j], classifications[j], reply)
+    for j, representative in reused.items():
+        email_id, classification, reply = tracker.reuse(representative, texts[j], count=classifications[j] is None)
+        results[j] = _email_result(emails[j], classification, reply, duplicate_of=email_id)
+    return results
+
+
+def iter_classified_batches(text: str, spans: List[EmailSpan] | None = None, timings: List[Dict] | None = None,
+                            tracker: DuplicateTracker | None = None, start: int = 0,
+                            previous: Iterator[Dict] | None = None) -> Iterator[List[Dict]]:
+    """
+    Classifica os e-mails do texto em lotes de ZSC_BATCH_SIZE, gerando cada
+    lote assim que fica pronto; `start` pula os primeiros e-mails (retomada).
+    `previous` traz os resultados já gravados desses e-mails, para o
+    `tracker` reconhecer duplicatas de grupos classificados antes.
+    """
+    chunk = []
+    index = 0
+    # Consome o separador sob demanda: o primeiro lote é classificado antes de
+    # o restante do arquivo ser separado (ou usa as posições já calculadas na extração)
+    for span in (spans if spans is not None else iter_email_spans(text)):
+        if _span_chars(text, span.start, span.end, 10) < 10:  # Pula conteúdo muito pequeno
             continue
-            
-        # Classifica o e-mail individual
-        classification = classify_email(content)
-        
-        # Gera resposta sugerida para o e-mail individual
-        from responders import suggest_reply
-        import os
-        reply = suggest_reply(content, classification['category'], classification.get('sub_intent'), backend=os.getenv("MODEL_BACKEND", "local"))
-        
-        # Adiciona informações extras
-        result = {
-            'id': email_data['id'],
-            'header': email_data['header'],
-            'content_preview': content[:150] + '...' if len(content) > 150 else content,
-            'content_full': content,
-            'category': classification['category'],
-            'confidence': classification['confidence'],
-            'sub_intent': classification.get('sub_intent'),
-            'signals': classification.get('signals', []),
-            'category_hint': email_data['category_hint'],
-            'reply': reply
-        }
-        
-        results.append(result)
-    
-    return results
\ No newline at end of file
+        index += 1
+        if index <= start:
+            result = next(previous, None) if previous is not None else None
+            if tracker is not None and result is not None:
+                tracker.replay(span.to_dict(text)['content'], result)
+            continue
+        chunk.append(span.to_dict(text))
+        if len(chunk) >= ZSC_BATCH_SIZE:
+            yield _classify_email_chunk(chunk, timings, tracker)
+            chunk = []
+    if chunk:
+        yield _classify_email_chunk(chunk, timings, tracker)
+
+
+def _classifiable_spans(text: str, spans: List[EmailSpan] | None = None) -> Iterator[EmailSpan]:
+    # Mesmo critério de iter_classified_batches (ignora trechos muito pequenos)
+    spans = spans if spans is not None else iter_email_spans(text)
+    return (span for span in spans if _span_chars(text, span.start, span.end, 10) >= 10)
+
+
+def count_emails(text: str, spans: List[EmailSpan] | None = None) -> int:
+    return sum(1 for _ in _classifiable_spans(text, spans))
+
+
+def email_spans(text: str, spans: List[EmailSpan] | None = None) -> List[EmailSpan]:
+    """
+    Posições dos e-mails na ordem da lista de resultados (sem classificar)
+    """
+    return list(_classifiable_spans(text, spans))
+
+
+def classify_multiple_emails(text: str, timings: List[Dict] | None = None, spans: List[EmailSpan] | None = None,
+                             clusters: Dict | None = None, start: int = 0, limit: int | None = None) -> List[Dict]:
+    """
+    Classifica múltiplos e-mails encontrados no texto. Quase-duplicatas
+    reaproveitam o resultado do primeiro e-mail do grupo (`duplicate_of`);
+    se `clusters` for um dict, recebe as estatísticas dos grupos. Com
+    `start`/`limit`, só a página pedida é classificada (grupos da página).
+    """
+    if start or limit is not None:
+        spans = list(islice(_classifiable_spans(text, spans), start, None if limit is None else start + limit))
+    results = []
+    tracker = DuplicateTracker() if DEDUP_ENABLED else None
+    for batch in iter_classified_batches(text, spans, timings, tracker):
+        results.extend(batch)
+
+    if clusters is not None and tracker is not None:
+        clusters.update(tracker.stats())
+    return results
@@ -0,0 +1,254 @@
+import io
+import os
+import importlib
+import time
+import signal
+import tempfile
+import threading
+import multiprocessing as mp
+from typing import Dict, Iterator, List
+
+
+# Extração de PDF página a página, com limite de páginas e de tempo.
+# A renderização roda em um pool de processos único por worker do gunicorn
+# (pdfminer é Python puro e não libera o GIL), criado sob demanda pelo
+# forkserver: os processos não são cópias (fork) do worker, que tem várias
+# threads. O total de processos fica em PDF_WORKERS por worker do gunicorn, e
+# requisições simultâneas dividem o mesmo pool. Cada tarefa do pool para no
+# prazo do documento (SIGALRM dentro do processo), inclusive no meio de uma
+# página patológica. PDFs com menos de PDF_PARALLEL_MIN_PAGES páginas vão
+# inteiros em uma tarefa só. Com PDF_WORKERS=0 tudo roda no próprio processo e
+# o prazo só é verificado entre as páginas.
+PDF_MAX_PAGES = int(os.getenv('PDF_MAX_PAGES', '200'))
+PDF_TIME_BUDGET = float(os.getenv('PDF_TIME_BUDGET', '60'))  # segundos
+PDF_WORKERS = int(os.getenv('PDF_WORKERS', str(min(4, os.cpu_count() or 1))))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv('PDF_PARALLEL_MIN_PAGES', '8'))
+
+
+PDFMINER_MODULES = ['pdfminer.converter', 'pdfminer.layout', 'pdfminer.pdfdocument', 'pdfminer.pdfinterp',
+                    'pdfminer.pdfpage', 'pdfminer.pdfparser']
+
+
+def preload() -> bool:
+    """
+    Importa a biblioteca de PDF disponível (pdfminer ou PyPDF2) antes do
+    primeiro upload; False se nenhuma estiver instalada
+    """
+    try:
+        for name in PDFMINER_MODULES:
+            importlib.import_module(name)
+    except ImportError:
+        try:
+            import PyPDF2  # noqa: F401
+        except ImportError:
+            return False
+    return True
+
+
+def _load_pages(data: bytes) -> list:
+    from pdfminer.pdfpage import PDFPage
+    # O BytesIO precisa continuar vivo: as páginas leem o conteúdo sob demanda
+    return list(PDFPage.get_pages(io.BytesIO(data)))
+
+
+def _render_page(page, rsrcmgr=None) -> str:
+    # Mesmo pipeline de pdfminer.high_level.extract_text, para uma página
+    from pdfminer.converter import TextConverter
+    from pdfminer.layout import LAParams
+    from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+
+    rsrcmgr = rsrcmgr or PDFResourceManager(caching=True)
+    with io.StringIO() as output:
+        device = TextConverter(rsrcmgr, output, laparams=LAParams())
+        PDFPageInterpreter(rsrcmgr, device).process_page(page)
+        device.close()
+        return output.getvalue()
+
+
+class PageTimeout(Exception):
+    pass
+
+
+def _on_alarm(signum, frame):
+    raise PageTimeout()
+
+
+# Estado de cada processo do pool: cada documento (arquivo temporário) é lido
+# uma vez por processo; guarda os dois últimos, para requisições simultâneas
+_WORKER_DOCS: Dict[str, tuple] = {}
+
+
+def _worker_document(path: str) -> tuple:
+    doc = _WORKER_DOCS.get(path)
+    if doc is None:
+        from pdfminer.pdfinterp import PDFResourceManager
+        with open(path, 'rb') as f:
+            data = f.read()
+        if len(_WORKER_DOCS) >= 2:
+            _WORKER_DOCS.pop(next(iter(_WORKER_DOCS)))
+        doc = _WORKER_DOCS[path] = (_load_pages(data), PDFResourceManager(caching=True))
+    return doc
+
+
+def _worker_pages(path: str, start: int, stop: int, deadline: float) -> tuple[List[str], bool]:
+    """
+    Texto das páginas [start, stop) até o prazo (time.monotonic, comum a todos
+    os processos); (textos, estourou_o_prazo)
+    """
+    texts: List[str] = []
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        return texts, True  # tarefa que esperou na fila além do prazo
+    previous = signal.signal(signal.SIGALRM, _on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, remaining)
+    try:
+        pages, rsrcmgr = _worker_document(path)
+        for page in pages[start:stop]:
+            texts.append(_render_page(page, rsrcmgr))
+        return texts, False
+    except PageTimeout:
+        return texts, True
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def _init_worker() -> None:
+    # Ctrl+C no terminal chega a todo o grupo de processos: quem encerra o pool é o processo pai
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+_POOL = None
+_POOL_PID = None
+_POOL_LOCK = threading.Lock()
+
+
+def _get_pool(workers: int):
+    """
+    Pool compartilhado do processo, criado na primeira extração (e de novo
+    depois de um fork, como o do gunicorn --preload)
+    """
+    global _POOL, _POOL_PID
+    with _POOL_LOCK:
+        if _POOL is None or _POOL_PID != os.getpid():
+            methods = mp.get_all_start_methods()
+            ctx = mp.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+            if 'forkserver' in methods:
+                # pdfminer já importado no forkserver: processos novos do pool não pagam o import
+                ctx.set_forkserver_preload(['pdf_extract'] + PDFMINER_MODULES)
+            _POOL = ctx.Pool(workers, initializer=_init_worker)
+            _POOL_PID = os.getpid()
+        return _POOL
+
+
+def count_pages(data: bytes) -> int:
+    from pdfminer.pdfdocument import PDFDocument
+    from pdfminer.pdfparser import PDFParser
+    from pdfminer.pdftypes import resolve1
+
+    doc = PDFDocument(PDFParser(io.BytesIO(data)))
+    try:
+        return int(resolve1(doc.catalog['Pages'])['Count'])
+    except Exception:
+        from pdfminer.pdfpage import PDFPage
+        return sum(1 for _ in PDFPage.create_pages(doc))
+
+
+class PdfPages:
+    """
+    Itera o texto das páginas de um PDF, em ordem, respeitando max_pages e o
+    orçamento de tempo. Depois da iteração, `partial`/`reason` indicam se o
+    documento foi lido só em parte ('max_pages' ou 'time_budget').
+    """
+
+    def __init__(self, data: bytes, max_pages: int = PDF_MAX_PAGES, time_budget: float = PDF_TIME_BUDGET,
+                 workers: int = PDF_WORKERS):
+        self.data = data
+        self.max_pages = max_pages
+        self.time_budget = time_budget
+        self.workers = workers
+        self.total_pages = None
+        self.pages_read = 0
+        self.partial = False
+        self.reason = None
+
+    def _mark_partial(self, reason: str) -> None:
+        self.partial = True
+        self.reason = self.reason or reason
+
+    def __iter__(self) -> Iterator[str]:
+        deadline = time.monotonic() + self.time_budget
+        try:
+            self.total_pages = count_pages(self.data)
+        except ImportError:
+            yield from self._iter_pypdf2(deadline)
+            return
+
+        n = self.total_pages
+        if self.max_pages and n > self.max_pages:
+            n = self.max_pages
+            self._mark_partial('max_pages')
+
+        if self.workers > 0 and n > 0:
+            yield from self._iter_pool(n, deadline)
+        else:
+            yield from self._iter_local(n, deadline)
+
+    def _iter_local(self, n: int, deadline: float) -> Iterator[str]:
+        from pdfminer.pdfinterp import PDFResourceManager
+        rsrcmgr = PDFResourceManager(caching=True)
+        for page in _load_pages(self.data)[:n]:
+            if time.monotonic() > deadline:
+                self._mark_partial('time_budget')
+                return
+            text = _render_page(page, rsrcmgr)
+            self.pages_read += 1
+            yield text
+
+    def _iter_pool(self, n: int, deadline: float) -> Iterator[str]:
+        # Uma tarefa por página nos documentos grandes; uma só nos pequenos
+        step = 1 if n >= PDF_PARALLEL_MIN_PAGES else n
+        tasks = [(start, min(start + step, n)) for start in range(0, n, step)]
+        with tempfile.NamedTemporaryFile(prefix='autou-pdf-', suffix='.pdf') as f:
+            f.write(self.data)
+            f.flush()
+            pool = _get_pool(self.workers)
+            results = [pool.apply_async(_worker_pages, (f.name, start, stop, deadline)) for start, stop in tasks]
+            for result in results:
+                try:
+                    # Folga para o processo devolver o que leu até o alarme
+                    texts, timed_out = result.get(timeout=max(deadline - time.monotonic(), 0) + 1)
+                except (mp.TimeoutError, PageTimeout):  # alarme no limite exato: página descartada
+                    texts, timed_out = [], True
+                for text in texts:
+                    self.pages_read += 1
+                    yield text
+                if timed_out:
+                    self._mark_partial('time_budget')
+                    return
+
+    def _iter_pypdf2(self, deadline: float) -> Iterator[str]:
+        # Fallback para PyPDF2 se pdfminer não estiver disponível
+        import PyPDF2
+        pdf_reader = PyPDF2.PdfReader(io.BytesIO(self.data))
+        self.total_pages = len(pdf_reader.pages)
+        for i, page in enumerate(pdf_reader.pages):
+            if self.max_pages and i >= self.max_pages:
+                self._mark_partial('max_pages')
+                return
+            if time.monotonic() > deadline:
+                self._mark_partial('time_budget')
+                return
+            text = page.extract_text()
+            self.pages_read += 1
+            yield text
+
+
+def extract_pdf_text(data: bytes, **kwargs) -> tuple[str, PdfPages]:
+    """
+    Extrai o texto de um PDF inteiro (dentro dos limites); retorna o texto e o
+    leitor, com as informações de páginas lidas e extração parcial
+    """
+    pages = PdfPages(data, **kwargs)
+    parts: List[str] = list(pages)
+    return ''.join(parts), pages
@@ -1,9 +1,22 @@
 import os
+import re
+import time
 import datetime as dt
 import textwrap
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Tuple
+
+from cache import content_cache, make_key
+from telemetry import REPLIES, inc, observe
 
 
 OPENAI_MODEL = os.getenv('OPENAI_MODEL', 'gpt-4o-mini')
+# Cliente compartilhado (conexões reaproveitadas); OPENAI_BASE_URL aponta para
+# outro servidor compatível, ex.: benchmarks/fake_openai.py
+OPENAI_TIMEOUT = float(os.getenv('OPENAI_TIMEOUT', '15'))  # segundos por tentativa
+OPENAI_MAX_RETRIES = int(os.getenv('OPENAI_MAX_RETRIES', '2'))
+OPENAI_MAX_INFLIGHT = int(os.getenv('OPENAI_MAX_INFLIGHT', '8'))  # chamadas simultâneas por processo
 
 
 PT_SIGNATURE = """\
@@ -75,13 +88,95 @@ def _render_template(category, sub_intent, name, ticket):
     tpl = TEMPLATES.get((category, sub_intent)) or TEMPLATES.get((category, None))
     return tpl.format(name=name or 'tudo bem', ticket=ticket, eta=_eta_business_hours(), signature=PT_SIGNATURE)
 
-def suggest_reply(text: str, category: str, sub_intent: str | None, backend: str = 'local') -> str:
+
+class Reply(NamedTuple):
+    text: str
+    source: str  # 'llm', 'cache' (resposta do LLM já gerada) ou 'template'
+    error: str | None = None  # motivo da queda para o template, se houve
+
+
+REPLY_SOURCES = ('llm', 'cache', 'template', 'error')
+_REPLY_COUNTS = dict.fromkeys(REPLY_SOURCES, 0)
+_STATE_LOCK = threading.Lock()
+_CLIENT = None
+_EXECUTOR = None
+_OWNER_PID = None  # cliente e pool não sobrevivem ao fork (gunicorn --preload)
+
+
+def _count_reply(reply: Reply) -> Reply:
+    with _STATE_LOCK:
+        _REPLY_COUNTS[reply.source] += 1
+        if reply.error:
+            _REPLY_COUNTS['error'] += 1
+    inc(REPLIES, reply.source)
+    if reply.error:
+        inc(REPLIES, 'error')
+    return reply
+
+
+def reply_stats() -> Dict:
+    with _STATE_LOCK:
+        return dict(_REPLY_COUNTS)
+
+
+def _ensure_process_state() -> None:
+    global _CLIENT, _EXECUTOR, _OWNER_PID
+    if _OWNER_PID != os.getpid():
+        _CLIENT = None
+        _EXECUTOR = None
+        _OWNER_PID = os.getpid()
+
+
+def _get_client():
+    global _CLIENT
+    with _STATE_LOCK:
+        _ensure_process_state()
+        if _CLIENT is None:
+            from openai import OpenAI
+            _CLIENT = OpenAI(timeout=OPENAI_TIMEOUT, max_retries=OPENAI_MAX_RETRIES)
+        return _CLIENT
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    # O tamanho do pool limita as chamadas em andamento ao LLM neste processo
+    global _EXECUTOR
+    with _STATE_LOCK:
+        _ensure_process_state()
+        if _EXECUTOR is None:
+            _EXECUTOR = ThreadPoolExecutor(max(1, OPENAI_MAX_INFLIGHT), thread_name_prefix='openai')
+        return _EXECUTOR
+
+
+def uses_openai(backend: str) -> bool:
+    return backend == 'openai' and bool(os.getenv('OPENAI_API_KEY'))
+
+
+def generate_reply(text: str, category: str, sub_intent: str | None, backend: str = 'local') -> Reply:
+    """
+    Gera a resposta sugerida e informa de onde ela veio (LLM, cache ou template)
+    """
+    t0 = time.perf_counter()
+    reply = _generate_reply(text, category, sub_intent, backend)
+    # method: openai (chamada ao LLM, com ou sem sucesso), cache ou template
+    method = 'openai' if reply.source == 'llm' or reply.error else reply.source
+    observe('reply', method, time.perf_counter() - t0)
+    return reply
+
+
+def _generate_reply(text: str, category: str, sub_intent: str | None, backend: str) -> Reply:
     name = _extract_name(text)
     ticket = _guess_ticket(text)
-    if backend == 'openai' and os.getenv('OPENAI_API_KEY'):
+    error = None
+    if uses_openai(backend):
+        # Só a resposta do LLM vai para o cache; o template é sempre renderizado
+        # na hora porque o prazo ({eta}) depende do horário atual.
+        model = os.getenv('OPENAI_MODEL', 'gpt-4o-mini')
+        key = make_key('reply', 'openai', model, category, sub_intent, text)
+        cached = content_cache.get(key)
+        if cached is not None:
+            return _count_reply(Reply(cached, 'cache'))
         try:
-            from openai import OpenAI
-            client = OpenAI()
+            client = _get_client()
             system = (
                 "Você é um assistente de suporte de banco/fintech. Escreva respostas curtas, claras, em PT-BR, "
                 "com tom profissional e empático. Se o e-mail for improdutivo, agradeça e encerre."
@@ -91,15 +186,78 @@ def suggest_reply(text: str, category: str, sub_intent: str | None, backend: str
                 f"Nome:{name or 'Cliente'}\n\nE-mail:\n{text[:4000]}"
             )
             msg = client.chat.completions.create(
-                model=os.getenv('OPENAI_MODEL', 'gpt-4o-mini'),
+                model=model,
                 messages=[{"role":"system","content":system},{"role":"user","content":user}],
                 temperature=0.2,
                 max_tokens=220,
             )
-            return msg.choices[0].message.content.strip()
-        except Exception:
-            pass # cai no template
+            reply = msg.choices[0].message.content.strip()
+            content_cache.set(key, reply)
+            return _count_reply(Reply(reply, 'llm'))
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"  # cai no template
 
 
     # Fallback local (ou backend='local')
-    return _render_template(category, sub_intent, name, ticket)
\ No newline at end of file
+    return _count_reply(Reply(_render_template(category, sub_intent, name, ticket), 'template', error))
+
+
+def suggest_reply(text: str, category: str, sub_intent: str | None, backend: str = 'local') -> str:
+    return generate_reply(text, category, sub_intent, backend).text
+
+
+class ReplyTemplate(NamedTuple):
+    """
+    Resposta do representante de um grupo de quase-duplicatas, com o nome e
+    o chamado do e-mail de origem marcados no texto: é o que fica guardado
+    no lugar do e-mail inteiro
+    """
+    text: str  # vazio para respostas de template (refeitas pela categoria)
+    source: str
+    ticket: str  # do e-mail de origem, usados quando o novo e-mail não tem
+    name: str
+
+
+_TICKET_SLOT = '\x00ticket\x00'
+_NAME_SLOT = '\x00name\x00'
+
+
+def reply_template(reply: Reply, source_text: str) -> ReplyTemplate:
+    if reply.source == 'template':
+        return ReplyTemplate('', 'template', 'N/A', '')
+    text = reply.text
+    ticket = _guess_ticket(source_text)
+    if ticket != 'N/A':
+        text = re.sub(re.escape(ticket), _TICKET_SLOT, text, flags=re.I)
+    name = _extract_name(source_text) or ''
+    if name:
+        text = text.replace(name, _NAME_SLOT)
+    return ReplyTemplate(text, reply.source, ticket, name)
+
+
+def reuse_reply(template: ReplyTemplate, text: str, category: str, sub_intent: str | None) -> Reply:
+    """
+    Adapta a resposta do representante de um grupo de quase-duplicatas ao
+    e-mail `text`: nome e chamado do próprio e-mail, sem nova chamada ao LLM
+    """
+    name = _extract_name(text)
+    ticket = _guess_ticket(text)
+    if template.source == 'template':
+        return _count_reply(Reply(_render_template(category, sub_intent, name, ticket), 'template'))
+
+    personalized = template.text.replace(_TICKET_SLOT, ticket if ticket != 'N/A' else template.ticket)
+    personalized = personalized.replace(_NAME_SLOT, name or template.name)
+    return _count_reply(Reply(personalized, 'cache'))
+
+
+def suggest_replies(items: List[Tuple[str, str, str | None]], backend: str = 'local') -> List[Reply]:
+    """
+    Gera as respostas de vários e-mails (texto, categoria, sub-intenção).
+    Com o backend openai as chamadas saem em paralelo, limitadas por
+    OPENAI_MAX_INFLIGHT; a ordem do resultado é a mesma da entrada.
+    """
+    if len(items) <= 1 or not uses_openai(backend):
+        return [generate_reply(text, category, sub_intent, backend) for text, category, sub_intent in items]
+    executor = _get_executor()
+    futures = [executor.submit(generate_reply, text, category, sub_intent, backend) for text, category, sub_intent in items]
+    return [f.result() for f in futures]
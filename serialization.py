@@ -0,0 +1,130 @@
+import os
+import gzip
+import json
+import base64
+import binascii
+from typing import Dict, Iterable, List
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # stdlib json como fallback
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # sem brotli, só gzip
+    brotli = None
+
+
+# Respostas da API de múltiplos e-mails: seleção de campos (`fields=`),
+# paginação por cursor, JSON com orjson e compressão gzip/br das respostas
+# grandes. Streams (NDJSON/SSE) nunca são comprimidos aqui: cada linha
+# precisa chegar ao cliente assim que é gerada.
+COMPRESS_MIN_BYTES = int(os.getenv('COMPRESS_MIN_BYTES', '1024'))  # 0 desliga a compressão
+COMPRESS_LEVEL = int(os.getenv('COMPRESS_LEVEL', '5'))  # gzip 1-9 (brotli usa a qualidade 4)
+COMPRESS_MIMETYPES = {'application/json', 'text/html', 'text/plain'}
+
+# Campos de cada e-mail em /api/classify (nlp._email_result e o e-mail único)
+RESULT_FIELDS = (
+    'id', 'header', 'content_preview', 'content_full', 'category', 'confidence', 'sub_intent', 'signals',
+    'category_hint', 'reply', 'reply_source', 'duplicate_of',
+)
+
+
+def dumps(obj) -> str:
+    """
+    JSON compacto, sem escapar acentos; orjson quando instalado
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, default=DefaultJSONProvider.default, option=orjson.OPT_NON_STR_KEYS).decode()
+        except TypeError:
+            pass  # tipo que o orjson não serializa: stdlib com o default do Flask
+    return json.dumps(obj, default=DefaultJSONProvider.default, ensure_ascii=False, separators=(',', ':'))
+
+
+class JSONProvider(DefaultJSONProvider):
+    """
+    Provider do Flask (jsonify) com `dumps`; chaves na ordem em que foram montadas
+    """
+    sort_keys = False
+    ensure_ascii = False
+
+    def dumps(self, obj, **kwargs) -> str:
+        if 'indent' in kwargs:  # modo debug
+            return super().dumps(obj, **kwargs)
+        return dumps(obj)
+
+
+def parse_fields(value) -> List[str] | None:
+    """
+    Campos pedidos ('id,category' ou lista); None = todos. ValueError com
+    os nomes desconhecidos.
+    """
+    if value is None or value == '' or value == []:
+        return None
+    names = value.split(',') if isinstance(value, str) else [str(v) for v in value]
+    names = [n.strip() for n in names if n.strip()]
+    unknown = [n for n in names if n not in RESULT_FIELDS]
+    if unknown:
+        raise ValueError(f"campos desconhecidos: {', '.join(unknown)} (disponíveis: {', '.join(RESULT_FIELDS)})")
+    return names
+
+
+def project(results: Iterable[Dict], fields: List[str] | None) -> List[Dict]:
+    if fields is None:
+        return list(results)
+    return [{name: result.get(name) for name in fields} for result in results]
+
+
+def encode_cursor(offset: int, document_key: str) -> str:
+    # Opaco para o cliente: posição do próximo e-mail + identificação do documento
+    raw = dumps({'o': offset, 'd': document_key[:16]}).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, document_key: str) -> int:
+    """
+    Posição guardada no cursor; ValueError se ele for inválido ou de outro documento
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        data = json.loads(raw)
+        offset, key = int(data['o']), data['d']
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise ValueError('cursor inválido') from None
+    if key != document_key[:16] or offset < 0:
+        raise ValueError('cursor de outro documento')
+    return offset
+
+
+def compress_response(response, accept_encodings):
+    """
+    Comprime o corpo (br se o cliente aceitar e o brotli estiver instalado,
+    senão gzip) quando ele passa de COMPRESS_MIN_BYTES
+    """
+    if (
+        COMPRESS_MIN_BYTES <= 0
+        or response.direct_passthrough
+        or response.is_streamed
+        or response.status_code < 200
+        or response.status_code in (204, 304)
+        or 'Content-Encoding' in response.headers
+        or response.mimetype not in COMPRESS_MIMETYPES
+    ):
+        return response
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_BYTES:
+        return response
+    if brotli is not None and accept_encodings['br']:
+        data, encoding = brotli.compress(data, quality=4), 'br'
+    elif accept_encodings['gzip']:
+        data, encoding = gzip.compress(data, compresslevel=COMPRESS_LEVEL, mtime=0), 'gzip'
+    else:
+        return response
+    response.set_data(data)
+    response.headers['Content-Encoding'] = encoding
+    return response
@@ -0,0 +1,97 @@
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+
+# Métricas Prometheus por etapa (extração, separação, classificação, resposta)
+# e log estruturado com limite de frequência. Com vários workers do gunicorn,
+# PROMETHEUS_MULTIPROC_DIR deve apontar para um diretório compartilhado (ver
+# gunicorn.conf.py): cada processo grava seus valores lá e /metrics agrega.
+# Sem prometheus_client as métricas viram no-op.
+LOG_RATE_INTERVAL = float(os.getenv('LOG_RATE_INTERVAL', '60'))  # segundos entre logs do mesmo evento
+
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+try:
+    from prometheus_client import Counter, Histogram
+
+    STAGE_SECONDS = Histogram(
+        'autou_stage_duration_seconds', 'Tempo por etapa do processamento',
+        ['stage', 'method'], buckets=STAGE_BUCKETS,
+    )
+    CLASSIFICATIONS = Counter('autou_classifications_total', 'E-mails classificados por camada', ['tier'])
+    REPLIES = Counter('autou_replies_total', 'Respostas sugeridas por origem', ['source'])
+    MODEL_FAILURES = Counter('autou_model_failures_total', 'Erros do modelo (queda para a heurística)', ['backend'])
+except ImportError:
+    STAGE_SECONDS = CLASSIFICATIONS = REPLIES = MODEL_FAILURES = None
+
+
+def observe(stage: str, method: str, seconds: float, count: int = 1) -> None:
+    # `count` > 1: mesmo tempo médio para cada e-mail de um lote
+    if STAGE_SECONDS is not None:
+        child = STAGE_SECONDS.labels(stage, method)
+        for _ in range(count):
+            child.observe(seconds)
+
+
+@contextmanager
+def timed(stage: str, method: str) -> Iterator[Dict]:
+    """
+    Mede um bloco; o método pode ser trocado dentro dele (info['method'] = ...)
+    """
+    info = {'method': method}
+    t0 = time.perf_counter()
+    try:
+        yield info
+    finally:
+        observe(stage, info['method'], time.perf_counter() - t0)
+
+
+def inc(counter, label: str, amount: int = 1) -> None:
+    if counter is not None and amount:
+        counter.labels(label).inc(amount)
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """
+    Texto no formato Prometheus; agrega todos os workers quando
+    PROMETHEUS_MULTIPROC_DIR está definido
+    """
+    try:
+        from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, generate_latest
+    except ImportError:
+        return b'# prometheus_client nao instalado\n', 'text/plain; charset=utf-8'
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+_LOG_STATE: Dict[str, tuple] = {}  # evento -> (último envio, ocorrências suprimidas)
+_LOG_LOCK = threading.Lock()
+
+
+def log_event(logger: logging.Logger, level: int, event: str, **fields) -> None:
+    """
+    Log em JSON ({"event": ..., campos}); o mesmo evento sai no máximo uma vez
+    por LOG_RATE_INTERVAL, com o número de ocorrências suprimidas no intervalo
+    """
+    if not logger.isEnabledFor(level):
+        return
+    now = time.monotonic()
+    with _LOG_LOCK:
+        last, suppressed = _LOG_STATE.get(event, (None, 0))
+        if last is not None and now - last < LOG_RATE_INTERVAL:
+            _LOG_STATE[event] = (last, suppressed + 1)
+            return
+        _LOG_STATE[event] = (now, 0)
+    if suppressed:
+        fields['suppressed'] = suppressed
+    logger.log(level, json.dumps({'event': event, **fields}, ensure_ascii=False, default=str))
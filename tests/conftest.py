@@ -0,0 +1,12 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Só a heurística e nada persistido fora do tmp dos testes
+os.environ.setdefault('RENDER', '1')
+os.environ.setdefault('ZSC_PRELOAD', '0')
+os.environ.setdefault('JOBS_WORKERS', '0')
+os.environ['CLASSIFY_CACHE_DB'] = ''
+os.environ.pop('OPENAI_API_KEY', None)
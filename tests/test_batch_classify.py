@@ -0,0 +1,92 @@
+import json
+
+import batch_classify
+import train_linear
+
+TXT = (
+    'EMAIL 1 - PRODUTIVO\nPreciso do status do chamado 4512, está parado desde ontem.\n\n'
+    'EMAIL 2 - IMPRODUTIVO\nObrigado pela ajuda de ontem, pessoal! Ótimo fim de semana.\n'
+)
+
+
+def _write_inputs(tmp_path):
+    src = tmp_path / 'in'
+    src.mkdir()
+    (src / 'export.txt').write_text(TXT, encoding='utf-8')
+    (src / 'broken.pdf').write_bytes(b'isto nao e um pdf')
+    return src
+
+
+def _run(tmp_path, src, **kwargs):
+    out = tmp_path / 'out.jsonl'
+    summary = batch_classify.run([str(src)], str(out), 'jsonl', workers=1, chunk_size=8, backend='local', **kwargs)
+    lines = [json.loads(line) for line in out.read_text(encoding='utf-8').splitlines()]
+    return summary, lines
+
+
+def test_unreadable_file_is_reported_not_classified(tmp_path):
+    src = _write_inputs(tmp_path)
+    summary, lines = _run(tmp_path, src)
+
+    assert [r['id'] for r in lines] == ['Email 1', 'Email 2']
+    assert all(r['source'].endswith('export.txt') for r in lines)
+    assert len(summary['errors']) == 1
+    assert summary['errors'][0]['source'].endswith('broken.pdf')
+    assert 'PDF' in summary['errors'][0]['error']
+
+
+def test_main_exit_code_when_a_file_fails(tmp_path, capsys):
+    src = _write_inputs(tmp_path)
+    assert batch_classify.main([str(src), '-o', str(tmp_path / 'out.jsonl'), '-w', '1']) == 1
+    assert 'arquivo ignorado' in capsys.readouterr().err
+
+
+def test_batch_stage_timings_are_labelled_per_chunk(tmp_path):
+    src = _write_inputs(tmp_path)
+    summary, _ = _run(tmp_path, src)
+    assert 'classify_chunk_p50_ms' in summary and 'reply_chunk_p95_ms' in summary
+    assert 'classify_p50_ms' not in summary
+    assert 'extract_p50_ms' in summary and 'decode_p50_ms' in summary
+
+
+def test_resume_skips_done_emails(tmp_path):
+    src = _write_inputs(tmp_path)
+    _run(tmp_path, src)
+    out = tmp_path / 'out.jsonl'
+    # Execução interrompida no meio da segunda linha
+    first = out.read_text(encoding='utf-8').splitlines()[0]
+    out.write_text(first + '\n{"source": "x', encoding='utf-8')
+
+    summary, lines = _run(tmp_path, src, resume=True)
+    assert summary['skipped'] == 1 and summary['emails'] == 1
+    assert [r['id'] for r in lines] == ['Email 1', 'Email 2']
+
+
+def test_training_examples_skip_unreadable_files(tmp_path, capsys):
+    src = _write_inputs(tmp_path)
+    texts, labels, skipped = train_linear.load_examples([str(src)])
+    assert labels == ['Produtivo', 'Improdutivo']
+    assert not any('Erro' in t for t in texts)
+    assert 'broken.pdf' in capsys.readouterr().err
+
+
+def test_jsonl_records_without_text_are_reported(tmp_path, capsys):
+    src = tmp_path / 'in.jsonl'
+    src.write_text(
+        '{"id": 1, "text": "Preciso do status do chamado 4512, está parado desde ontem."}\n'
+        '{"id": 2, "text": null}\n'
+        '{"id": 3, "text": 42}\n'
+        '{"id": 4, "text": null, "body": "Segue em anexo o comprovante de pagamento da fatura."}\n'
+        '{"id": 5\n'
+        '[1, 2]\n',
+        encoding='utf-8',
+    )
+    summary, lines = _run(tmp_path, src)
+    assert [r['id'] for r in lines] == ['1', '4']
+    assert [(r['line'], r['error']) for r in summary['invalid']] == [
+        (2, "sem 'text' (string)"), (3, "sem 'text' (string)"), (5, 'JSON inválido'), (6, "sem 'text' (string)"),
+    ]
+
+    assert batch_classify.main([str(src), '-o', str(tmp_path / 'out2.jsonl'), '-w', '1']) == 0
+    err = capsys.readouterr().err
+    assert 'in.jsonl:2' in err and 'classify_chunk' in err
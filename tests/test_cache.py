@@ -0,0 +1,69 @@
+import cache
+from cache import ContentCache, LRUCache, make_key
+
+
+def test_make_key_separates_parts():
+    assert make_key('ab', 'c') != make_key('a', 'bc')
+    assert make_key('x', 1) == make_key('x', '1')
+
+
+def test_lru_evicts_oldest_and_counts():
+    lru = LRUCache(maxsize=2, ttl=60)
+    lru.set('a', 1)
+    lru.set('b', 2)
+    lru.get('a')  # 'a' passa a ser o mais recente
+    lru.set('c', 3)
+    assert lru.get('b') is None
+    assert lru.get('a') == 1 and lru.get('c') == 3
+    assert lru.evictions == 1
+
+
+def test_lru_expires(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, 'monotonic', lambda: now[0])
+    lru = LRUCache(maxsize=4, ttl=10)
+    lru.set('a', 1)
+    now[0] += 11
+    assert lru.get('a') is None
+    assert lru.expirations == 1
+
+
+def test_get_returns_copy():
+    c = ContentCache(maxsize=8, ttl=60, db_path='')
+    c.set('k', {'signals': ['a']})
+    c.get('k')['signals'].append('b')
+    assert c.get('k') == {'signals': ['a']}
+
+
+def test_shared_tier_is_seen_by_another_process_cache(tmp_path):
+    db = str(tmp_path / 'cache.sqlite3')
+    ContentCache(maxsize=8, ttl=60, db_path=db).set('k', {'category': 'Produtivo'})
+    other = ContentCache(maxsize=8, ttl=60, db_path=db)
+    assert other.get('k') == {'category': 'Produtivo'}
+    assert other.shared_hits == 1
+
+
+def test_shared_hit_keeps_remaining_ttl(tmp_path, monkeypatch):
+    db = str(tmp_path / 'cache.sqlite3')
+    wall = [1_000_000.0]
+    mono = [50.0]
+    monkeypatch.setattr(cache.time, 'time', lambda: wall[0])
+    monkeypatch.setattr(cache.time, 'monotonic', lambda: mono[0])
+
+    ContentCache(maxsize=8, ttl=60, db_path=db).set('k', 'v')
+    wall[0] += 50
+    mono[0] += 50
+    other = ContentCache(maxsize=8, ttl=60, db_path=db)
+    assert other.get('k') == 'v'  # sobram 10 s na camada compartilhada
+
+    # Passou da expiração original: a cópia em memória também expirou
+    wall[0] += 11
+    mono[0] += 11
+    assert other.memory.get('k') is None
+    assert other.get('k') is None
+
+
+def test_disabled_cache():
+    c = ContentCache(maxsize=0, ttl=60, db_path='')
+    c.set('k', 1)
+    assert c.get('k') is None
@@ -0,0 +1,90 @@
+import numpy as np
+
+import dedup
+import nlp
+from dedup import NearDuplicateIndex
+
+BASE = ('Bom dia, preciso do status do chamado {ticket}, está parado desde segunda e o cliente '
+        'está cobrando uma resposta. Já tentei reabrir pelo portal, mas a tela de acompanhamento '
+        'continua mostrando o mesmo erro de sincronização. Podem verificar com a equipe responsável '
+        'e me passar uma previsão ainda hoje? Att. {name}')
+
+
+def pre(text):
+    return nlp.preprocess(nlp.normalize_text(text))
+
+
+def test_shingles_mask_numbers():
+    a = dedup.shingles(pre(BASE.format(ticket=1001, name='Maria')))
+    b = dedup.shingles(pre(BASE.format(ticket=98765, name='Maria')))
+    np.testing.assert_array_equal(a, b)
+    assert len(a) == len(np.unique(a))
+    assert len(dedup.shingles('')) == 0 and len(dedup.shingles('oi')) == 1
+
+
+def test_signature_is_deterministic():
+    items = dedup.shingles(pre(BASE.format(ticket=1, name='Ana')))
+    first, second = NearDuplicateIndex(), NearDuplicateIndex()
+    np.testing.assert_array_equal(first.signature(items), second.signature(items))
+    # A assinatura em blocos é igual à calculada de uma vez
+    dedup._CHUNK, chunk = 7, dedup._CHUNK
+    try:
+        np.testing.assert_array_equal(first.signature(items), second.signature(items))
+    finally:
+        dedup._CHUNK = chunk
+
+
+def test_index_groups_near_duplicates():
+    index = NearDuplicateIndex()
+    assert index.add(pre(BASE.format(ticket=1001, name='Maria Souza'))) == 0
+    assert index.add(pre('Feliz aniversário para toda a equipe, parabéns pelo trabalho!')) == 1
+    assert index.add(pre(BASE.format(ticket=2002, name='João Pereira'))) == 0
+    assert index.add('') == 3
+    assert index.stats() == {'emails': 4, 'clusters': 3, 'duplicates': 1, 'largest_cluster': 2}
+
+
+def test_heuristic_decided_emails_skip_the_index():
+    # RENDER=1 (conftest): a heurística decide tudo e as respostas são templates
+    text = '\n\n'.join(
+        f'EMAIL {n} - ASSUNTO\n' + BASE.format(ticket=n * 1000, name='Maria') for n in range(1, 4)
+    )
+    clusters = {}
+    results = nlp.classify_multiple_emails(text, clusters=clusters)
+
+    assert [r['duplicate_of'] for r in results] == [None, None, None]
+    assert clusters == {'emails': 3, 'clusters': 3, 'duplicates': 0, 'largest_cluster': 1}
+
+
+def test_tracker_keeps_reply_template_not_the_email():
+    tracker = nlp.DuplicateTracker()
+    source = BASE.format(ticket='#4512', name='\nMaria Souza')
+    position, _ = tracker.assign(source)
+    reply = nlp.Reply('Olá Maria Souza, o chamado 4512 já está com a equipe.', 'llm')
+    classification = {'category': 'Produtivo', 'confidence': 0.9, 'sub_intent': None, 'signals': ['status'],
+                      'method': 'model', 'windows': 3}
+    tracker.remember(position, 'Email 1', source, classification, reply)
+
+    kept = tracker.representatives[position]
+    assert source not in kept and all(not isinstance(v, str) or len(v) < 20 for v in kept)
+    assert 'windows' not in kept[1] and 'method' not in kept[1]
+
+    other = BASE.format(ticket='#7788', name='\nJoão Pereira')
+    email_id, classification, personalized = tracker.reuse(tracker.assign(other)[1], other)
+    assert email_id == 'Email 1' and classification['signals'] == ['status']
+    assert personalized.text == 'Olá João Pereira, o chamado 7788 já está com a equipe.'
+    assert personalized.source == 'cache'
+    # Sem nome nem chamado no novo e-mail: ficam os do representante
+    assert tracker.reuse(position, 'Bom dia, qual o status?')[2].text == reply.text
+
+
+def test_tracker_cap_bounds_representatives():
+    tracker = nlp.DuplicateTracker(max_items=2)
+    topics = ['fatura em atraso', 'senha bloqueada', 'feliz aniversário', 'reunião de sexta', 'proposta comercial']
+    for n, topic in enumerate(topics):
+        text = f'Assunto: {topic}. ' * 5
+        position, representative = tracker.assign(text)
+        assert position == representative
+        tracker.remember(position, f'Email {n}', text, {'category': 'Produtivo', 'confidence': 0.9},
+                         nlp.Reply('ok', 'template'))
+    assert len(tracker.representatives) == 2 and len(tracker.index._signatures) == 2
+    assert tracker.stats() == {'emails': 5, 'clusters': 5, 'duplicates': 0, 'largest_cluster': 1}
@@ -0,0 +1,75 @@
+import io
+import sqlite3
+import zlib
+
+import pytest
+
+import documents
+import nlp
+from documents import DocumentStore
+from test_mail_extract import MBOX
+
+
+def multi_text(count):
+    return '\n\n'.join(f'EMAIL {n} - ASSUNTO {n}\nConteúdo do e-mail número {n} da caixa.' for n in range(1, count + 1))
+
+
+@pytest.fixture
+def store(tmp_path):
+    return DocumentStore(str(tmp_path / 'documents.sqlite3'))
+
+
+def test_email_by_position(store):
+    text = multi_text(5)
+    doc_id = store.put(text)
+
+    assert store.get(doc_id) == text
+    email = store.email(doc_id, 3)
+    assert email['id'] == 'Email 4' and email['content'] == 'Conteúdo do e-mail número 4 da caixa.'
+    assert store.email(doc_id, 5) is None and store.email(doc_id, -1) is None
+    assert store.email('inexistente', 0) is None
+
+
+def test_opening_a_card_does_not_split_the_document_again(tmp_path, monkeypatch):
+    path = str(tmp_path / 'documents.sqlite3')
+    doc_id = DocumentStore(path).put(multi_text(50))
+
+    # Outro processo (sem o documento em memória) abre vários cartões
+    calls = []
+    split = nlp.iter_email_spans
+    monkeypatch.setattr(nlp, 'iter_email_spans', lambda text: calls.append(1) or split(text))
+    decompress = []
+    original = zlib.decompress
+    monkeypatch.setattr(documents.zlib, 'decompress', lambda data: decompress.append(1) or original(data))
+    store = DocumentStore(path)
+    for position in range(0, 50, 7):
+        assert store.email(doc_id, position)['id'] == f'Email {position + 1}'
+    assert calls == []
+    assert len(decompress) == 2  # texto e posições, só na primeira abertura
+
+
+def test_mbox_document_uses_message_spans(store):
+    document = nlp.extract_text_from_file('caixa.mbox', io.BytesIO(MBOX))
+    doc_id = store.put(document.text, document.spans)
+
+    assert [store.email(doc_id, n)['id'] for n in range(3)] == ['Email 1', 'Email 2', 'Email 3']
+    assert store.email(doc_id, 0)['content'].endswith('Obrigado')
+    assert store.email(doc_id, 3) is None
+
+
+def test_rows_without_spans_column(tmp_path):
+    path = str(tmp_path / 'documents.sqlite3')
+    text = multi_text(3)
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE documents (id TEXT PRIMARY KEY, expires REAL NOT NULL, text BLOB NOT NULL)')
+    conn.execute('INSERT INTO documents VALUES (?, ?, ?)', ('antigo', 1e12, zlib.compress(text.encode('utf-8'))))
+    conn.commit()
+    conn.close()
+
+    assert DocumentStore(path).email('antigo', 2)['id'] == 'Email 3'
+
+
+def test_expired_document(tmp_path):
+    store = DocumentStore(str(tmp_path / 'documents.sqlite3'), ttl=-1)
+    doc_id = store.put(multi_text(2))
+    assert store.get(doc_id) is None and store.email(doc_id, 0) is None
@@ -0,0 +1,152 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import jobs
+import nlp
+from jobs import JobLost, JobManager, JobStore
+
+EMAILS = [
+    'Bom dia, preciso do status do chamado 1001, está parado desde segunda.',
+    'Segue em anexo o comprovante de pagamento da fatura de março.',
+    'Bom dia, preciso do status do chamado 2002, está parado desde segunda.',  # quase-duplicata do 1º
+    'Feliz aniversário para toda a equipe, parabéns pelo trabalho!',
+    'Não consigo acessar minha conta desde ontem, aparece erro 403 no login.',
+]
+
+
+def multi_text(emails=EMAILS):
+    return '\n\n'.join(f'EMAIL {n} - ASSUNTO {n}\n{body}' for n, body in enumerate(emails, 1))
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path / 'jobs.sqlite3'))
+
+
+@pytest.fixture
+def model_tier(monkeypatch):
+    # Quase-duplicatas só são procuradas entre e-mails que iriam ao modelo:
+    # sem heurística decidindo, cada e-mail cai no fallback do modelo
+    monkeypatch.setattr(nlp, '_use_heuristic_only', lambda text: False)
+    monkeypatch.setattr(nlp, '_cascade_decision', lambda raw, pre: None)
+    monkeypatch.setattr(nlp, '_get_classifier_model', lambda: None)
+
+
+def test_run_job_classifies_all_emails(store, model_tier):
+    job_id = store.create(text=multi_text())
+    job = store.claim('a')
+    jobs.run_job(store, job)
+
+    status = store.get(job_id)
+    assert status['status'] == 'done'
+    assert status['done'] == status['total'] == len(EMAILS)
+    results = store.results(job_id)
+    assert [r['id'] for r in results] == [f'Email {n}' for n in range(1, 6)]
+    assert results[2]['duplicate_of'] == 'Email 1'
+
+
+def test_writes_require_ownership(store):
+    job_id = store.create(text=multi_text())
+    job_a = store.claim('a')
+    store.save_results(job_id, 'a', 0, [{'id': 'Email 1'}])
+
+    # 'a' parou de dar sinal de vida: 'b' retoma o job
+    store._conn().execute('UPDATE jobs SET heartbeat = 0 WHERE id = ?', (job_id,))
+    assert store.claim('b')['id'] == job_id
+
+    with pytest.raises(JobLost):
+        store.save_results(job_id, 'a', 0, [{'id': 'x'}, {'id': 'y'}, {'id': 'z'}])
+    with pytest.raises(JobLost):
+        jobs.run_job(store, job_a)
+    assert not store.finish(job_id, 'a', 'failed', 'erro')
+
+    status = store.get(job_id)
+    assert status['status'] == 'running' and status['done'] == 1
+    assert store.results(job_id) == [{'id': 'Email 1'}]
+
+
+def test_heartbeat_keeps_slow_job_from_being_reclaimed(store, monkeypatch):
+    monkeypatch.setattr(jobs, 'JOBS_STALE_AFTER', 0.4)
+    release = threading.Event()
+    started = threading.Event()
+
+    def slow_job(store, job):
+        started.set()
+        release.wait(5)  # um lote que leva mais que JOBS_STALE_AFTER
+        store.finish(job['id'], job['owner'], 'done')
+
+    monkeypatch.setattr(jobs, 'run_job', slow_job)
+    job_id = store.create(text='Bom dia, preciso do boleto.')
+    manager = JobManager(store, workers=1)
+    manager.start()
+    assert started.wait(5)
+
+    time.sleep(1.0)
+    assert store.claim('outro') is None
+    release.set()
+    for _ in range(50):
+        if store.get(job_id)['status'] == 'done':
+            break
+        time.sleep(0.05)
+    assert store.get(job_id)['status'] == 'done'
+
+
+def test_worker_survives_database_errors_in_failure_handler(store, monkeypatch):
+    def broken_job(store, job):
+        raise ValueError('falha no job')
+
+    def locked_finish(*args, **kwargs):
+        raise sqlite3.OperationalError('database is locked')
+
+    monkeypatch.setattr(jobs, 'run_job', broken_job)
+    monkeypatch.setattr(store, 'finish', locked_finish)
+    first = store.create(text='primeiro')
+    second = store.create(text='segundo')
+    manager = JobManager(store, workers=1)
+    manager.start()
+
+    for _ in range(100):
+        if store.get(second)['attempts']:
+            break
+        time.sleep(0.05)
+    # A thread continuou viva e pegou o próximo job
+    assert store.get(first)['attempts'] == 1 and store.get(second)['attempts'] == 1
+    assert manager._threads[0].is_alive()
+
+
+def test_resume_keeps_duplicate_groups(store, monkeypatch, model_tier):
+    monkeypatch.setattr(nlp, 'ZSC_BATCH_SIZE', 2)
+    job_id = store.create(text=multi_text())
+    job = store.claim('a')
+
+    # O processo cai depois do primeiro lote gravado
+    save = store.save_results
+
+    def crash_after_first_batch(job_id, owner, start, results):
+        if start > 0:
+            raise RuntimeError('processo interrompido')
+        save(job_id, owner, start, results)
+
+    monkeypatch.setattr(store, 'save_results', crash_after_first_batch)
+    with pytest.raises(RuntimeError):
+        jobs.run_job(store, job)
+    monkeypatch.setattr(store, 'save_results', save)
+    assert store.get(job_id)['done'] == 2
+
+    classified = []
+    classify = nlp._classify_pending
+    monkeypatch.setattr(nlp, '_classify_pending', lambda results, pending, *args: classified.extend(pending) or
+                        classify(results, pending, *args))
+    store._conn().execute('UPDATE jobs SET heartbeat = 0 WHERE id = ?', (job_id,))
+    jobs.run_job(store, store.claim('b'))
+
+    results = store.results(job_id)
+    assert store.get(job_id)['status'] == 'done'
+    assert [r['id'] for r in results] == [f'Email {n}' for n in range(1, 6)]
+    assert results[2]['duplicate_of'] == 'Email 1'
+    assert results[2]['category'] == results[0]['category']
+    # Só os e-mails novos e fora de grupos já vistos foram classificados
+    assert len(classified) == 2
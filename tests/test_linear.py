@@ -0,0 +1,97 @@
+import json
+import os
+import sys
+
+import numpy as np
+import pytest
+
+import linear
+import train_linear
+from linear import LinearClassifier
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+from corpus import generate_emails  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def corpus():
+    emails = generate_emails(120, seed=1)
+    return [e['text'] for e in emails], [e['category'] for e in emails]
+
+
+@pytest.fixture(scope='module')
+def trained(corpus):
+    return linear.train(*corpus, bits=14)
+
+
+@pytest.mark.parametrize('scale', [1, 20, 500])
+def test_platt_on_separable_scores_stays_finite(scale):
+    rng = np.random.default_rng(0)
+    y = np.r_[np.ones(60), np.zeros(60)]
+    scores = np.where(y > 0, 1, -1) * rng.uniform(0.5, 1.5, 120) * scale
+    a, c = linear._fit_platt(scores, y)
+    assert 0 < a <= linear.PLATT_MAX_SLOPE and abs(c) < 5
+    # Os alvos suavizados limitam a confiança: nada de 0.9999999
+    probs = linear._sigmoid(a * scores + c)
+    assert probs.max() < 0.9999 and probs.min() > 0.0001
+    assert np.where(y > 0, probs, 1 - probs).mean() == pytest.approx(61 / 62, abs=0.02)
+
+
+def test_platt_recovers_noisy_calibration():
+    rng = np.random.default_rng(1)
+    scores = rng.normal(0, 1, 4000)
+    y = (rng.random(4000) < linear._sigmoid(2 * scores + 0.5)).astype(float)
+    a, c = linear._fit_platt(scores, y)
+    assert a == pytest.approx(2, abs=0.25) and c == pytest.approx(0.5, abs=0.2)
+
+
+def test_trained_model_confidence_is_calibrated(trained):
+    model, report = trained
+    assert report['validation']['accuracy'] >= 0.9
+    assert 0 < report['validation']['log_loss'] < 0.5
+    assert 0 < model.platt[0] <= linear.PLATT_MAX_SLOPE
+    # Texto vazio não tem evidência nenhuma: confiança perto de 0.5
+    assert model.predict([''])[0]['confidence'] < 0.8
+
+
+def test_batch_scoring_shape(trained):
+    model, _ = trained
+    texts = ['Preciso do status do chamado 123', 'Feliz Natal a todos', '', 'fatura com valor errado']
+    assert model.scores([linear.preprocess(t) for t in texts]).shape == (4,)
+    results = model.predict(texts)
+    assert len(results) == 4
+    assert all(r['category'] in linear.CATEGORIES and 0.5 <= r['confidence'] <= 1 for r in results)
+    assert model.predict([]) == []
+
+
+def test_save_and_load_round_trip(trained, tmp_path):
+    model, _ = trained
+    path = str(tmp_path / 'linear.npz')
+    model.save(path)
+    loaded = LinearClassifier.load(path)
+
+    assert (loaded.bits, loaded.ngram_max, loaded.platt) == (model.bits, model.ngram_max, model.platt)
+    assert loaded.bias == pytest.approx(model.bias)
+    np.testing.assert_array_equal(loaded.weights, model.weights)
+    texts = ['Preciso do status do chamado 123', 'Feliz Natal a todos']
+    assert loaded.predict(texts) == model.predict(texts)
+    assert linear.weights_fingerprint(path) is not None
+
+
+def test_train_linear_cli(corpus, tmp_path, capsys):
+    data = tmp_path / 'rotulados.jsonl'
+    texts, labels = corpus
+    data.write_text(''.join(json.dumps({'text': t, 'category': c}) + '\n' for t, c in zip(texts, labels)))
+    output = str(tmp_path / 'modelo.npz')
+
+    assert train_linear.main([str(data), '-o', output, '--bits', '12', '--epochs', '100']) == 0
+    report = json.loads(capsys.readouterr().out)
+    assert report['train']['emails'] + report['validation']['emails'] == len(texts)
+    assert report['validation']['log_loss'] > 0
+    assert LinearClassifier.load(output).bits == 12
+
+
+def test_train_linear_needs_both_categories(tmp_path, capsys):
+    data = tmp_path / 'rotulados.jsonl'
+    data.write_text(json.dumps({'text': 'Feliz Natal a todos', 'category': 'Improdutivo'}) + '\n')
+    assert train_linear.main([str(data), '-o', str(tmp_path / 'modelo.npz')]) == 1
@@ -0,0 +1,81 @@
+import io
+
+import pytest
+
+import jobs
+import nlp
+from jobs import JobStore
+from mail_extract import MailFile, MailIndex, index_path
+
+FIRST = ('Bom dia, conforme o email 2 que enviei ontem, o chamado 1001 continua parado.\n'
+         'Podem verificar o status com urgência?\n\nObrigado')
+
+
+def mbox(*messages):
+    return ''.join(
+        f'From sender{n}@example.com Mon Jan  1 00:00:00 2024\n'
+        f'From: sender{n}@example.com\nSubject: {subject}\n\n{body}\n\n'
+        for n, (subject, body) in enumerate(messages, 1)
+    ).encode('utf-8')
+
+
+MBOX = mbox(
+    ('Chamado 1001', FIRST),
+    ('Comprovante', 'Segue em anexo o comprovante de pagamento da fatura de março.'),
+    ('Parabens', 'Feliz aniversário para toda a equipe, parabéns pelo trabalho!'),
+)
+
+
+def test_mbox_spans_come_from_messages():
+    document = nlp.extract_text_from_file('caixa.mbox', io.BytesIO(MBOX))
+
+    assert document.is_multi
+    assert [span.id for span in document.spans] == ['Email 1', 'Email 2', 'Email 3']
+    assert [span.header for span in document.spans] == ['Chamado 1001', 'Comprovante', 'Parabens']
+    first = document.spans[0].to_dict(document.text)['content']
+    # O "email 2" do corpo não corta a primeira mensagem
+    assert first == 'Chamado 1001\n\n' + FIRST
+    assert nlp.count_emails(document.text, document.spans) == 3
+
+
+def test_job_resume_keeps_message_spans(tmp_path, monkeypatch):
+    monkeypatch.setattr(nlp, 'ZSC_BATCH_SIZE', 1)
+    store = JobStore(str(tmp_path / 'jobs.sqlite3'))
+    job_id = store.create(filename='caixa.mbox', payload=MBOX)
+
+    save = store.save_results
+
+    def crash_after_first_batch(job_id, owner, start, results):
+        if start > 0:
+            raise RuntimeError('processo interrompido')
+        save(job_id, owner, start, results)
+
+    monkeypatch.setattr(store, 'save_results', crash_after_first_batch)
+    with pytest.raises(RuntimeError):
+        jobs.run_job(store, store.claim('a'))
+    monkeypatch.setattr(store, 'save_results', save)
+    store._conn().execute('UPDATE jobs SET heartbeat = 0 WHERE id = ?', (job_id,))
+    jobs.run_job(store, store.claim('b'))
+
+    results = store.results(job_id)
+    assert store.get(job_id)['status'] == 'done'
+    assert [r['id'] for r in results] == ['Email 1', 'Email 2', 'Email 3']
+    assert results[0]['content_full'].endswith('Obrigado')
+    assert [r['header'] for r in results] == ['Chamado 1001', 'Comprovante', 'Parabens']
+
+
+def test_mail_index_grows_with_appended_messages(tmp_path):
+    path = tmp_path / 'caixa.mbox'
+    path.write_bytes(MBOX)
+    with MailFile(str(path)) as mail:
+        index = mail.index()
+        assert [ref.id for ref in index.refs] == ['Email 1', 'Email 2', 'Email 3']
+        assert 'Obrigado' in mail.message(index.refs[0])['content']
+
+    path.write_bytes(MBOX + mbox(('Acesso', 'Não consigo acessar minha conta desde ontem.')))
+    saved = MailIndex.load(index_path(str(path)))
+    assert saved is not None and saved.matches_prefix(path.read_bytes())
+    with MailFile(str(path)) as mail:
+        index = mail.index()
+        assert len(index.refs) == 4
+        assert mail.message(index.refs[3])['header'] == 'Acesso'
@@ -0,0 +1,179 @@
+import io
+import time
+
+import pytest
+
+import nlp
+import pdf_extract
+
+pytest.importorskip('pdfminer')
+
+
+def make_pdf(contents):
+    """
+    PDF mínimo, uma página por stream de operadores em `contents`
+    """
+    n = len(contents)
+    font = 3 + 2 * n
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        f"<< /Type /Pages /Kids [{' '.join(f'{3 + 2 * i} 0 R' for i in range(n))}] /Count {n} >>".encode(),
+    ]
+    for i, content in enumerate(contents):
+        objects.append(f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {4 + 2 * i} 0 R '
+                       f'/Resources << /Font << /F1 {font} 0 R >> >> >>'.encode())
+        data = content.encode('latin-1')
+        objects.append(b'<< /Length %d >>\nstream\n' % len(data) + data + b'\nendstream')
+    objects.append(b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>')
+    out = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for i, obj in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b'%d 0 obj\n' % i + obj + b'\nendobj\n'
+    xref = len(out)
+    out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    for offset in offsets:
+        out += b'%010d 00000 n \n' % offset
+    out += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def text_page(text):
+    return f'BT /F1 12 Tf 72 720 Td ({text}) Tj ET'
+
+
+# Página que o pdfminer leva segundos para interpretar
+SLOW_PAGE = ' '.join(['BT /F1 12 Tf 72 720 Td (x) Tj ET'] * 20000)
+
+
+@pytest.mark.parametrize('count', [2, pdf_extract.PDF_PARALLEL_MIN_PAGES + 3])
+def test_pages_in_order(count):
+    text, pages = pdf_extract.extract_pdf_text(make_pdf([text_page(f'Pagina {i}') for i in range(count)]))
+    assert [line for line in text.split() if line != 'Pagina'] == [str(i) for i in range(count)]
+    assert pages.pages_read == pages.total_pages == count
+    assert not pages.partial
+
+
+def test_max_pages():
+    text, pages = pdf_extract.extract_pdf_text(make_pdf([text_page(f'P{i}') for i in range(5)]), max_pages=3)
+    assert text.split() == ['P0', 'P1', 'P2']
+    assert pages.reason == 'max_pages'
+
+
+@pytest.mark.parametrize('extra_pages', [0, pdf_extract.PDF_PARALLEL_MIN_PAGES])
+def test_slow_page_is_interrupted_at_the_deadline(extra_pages):
+    # Vale também para PDFs pequenos (uma tarefa só no pool)
+    data = make_pdf([text_page('rapida'), SLOW_PAGE] + [text_page('depois')] * extra_pages)
+    t0 = time.monotonic()
+    text, pages = pdf_extract.extract_pdf_text(data, time_budget=0.5)
+    assert time.monotonic() - t0 < 2
+    assert text.split() == ['rapida']
+    assert pages.reason == 'time_budget'
+
+    # O pool continua utilizável depois do alarme
+    text, _ = pdf_extract.extract_pdf_text(make_pdf([text_page('ok')]))
+    assert text.split() == ['ok']
+
+
+def test_pool_is_shared_between_documents():
+    pdf_extract.extract_pdf_text(make_pdf([text_page('a')]))
+    pool = pdf_extract._POOL
+    pdf_extract.extract_pdf_text(make_pdf([text_page('b')] * 12))
+    assert pdf_extract._POOL is pool
+
+
+def test_extract_text_from_file():
+    document = nlp.extract_text_from_file('x.pdf', io.BytesIO(make_pdf([text_page('Bom dia, preciso do boleto')])))
+    assert document.error is None and document.partial is None
+    assert 'preciso do boleto' in document.text
+
+    broken = nlp.extract_text_from_file('x.pdf', io.BytesIO(b'isto nao e um pdf'))
+    assert broken.error.startswith('Erro ao processar PDF')
+
+
+def lines_page(lines):
+    return 'BT /F1 12 Tf 14 TL 72 720 Td ' + ' '.join(f'({line}) Tj T*' for line in lines) + ' ET'
+
+
+def email_pages(count):
+    return [lines_page([f'EMAIL {i} - Pedido {i}', f'Preciso da segunda via do boleto {i} com urgencia.'])
+            for i in range(1, count + 1)]
+
+
+def test_paged_text_streams_emails_before_the_last_page():
+    data = make_pdf(email_pages(pdf_extract.PDF_PARALLEL_MIN_PAGES + 2))
+    paged = nlp.stream_text_from_file('x.pdf', io.BytesIO(data))
+    assert isinstance(paged, nlp.PagedText)
+
+    read_at = []
+
+    def spans():
+        for span in paged.iter_spans():
+            read_at.append(paged.pages.pages_read)  # páginas extraídas quando o e-mail foi entregue
+            yield span
+
+    batches = []
+    for batch in nlp.iter_classified_batches(paged, spans()):
+        batches.extend(batch)
+    assert read_at[0] < paged.pages.total_pages
+
+    joined = nlp.extract_text_from_file('x.pdf', io.BytesIO(data))
+    document = paged.document()
+    assert (document.text, document.spans) == (joined.text, joined.spans)
+    assert [email['id'] for email in batches] == [span.id for span in joined.spans]
+
+
+@pytest.mark.parametrize('text', [
+    '\n\n' + '\n'.join(f'EMAIL {i} - Assunto {i}\nOla, preciso do boleto {i} com urgencia.\n' for i in range(1, 7)),
+    '\n'.join(f'De: cliente{i}@exemplo.com\nBom dia, o sistema {i} esta fora do ar desde ontem.\n'
+              for i in range(1, 7)),
+])
+@pytest.mark.parametrize('size', [7, 31, 200])
+def test_paged_text_matches_joined_text(text, size):
+    # Páginas cortadas no meio de cabeçalhos e de e-mails
+    paged = nlp.PagedText(text[i:i + size] for i in range(0, len(text), size))
+    paged.read_until_multi()
+    spans = list(paged.iter_spans())
+    joined = nlp.ingest_text(text)
+    assert paged.text == joined.text
+    assert spans == joined.spans
+
+
+def test_paged_text_keeps_delivered_emails_when_the_format_changes():
+    # Cabeçalhos "EMAIL N" só na última página: os e-mails já entregues ficam
+    first = '\n'.join(f'De: cliente{i}@exemplo.com\nBom dia, o sistema {i} esta fora do ar.\n' for i in range(3))
+    last = '\nEMAIL 9 - Outro assunto\nPreciso do boleto atualizado.'
+    paged = nlp.PagedText([first[:60], first[60:], last])
+    paged.read_until_multi()
+    spans = list(paged.iter_spans())
+    assert [span.id for span in spans] == ['Email 1', 'Email 2', 'Email 9']
+    assert spans[-1].to_dict(paged.text)['content'] == 'Preciso do boleto atualizado.'
+    assert paged.document().spans == spans
+
+
+def test_stream_text_from_file_single_email():
+    data = make_pdf([text_page('Bom dia, preciso do boleto'), text_page('atualizado')])
+    document = nlp.stream_text_from_file('x.pdf', io.BytesIO(data))
+    assert document == nlp.extract_text_from_file('x.pdf', io.BytesIO(data))
+
+    broken = nlp.stream_text_from_file('x.pdf', io.BytesIO(b'isto nao e um pdf'))
+    assert broken.error.startswith('Erro ao processar PDF')
+
+
+def test_process_stream_pdf():
+    import json
+    import app as app_module
+    import documents
+
+    data = make_pdf(email_pages(3))
+    client = app_module.app.test_client()
+    response = client.post('/process/stream', data={'file': (io.BytesIO(data), 'emails.pdf')},
+                           content_type='multipart/form-data')
+    assert response.mimetype == 'text/event-stream'
+    events = [(block.split('\n')[0][len('event: '):], json.loads(block.split('\n')[1][len('data: '):]))
+              for block in response.get_data(as_text=True).strip().split('\n\n')]
+    assert [name for name, _ in events] == ['start', 'email', 'email', 'email', 'done']
+    assert events[0][1]['total'] is None and events[0][1]['document'] is None
+    done = events[-1][1]
+    assert done['total'] == 3 and done['warning'] is None
+    assert documents.get_store().email(done['document'], 2)['content'].startswith('Preciso da segunda via do boleto 3')
@@ -0,0 +1,113 @@
+import os
+import re
+import sys
+import time
+
+import pytest
+
+import responders
+from cache import ContentCache
+
+pytest.importorskip('openai')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+from fake_openai import start_background  # noqa: E402
+
+
+@pytest.fixture
+def fake_openai(monkeypatch):
+    """
+    Sobe o fake OpenAI e aponta o cliente compartilhado de responders para ele;
+    `start(**opções)` cria o servidor com as opções de make_server
+    """
+    servers = []
+
+    def start(**kwargs):
+        server = start_background(**kwargs)
+        servers.append(server)
+        monkeypatch.setenv('OPENAI_BASE_URL', f"http://127.0.0.1:{server.server_address[1]}/v1")
+        return server
+
+    monkeypatch.setenv('OPENAI_API_KEY', 'fake')
+    monkeypatch.setattr(responders, 'OPENAI_MAX_RETRIES', 0)
+    monkeypatch.setattr(responders, 'content_cache', ContentCache(maxsize=64, ttl=60, db_path=''))
+    monkeypatch.setattr(responders, '_CLIENT', None)
+    monkeypatch.setattr(responders, '_EXECUTOR', None)
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_llm_reply_and_shared_client(fake_openai):
+    server = fake_openai()
+    first = responders.generate_reply('Qual o status do chamado #4512?', 'Produtivo', 'status_update', 'openai')
+    client = responders._get_client()
+    second = responders.generate_reply('Segue o boleto em anexo.', 'Produtivo', 'attachment', 'openai')
+
+    assert first == responders.Reply('Resposta simulada (Produtivo).', 'llm')
+    assert second.source == 'llm'
+    assert responders._get_client() is client
+    assert server.stats['requests'] == 2
+    assert len(server.stats['connections']) == 1  # conexão reaproveitada (keep-alive)
+
+
+def test_llm_reply_is_cached(fake_openai):
+    server = fake_openai()
+    text = 'Poderiam verificar o acesso à minha conta?'
+    assert responders.generate_reply(text, 'Produtivo', None, 'openai').source == 'llm'
+    assert responders.generate_reply(text, 'Produtivo', None, 'openai') == responders.Reply(
+        'Resposta simulada (Produtivo).', 'cache')
+    assert server.stats['requests'] == 1
+
+
+def test_fan_out_keeps_input_order(fake_openai, monkeypatch):
+    # O primeiro e-mail responde por último: o resultado segue a ordem da entrada
+    def latency_for(prompt):
+        n = int(re.search(r'pedido (\d+)', prompt).group(1))
+        return 0.05 * (6 - n)
+
+    server = fake_openai(latency_for=latency_for)
+    monkeypatch.setattr(responders, 'OPENAI_MAX_INFLIGHT', 6)
+    items = [(f'Status do pedido {n}, por favor.', f'Cat{n}', None) for n in range(6)]
+
+    t0 = time.perf_counter()
+    replies = responders.suggest_replies(items, backend='openai')
+    elapsed = time.perf_counter() - t0
+
+    assert [r.text for r in replies] == [f'Resposta simulada (Cat{n}).' for n in range(6)]
+    assert server.stats['max_inflight'] > 1
+    assert elapsed < 0.05 * sum(6 - n for n in range(6))  # mais rápido que em série
+
+
+def test_inflight_limit(fake_openai, monkeypatch):
+    server = fake_openai(latency=0.05)
+    monkeypatch.setattr(responders, 'OPENAI_MAX_INFLIGHT', 2)
+    replies = responders.suggest_replies([(f'E-mail {n}', 'Produtivo', None) for n in range(8)], backend='openai')
+    assert all(r.source == 'llm' for r in replies)
+    assert server.stats['max_inflight'] <= 2
+
+
+def test_server_error_falls_back_to_template(fake_openai):
+    server = fake_openai(error_rate=1.0)
+    reply = responders.generate_reply('Preciso da segunda via do boleto.', 'Produtivo', None, 'openai')
+    assert reply.source == 'template'
+    assert reply.error.startswith('InternalServerError')
+    assert 'Equipe de Suporte AutoU' in reply.text
+    assert server.stats['requests'] == 1  # OPENAI_MAX_RETRIES=0
+
+
+def test_timeout_falls_back_to_template(fake_openai, monkeypatch):
+    monkeypatch.setattr(responders, 'OPENAI_TIMEOUT', 0.3)
+    fake_openai(slow_rate=1.0, slow_latency=3)
+    t0 = time.perf_counter()
+    replies = responders.suggest_replies([('Bom dia!', 'Improdutivo', 'greetings')] * 3, backend='openai')
+    assert time.perf_counter() - t0 < 2
+    assert [r.source for r in replies] == ['template'] * 3
+    assert all(r.error.startswith('APITimeoutError') for r in replies)
+
+
+def test_local_backend_never_calls_the_server(fake_openai):
+    server = fake_openai()
+    reply = responders.generate_reply('Obrigado pela ajuda!', 'Improdutivo', None, 'local')
+    assert reply.source == 'template' and reply.error is None
+    assert server.stats['requests'] == 0
@@ -0,0 +1,75 @@
+"""
+Treino offline do classificador linear (CLASSIFIER_BACKEND=linear).
+
+Os rótulos vêm dos próprios arquivos: cabeçalhos "EMAIL N - PRODUTIVO/
+IMPRODUTIVO" em .txt/.pdf (category_hint de nlp.split_emails) ou o campo
+"category"/"label" em .jsonl. E-mails sem rótulo são ignorados. Os pesos
+(só os não nulos) e a calibração vão para um .npz compacto.
+
+Uso:
+    python train_linear.py exports/ rotulados.jsonl -o models/linear.npz
+"""
+import sys
+import json
+import time
+import argparse
+from typing import List
+
+import nlp
+import linear
+from batch_classify import iter_input_files, iter_emails
+
+
+LABELS = {'produtivo': 'Produtivo', 'productive': 'Produtivo',
+          'improdutivo': 'Improdutivo', 'unproductive': 'Improdutivo'}
+
+
+def load_examples(paths: List[str]) -> tuple[List[str], List[str], int]:
+    # (textos normalizados, rótulos, e-mails sem rótulo)
+    timings = {'files': [], 'extract': []}
+    texts, labels, skipped = [], [], 0
+    for path in iter_input_files(paths):
+        for email in iter_emails(path, timings):
+            label = LABELS.get(str(email.get('category_hint') or '').strip().lower())
+            if label is None or not email['content']:
+                skipped += 1
+                continue
+            texts.append(nlp.normalize_text(email['content']))
+            labels.append(label)
+    for error in timings.get('errors', []):
+        print(f"arquivo ignorado: {error['source']}: {error['error']}", file=sys.stderr)
+    return texts, labels, skipped
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description='Treino do classificador linear (hashing + regressão logística)')
+    parser.add_argument('paths', nargs='+', help='Arquivos .txt/.pdf/.jsonl rotulados ou diretórios')
+    parser.add_argument('-o', '--output', default=linear.LINEAR_WEIGHTS_PATH)
+    parser.add_argument('--bits', type=int, default=linear.LINEAR_HASH_BITS, help='2**bits posições do hashing')
+    parser.add_argument('--ngram-max', type=int, default=linear.LINEAR_NGRAM_MAX)
+    parser.add_argument('--l2', type=float, default=1e-4)
+    parser.add_argument('--epochs', type=int, default=300)
+    parser.add_argument('--lr', type=float, default=0.5)
+    parser.add_argument('--validation', type=float, default=0.2, help='Fração para calibração e relatório')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    texts, labels, skipped = load_examples(args.paths)
+    if len(set(labels)) < 2:
+        print(f"são necessários exemplos das duas categorias ({len(labels)} rotulados, {skipped} sem rótulo)",
+              file=sys.stderr)
+        return 1
+
+    t0 = time.perf_counter()
+    model, report = linear.train(texts, labels, bits=args.bits, ngram_max=args.ngram_max, l2=args.l2,
+                                 epochs=args.epochs, lr=args.lr, validation=args.validation, seed=args.seed)
+    model.save(args.output)
+    report['skipped_unlabeled'] = skipped
+    report['seconds'] = round(time.perf_counter() - t0, 3)
+    report['output'] = args.output
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,90 @@
+import os
+import mmap
+import tempfile
+from typing import IO, Iterator, List
+
+import nlp
+from telemetry import timed
+
+
+# Uploads grandes de .txt (exportações de caixa de e-mail de centenas de MB):
+# o corpo vai em blocos para um arquivo temporário e é mapeado em memória.
+# A separação roda direto sobre os bytes mapeados, cada e-mail é decodificado
+# só quando é classificado, e as páginas já processadas são devolvidas ao
+# kernel; o RSS fica perto do constante qualquer que seja o tamanho do arquivo.
+UPLOAD_MAX_CONTENT_LENGTH = int(os.getenv('UPLOAD_MAX_CONTENT_LENGTH', 1024 * 1024 * 1024))  # 1 GB
+UPLOAD_SPOOL_DIR = os.getenv('UPLOAD_SPOOL_DIR') or None  # padrão: diretório temporário do sistema
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+def spool(stream: IO[bytes], chunk_size: int = UPLOAD_CHUNK_SIZE) -> IO[bytes]:
+    """
+    Copia o stream em blocos para um arquivo temporário (apagado ao fechar)
+    """
+    spooled = tempfile.TemporaryFile(dir=UPLOAD_SPOOL_DIR)
+    try:
+        with timed('extract', 'spool'):
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                spooled.write(chunk)
+        spooled.flush()
+    except BaseException:
+        spooled.close()
+        raise
+    return spooled
+
+
+class MappedUpload:
+    """
+    Arquivo spooled mapeado só para leitura; `buffer` pode ser passado
+    direto para nlp.iter_email_spans / iter_classified_batches
+    """
+
+    def __init__(self, spooled: IO[bytes]):
+        self.file = spooled
+        self.size = os.fstat(spooled.fileno()).st_size
+        # mmap não aceita arquivo vazio
+        self.buffer = mmap.mmap(spooled.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b''
+        self.position = 0  # fim do último e-mail entregue para classificação
+        self._released = None  # páginas devolvidas até este offset (None: nenhuma)
+
+    def spans(self) -> Iterator[nlp.EmailSpan]:
+        for span in nlp.iter_email_spans(self.buffer):
+            self.position = span.end
+            yield span
+
+    def release(self) -> None:
+        """
+        Devolve ao kernel as páginas já lidas (voltam do page cache se forem
+        tocadas de novo). Na primeira vez vale para o arquivo todo: a detecção
+        do formato pode ter varrido o arquivo inteiro.
+        """
+        if not isinstance(self.buffer, mmap.mmap) or not hasattr(mmap, 'MADV_DONTNEED'):
+            return
+        done = self.position - self.position % mmap.PAGESIZE
+        start, end = (0, self.size) if self._released is None else (self._released, done)
+        if end > start:
+            self.buffer.madvise(mmap.MADV_DONTNEED, start, end - start)
+        self._released = done
+
+    def iter_batches(self, tracker: nlp.DuplicateTracker | None = None) -> Iterator[List[dict]]:
+        # Mesmo formato de nlp.iter_classified_batches, liberando as páginas a cada lote
+        for batch in nlp.iter_classified_batches(self.buffer, self.spans(), tracker=tracker):
+            yield batch
+            self.release()
+
+    def close(self) -> None:
+        if isinstance(self.buffer, mmap.mmap):
+            try:
+                self.buffer.close()
+            except BufferError:
+                pass  # um gerador abandonado ainda aponta para o buffer; o GC desfaz o mapeamento
+        self.file.close()
+
+    def __enter__(self) -> 'MappedUpload':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()